@@ -1 +1 @@
-from .bullish_rsi_signal import calculate_signals
\ No newline at end of file
+from .bullish_rsi_signal import calculate_signals, calculate_symbol_signals, scan_symbols
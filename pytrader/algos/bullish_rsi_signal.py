@@ -1,112 +1,261 @@
 import logging as l
-import datetime
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import repeat
+from typing import Iterable
+import numpy as np
 import pandas as pd
 
+from pytrader.utils import localtime
+from pytrader.utils.timeframe import DAILY, Timeframe
+from .shared_panel import PanelLayout, SharedPanel
+from .trigger_levels import TriggerLevels
+
+# Bars a buy may look back for the RSI recovery that closes it
+_sell_window = 10
+# How recent the latest buy has to be for a symbol to be reported
+_recent_buy_bars = 10
+# RS below which RSI < 30 and above which RSI > 40
+_buy_rs = 3 / 7
+_sell_rs = 2 / 3
+# Decay of the span 19 averages, 1 - 2 / (19 + 1)
+_beta = 0.9
+
+_dropped_columns = [
+    "high",
+    "low",
+    "price_change",
+    "volume",
+    "dollar_volume",
+    "avg_up",
+    "avg_down",
+    "Upmove",
+    "Downmove",
+    "200sma",
+    "RS",
+]
+
+
+@dataclass(frozen=True)
+class _NextBar:
+    """
+    What the next bar's indicators build on.
+    complete: bool - The last bar has every indicator, so a next bar continues the series
+    ewm_bars: int - Bars the averages ran over
+    sma_floor: float - Mean of the last 199 closes, the next close has to be above it to be above its SMA
+    """
+
+    complete: bool
+    ewm_bars: int
+    sma_floor: float
+
 
 def _rsi_buy(df):
-    return (df["close"] > df["200sma"]) and df["RSI"] < 30
+    return (df["close"] > df["200sma"]) & (df["RSI"] < 30)
 
 
-_in_buy_phase = False
+def _rsi_sell(df):
+    """
+    A sell fires once RSI recovers above 40 within the window of bars following a buy.
+    """
+    recent_buy = df["RSI_Buy"].astype(np.int8).rolling(_sell_window, min_periods=1).max() > 0
+    sell = (recent_buy & (df["RSI"] > 40)).to_numpy()
+    sell[:_sell_window] = False
+    return sell
 
 
-def _filter_signals(row):
-    global _in_buy_phase
-    if row["RSI_Buy"] == True and not _in_buy_phase:
-        _in_buy_phase = True
-        return True
-    if row["RSI_Sell"] == True and _in_buy_phase:
-        _in_buy_phase = False
-        return True
-    return False
+def _filter_signals(buy: np.ndarray, sell: np.ndarray) -> np.ndarray:
+    """
+    Keeps the first buy of every buy phase and the first sell that ends it. Every symbol starts outside a buy phase.
+    """
+    in_buy_phase = False
+    keep = np.zeros(len(buy), dtype=bool)
+    for i in np.flatnonzero(buy | sell):
+        if buy[i] and not in_buy_phase:
+            in_buy_phase = True
+            keep[i] = True
+        elif sell[i] and in_buy_phase:
+            in_buy_phase = False
+            keep[i] = True
+    return keep
 
 
-def rsi_sell(window):
-    open_position = 0
-    current_value = window.iloc[len(window) - 1]
-    blew_rsi = False
+def _indicators(df: pd.DataFrame) -> tuple[pd.DataFrame, _NextBar]:
+    """
+    Returns the bars that have an RSI, with the indicator columns, and the state the next bar builds on.
+    """
+    df = df.drop_duplicates()
+    closes = df["close"].to_numpy(dtype="f8")
 
-    for i in range(len(window)):
-        old_value = window.iloc[len(window) - i - 1]
-        if old_value["RSI_Buy"] == False:
-            continue
-        open_position = i
-        if current_value["RSI"] > 40:
-            blew_rsi = True
-
-    if open_position >= 10 or blew_rsi:
-        return True
-
-    return False
-
-
-def calculate_signals(symbol_data: pd.DataFrame, all_tickers_df: pd.DataFrame):
-    buys = {}
-
-    for symbol in symbol_data.index.unique(1):
-        try:
-            df = all_tickers_df.xs(symbol, level=1).drop_duplicates()
-
-            df["200sma"] = df["close"].rolling(window=200).mean()
-
-            df["price_change"] = df["close"].pct_change()
-            df["Upmove"] = df["price_change"].apply(lambda x: x if x > 0 else 0)
-            df["Downmove"] = df["price_change"].apply(lambda x: abs(x) if x < 0 else 0)
-            df["avg_up"] = df["Upmove"].ewm(span=19).mean()
-            df["avg_down"] = df["Downmove"].ewm(span=19).mean()
-            df = df.dropna()
-            df["RS"] = df["avg_up"] / df["avg_down"]
-            df["RSI"] = df["RS"].apply(lambda x: 100 - (100 / (x + 1)))
-
-            df["RSI_Buy"] = df.apply(_rsi_buy, axis=1)
-            df["Periods_Since_Buy"] = df.loc[df["RSI_Buy"]].index.to_series().diff().fillna(0)
-
-            results = []
-            for i in range(len(df)):
-                if i < 10:
-                    results.append(False)
-                    continue
-                window_df = df[max(i - 10 + 1, 0) : i + 1]
-                result = rsi_sell(window_df)
-                results.append(result)
-
-            df["RSI_Sell"] = results
-            df["tx_price"] = df["open"].shift(-1)
-
-            df["keep"] = df.apply(_filter_signals, axis=1)
-            # print(df[df['keep']].count(numeric_only=True))
-            filtered_df = df[df["keep"]].drop(columns="keep")
-
-            filtered_df.drop(
-                [
-                    "high",
-                    "low",
-                    "price_change",
-                    "volume",
-                    "dollar_volume",
-                    "avg_up",
-                    "avg_down",
-                    "Upmove",
-                    "Downmove",
-                    "200sma",
-                    "RS",
-                ],
-                inplace=True,
-                axis=1,
-            )
-
-            filtered_df[filtered_df["RSI_Buy"] | filtered_df["RSI_Sell"]]
-
-            latest_buy = filtered_df[filtered_df["RSI_Buy"]].tail(1)
-            if len(latest_buy) == 1:
-                d = latest_buy.iloc[0].name.date()
-                # print(f"{symbol}: {d}")
-                now = datetime.datetime.now().date()
-                isWithinDays = (now - d).days <= 10
-                if isWithinDays:
-                    l.info(f"{symbol}: {(d - now).days}: {d}")
-                    buys[symbol] = filtered_df
-        except Exception as ex:
-            l.warning(f"{symbol}: {ex}")
+    df["200sma"] = df["close"].rolling(window=200).mean()
+
+    price_change = df["close"].pct_change()
+    df["price_change"] = price_change
+    df["Upmove"] = np.where(price_change > 0, price_change, 0)
+    df["Downmove"] = np.where(price_change < 0, -price_change, 0)
+    df["avg_up"] = df["Upmove"].ewm(span=19).mean()
+    df["avg_down"] = df["Downmove"].ewm(span=19).mean()
+    last_bar = df.index[-1] if len(df) else None
+    ewm_bars = len(df)
+    df = df.dropna()
+    df["RS"] = df["avg_up"] / df["avg_down"]
+    df["RSI"] = 100 - (100 / (df["RS"] + 1))
+
+    df["RSI_Buy"] = _rsi_buy(df)
+    df["Periods_Since_Buy"] = df.loc[df["RSI_Buy"]].index.to_series().diff().fillna(0)
+    df["RSI_Sell"] = _rsi_sell(df)
+    df["tx_price"] = df["open"].shift(-1)
+    df["bars_ago"] = np.arange(len(df) - 1, -1, -1)
+
+    # The next bar only continues the series when the last bar has every indicator
+    complete = len(df) > 0 and df.index[-1] == last_bar and len(closes) >= 199
+    sma_floor = float(closes[-199:].sum() / 199) if complete else np.nan
+    return df, _NextBar(complete, ewm_bars, sma_floor)
+
+
+def _is_recent(latest_buy: pd.Series, timeframe: Timeframe) -> bool:
+    if timeframe.intraday:
+        return latest_buy["bars_ago"] <= _recent_buy_bars
+
+    d = latest_buy.name.date()
+    now = localtime.today().date()
+    return (now - d).days <= _recent_buy_bars
+
+
+def _threshold_return(num_up: float, num_down: float, rs: float) -> float:
+    """
+    Returns the next close to close return at which RS reaches rs. The averages are adjusted EWMs,
+    so the next bar's RS is (up + beta * num_up) / (down + beta * num_down) whatever the weight sum,
+    and it only grows with the return.
+    """
+    if num_up == 0 and num_down == 0:
+        return np.nan
+    up = _beta * (rs * num_down - num_up)
+    return up if up >= 0 else _beta * (num_down - num_up / rs)
+
+
+def _trigger_levels(df: pd.DataFrame, next_bar: _NextBar, in_buy_phase: bool) -> tuple[float, float, float]:
+    """
+    Solves the closes at which the next bar would signal, from the EWM state and the 200 bar SMA.
+    Returns (buy_below, buy_floor, sell_above), NaN where the next bar cannot signal.
+    """
+    if not next_bar.complete:
+        return np.nan, np.nan, np.nan
+
+    last = df.iloc[-1]
+    weights = (1 - _beta**next_bar.ewm_bars) / (1 - _beta)
+    num_up, num_down = float(last["avg_up"]) * weights, float(last["avg_down"]) * weights
+    close = float(last["close"])
+
+    if in_buy_phase:
+        # The next bar's sell window reaches back over the last _sell_window - 1 bars
+        armed = len(df) >= _sell_window and bool(df["RSI_Buy"].iloc[1 - _sell_window :].any())
+        sell_above = close * (1 + _threshold_return(num_up, num_down, _sell_rs)) if armed else np.nan
+        return np.nan, np.nan, sell_above
+
+    # The close has to stay above the SMA it is part of: P > (sum of the last 199 closes + P) / 200
+    buy_below = close * (1 + _threshold_return(num_up, num_down, _buy_rs))
+    if not buy_below > next_bar.sma_floor:
+        return np.nan, np.nan, np.nan
+    return buy_below, next_bar.sma_floor, np.nan
 
+
+def _recent_signals(df: pd.DataFrame, timeframe: Timeframe) -> tuple[pd.DataFrame | None, tuple | None]:
+    """
+    Returns a symbol's signal history when its latest buy is recent, otherwise None,
+    and the trigger levels of its next bar as (last bar time, close, buy_below, buy_floor, sell_above).
+    """
+    df, next_bar = _indicators(df)
+    keep = _filter_signals(df["RSI_Buy"].to_numpy(), df["RSI_Sell"].to_numpy())
+    in_buy_phase = bool(keep.any()) and bool(df["RSI_Buy"].to_numpy()[keep][-1])
+    levels = None
+    if len(df):
+        levels = (df.index[-1], float(df["close"].iloc[-1]), *_trigger_levels(df, next_bar, in_buy_phase))
+
+    filtered_df = df[keep].drop(columns=_dropped_columns, errors="ignore")
+    latest_buy = filtered_df[filtered_df["RSI_Buy"]].tail(1)
+    if len(latest_buy) == 1 and _is_recent(latest_buy.iloc[0], timeframe):
+        return filtered_df, levels
+    return None, levels
+
+
+_worker_panel: SharedPanel | None = None
+
+
+def _attach_worker(layout: PanelLayout):
+    global _worker_panel
+    _worker_panel = SharedPanel.attach(layout)
+
+
+def _worker_signals(symbol: str, timeframe: Timeframe):
+    # Exceptions are returned as text so unpicklable errors cannot break the pool
+    try:
+        return _recent_signals(_worker_panel.frame(symbol), timeframe)
+    except Exception as ex:
+        return RuntimeError(str(ex))
+
+
+def _parallel_results(symbols: list[str], all_tickers_df: pd.DataFrame, timeframe: Timeframe, workers: int) -> list:
+    panel = SharedPanel.from_frame(all_tickers_df, symbols)
+    try:
+        missing = [s for s in symbols if s not in panel.layout.offsets]
+        present = [s for s in symbols if s in panel.layout.offsets]
+        with ProcessPoolExecutor(workers, initializer=_attach_worker, initargs=(panel.layout,)) as pool:
+            chunksize = max(1, len(present) // (workers * 4))
+            results = dict(zip(present, pool.map(_worker_signals, present, repeat(timeframe), chunksize=chunksize)))
+    finally:
+        panel.close()
+    results.update({s: KeyError(s) for s in missing})
+    return [results[s] for s in symbols]
+
+
+def calculate_signals(
+    symbol_data: pd.DataFrame, all_tickers_df: pd.DataFrame, timeframe: Timeframe = DAILY, workers: int = 1
+):
+    return calculate_symbol_signals(symbol_data.index.unique(1), all_tickers_df, timeframe, workers)
+
+
+def calculate_symbol_signals(
+    symbols: Iterable[str], all_tickers_df: pd.DataFrame, timeframe: Timeframe = DAILY, workers: int = 1
+):
+    """
+    Returns the signal history of every symbol with a recent buy.
+    symbols: Iterable[str] - Symbols to evaluate, in order
+    all_tickers_df: DataFrame - (date, ticker) panel holding the symbols' bars
+    workers: int - Processes to spread the symbols over, the panel is shared with them through shared memory
+    """
+    buys, _ = scan_symbols(symbols, all_tickers_df, timeframe, workers)
     return buys
+
+
+def scan_symbols(
+    symbols: Iterable[str], all_tickers_df: pd.DataFrame, timeframe: Timeframe = DAILY, workers: int = 1
+) -> tuple[dict, TriggerLevels]:
+    """
+    Returns the signal history of every symbol with a recent buy and the next bar's trigger levels of every symbol.
+    """
+    symbols = list(symbols)
+    if workers > 1 and len(symbols) > 1:
+        results = _parallel_results(symbols, all_tickers_df, timeframe, workers)
+    else:
+        results = []
+        for symbol in symbols:
+            try:
+                results.append(_recent_signals(all_tickers_df.xs(symbol, level=1), timeframe))
+            except Exception as ex:
+                results.append(ex)
+
+    # Results are merged in symbol order whichever worker computed them
+    buys, levels = {}, []
+    for symbol, result in zip(symbols, results):
+        if isinstance(result, Exception):
+            l.warning(f"{symbol}: {result}")
+            continue
+        events, level = result
+        if level is not None:
+            levels.append((symbol, *level))
+        if events is not None:
+            l.info(f"{symbol}: {timeframe.label(events[events['RSI_Buy']].index[-1])}")
+            buys[symbol] = events
+
+    return buys, TriggerLevels.from_rows(levels)
@@ -0,0 +1,114 @@
+import math
+from collections import deque
+from typing import Iterable
+
+# Same parameters as the batch scan in bullish_rsi_signal
+_beta = 0.9
+_sma_bars = 200
+_sell_window = 10
+
+
+class RsiState:
+    """
+    The bullish RSI strategy's indicators for one symbol, updated in constant time per bar.
+    Feeding a symbol's closes through update gives the same signals as the batch scan of those bars,
+    peek evaluates a forming bar at its latest price without changing the state.
+    """
+
+    __slots__ = (
+        "_closes",
+        "_close_sum",
+        "_last_close",
+        "_num_up",
+        "_num_down",
+        "_rows",
+        "_last_buy_row",
+        "in_buy_phase",
+    )
+
+    def __init__(self):
+        # The last 199 closes, the next close completes the 200 bar SMA
+        self._closes: deque[float] = deque(maxlen=_sma_bars - 1)
+        self._close_sum = 0.0
+        self._last_close: float | None = None
+        # Adjusted EWM numerators, RS is their ratio so the weight sum cancels
+        self._num_up = 0.0
+        self._num_down = 0.0
+        # Bars that have every indicator, the batch scan's rows after dropna
+        self._rows = 0
+        self._last_buy_row: int | None = None
+        self.in_buy_phase = False
+
+    @classmethod
+    def from_closes(cls, closes: Iterable[float]) -> "RsiState":
+        state = cls()
+        for close in closes:
+            state.update(close)
+        return state
+
+    @property
+    def last_close(self) -> float | None:
+        return self._last_close
+
+    def rsi(self) -> float:
+        return _rsi(self._num_up, self._num_down)
+
+    def update(self, close: float) -> str | None:
+        """
+        Adds a completed bar and returns "Buy" or "Sell" when it is a kept signal of the strategy.
+        """
+        num_up, num_down, action, buy = self._evaluate(close)
+        self._num_up, self._num_down = num_up, num_down
+        if len(self._closes) == self._closes.maxlen:
+            self._close_sum -= self._closes[0]
+            self._rows += 1
+            if buy:
+                self._last_buy_row = self._rows - 1
+        self._closes.append(close)
+        self._close_sum += close
+        self._last_close = close
+        if action == "Buy":
+            self.in_buy_phase = True
+        elif action == "Sell":
+            self.in_buy_phase = False
+        return action
+
+    def peek(self, price: float) -> str | None:
+        """
+        Returns the signal the next bar would give if it closed at price.
+        """
+        return self._evaluate(price)[2]
+
+    def peek_rsi(self, price: float) -> float:
+        """
+        Returns the RSI the next bar would have if it closed at price.
+        """
+        num_up, num_down, _, _ = self._evaluate(price)
+        return _rsi(num_up, num_down)
+
+    def _evaluate(self, close: float) -> tuple[float, float, str | None, bool]:
+        change = 0.0 if self._last_close is None else close / self._last_close - 1
+        num_up = max(change, 0.0) + _beta * self._num_up
+        num_down = max(-change, 0.0) + _beta * self._num_down
+        if len(self._closes) < self._closes.maxlen:
+            return num_up, num_down, None, False
+
+        row = self._rows
+        rsi = _rsi(num_up, num_down)
+        sma = (self._close_sum + close) / _sma_bars
+        buy = close > sma and rsi < 30
+        recent_buy = buy or (self._last_buy_row is not None and row - self._last_buy_row < _sell_window)
+        sell = row >= _sell_window and recent_buy and rsi > 40
+
+        action = None
+        if buy and not self.in_buy_phase:
+            action = "Buy"
+        elif sell and self.in_buy_phase:
+            action = "Sell"
+        return num_up, num_down, action, buy
+
+
+def _rsi(num_up: float, num_down: float) -> float:
+    if num_down == 0:
+        return math.nan if num_up == 0 else 100.0
+    return 100 - 100 / (1 + num_up / num_down)
@@ -0,0 +1,104 @@
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class PanelLayout:
+    """
+    Describes a panel held in shared memory, small enough to send to every worker.
+    values_name: str - Shared memory block of the bars, one row per bar grouped by ticker
+    dates_name: str - Shared memory block of the bar times as UTC datetime64[ns]
+    rows: int - Bars in the panel
+    columns: list[str] - Names of the value columns
+    dtype: str - Type of the value columns
+    tz: str - Time zone of the bar times, None for naive times
+    offsets: dict - Row range (start, end) of every ticker
+    """
+
+    values_name: str
+    dates_name: str
+    rows: int
+    columns: list[str]
+    dtype: str
+    tz: str | None
+    offsets: dict[str, tuple[int, int]]
+
+
+class SharedPanel:
+    """
+    A (date, ticker) panel copied once into shared memory so worker processes read the bars without pickling.
+    Create it in the parent with from_frame and close it when the workers are done, workers attach with the layout.
+    """
+
+    def __init__(
+        self, layout: PanelLayout, values: shared_memory.SharedMemory, dates: shared_memory.SharedMemory, owner: bool
+    ):
+        self.layout = layout
+        self._values_block = values
+        self._dates_block = dates
+        self._owner = owner
+        self.values = np.ndarray((layout.rows, len(layout.columns)), dtype=layout.dtype, buffer=values.buf)
+        self.dates = np.ndarray((layout.rows,), dtype="datetime64[ns]", buffer=dates.buf)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, symbols: list[str] = None) -> "SharedPanel":
+        """
+        Copies the bars of the given symbols, all of the panel's symbols by default, into shared memory.
+        """
+        tickers = df.index.get_level_values(1)
+        if symbols is not None:
+            df = df[tickers.isin(symbols)]
+            tickers = df.index.get_level_values(1)
+
+        # Group the rows by ticker while keeping each ticker's bars in panel order, as xs would
+        codes, uniques = pd.factorize(tickers)
+        order = np.argsort(codes, kind="stable")
+        counts = np.bincount(codes, minlength=len(uniques))
+        ends = np.cumsum(counts)
+        offsets = {str(t): (int(end - count), int(end)) for t, count, end in zip(uniques, counts, ends)}
+
+        dates = pd.DatetimeIndex(df.index.get_level_values(0))
+        tz = str(dates.tz) if dates.tz is not None else None
+        if tz is not None:
+            dates = dates.tz_convert(None)
+        dtype = np.result_type(*df.dtypes) if len(df.columns) else np.dtype("float64")
+
+        values_block = shared_memory.SharedMemory(create=True, size=max(1, len(df) * len(df.columns) * dtype.itemsize))
+        dates_block = shared_memory.SharedMemory(create=True, size=max(1, len(df) * 8))
+        layout = PanelLayout(values_block.name, dates_block.name, len(df), list(df.columns), dtype.str, tz, offsets)
+        panel = cls(layout, values_block, dates_block, owner=True)
+        panel.values[:] = df.to_numpy(dtype=dtype)[order]
+        panel.dates[:] = dates.to_numpy(dtype="datetime64[ns]")[order]
+        return panel
+
+    @classmethod
+    def attach(cls, layout: PanelLayout) -> "SharedPanel":
+        values = shared_memory.SharedMemory(name=layout.values_name)
+        dates = shared_memory.SharedMemory(name=layout.dates_name)
+        return cls(layout, values, dates, owner=False)
+
+    def symbols(self) -> list[str]:
+        return list(self.layout.offsets)
+
+    def frame(self, symbol: str) -> pd.DataFrame:
+        """
+        Returns a symbol's bars indexed by date, the same frame as the panel's xs(symbol, level=1).
+        """
+        start, end = self.layout.offsets[symbol]
+        index = pd.DatetimeIndex(self.dates[start:end], name="date")
+        if self.layout.tz is not None:
+            index = index.tz_localize("UTC").tz_convert(self.layout.tz)
+        return pd.DataFrame(self.values[start:end].copy(), index=index, columns=self.layout.columns)
+
+    def close(self):
+        """
+        Detaches from the shared memory, the creating process also frees it.
+        """
+        self.values = self.dates = None
+        for block in (self._values_block, self._dates_block):
+            block.close()
+            if self._owner:
+                block.unlink()
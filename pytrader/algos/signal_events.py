@@ -0,0 +1,151 @@
+import datetime
+import os
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import pytz
+
+from .trigger_levels import TriggerLevels
+
+_event_dtype = np.dtype(
+    [
+        ("symbol", "U16"),
+        ("date", "datetime64[ns]"),
+        ("action", "U4"),
+        ("open", "f8"),
+        ("close", "f8"),
+        ("rsi", "f8"),
+        ("bars_ago", "i8"),
+    ]
+)
+
+
+@dataclass(frozen=True)
+class SignalEvent:
+    """
+    A buy or sell event of a symbol.
+    date: datetime - Start of the bar, in the time zone of the scanned bars or naive like them
+    bars_ago: int - Completed bars since the event's bar, 0 for the last one
+    """
+
+    symbol: str
+    date: datetime.datetime
+    action: str
+    open: float
+    close: float
+    rsi: float
+    bars_ago: int
+
+
+class SignalEvents:
+    """
+    The latest signal events of every symbol with a recent buy, held as one record array.
+    The full signal history is only kept when asked for and is read from disk on first use.
+    records: ndarray - Events grouped by symbol, oldest first within a symbol
+    tz: str - Time zone of the bars, None when they are naive
+    history_path: str - Pickle of the {symbol: DataFrame} signal histories, None when not kept
+    triggers: TriggerLevels - Closes at which every scanned symbol's next bar would signal
+    """
+
+    def __init__(
+        self, records: np.ndarray, tz: str = None, history_path: str = None, triggers: TriggerLevels = None
+    ):
+        self.records = records
+        self.tz = tz
+        self.history_path = history_path
+        self.triggers = triggers
+        self._symbols = list(dict.fromkeys(records["symbol"].tolist()))
+        self._history = None
+
+    @classmethod
+    def from_frames(
+        cls,
+        frames: dict[str, pd.DataFrame],
+        keep: int = 2,
+        history_path: str = None,
+        triggers: TriggerLevels = None,
+    ) -> "SignalEvents":
+        """
+        Keeps the last events of every symbol's signal history, as returned by calculate_signals.
+        keep: int - Events kept per symbol, the rsi command reads the last two
+        history_path: str - Where to write the full histories for history(), None to drop them
+        """
+        tz = None
+        parts = []
+        for symbol, frame in frames.items():
+            tail = frame.tail(keep)
+            dates = pd.DatetimeIndex(tail.index)
+            if dates.tz is not None:
+                tz = str(dates.tz)
+                # Wall clock times keep the bar's date and hour exactly as scanned
+                dates = dates.tz_localize(None)
+            part = np.empty(len(tail), dtype=_event_dtype)
+            part["symbol"] = symbol
+            part["date"] = dates.to_numpy(dtype="datetime64[ns]")
+            part["action"] = np.where(tail["RSI_Buy"].to_numpy(dtype=bool), "Buy", "Sell")
+            part["open"] = tail["open"].to_numpy(dtype="f8")
+            part["close"] = tail["close"].to_numpy(dtype="f8")
+            part["rsi"] = tail["RSI"].to_numpy(dtype="f8")
+            part["bars_ago"] = tail["bars_ago"].to_numpy(dtype="i8")
+            parts.append(part)
+
+        if history_path is not None:
+            os.makedirs(os.path.dirname(history_path) or ".", exist_ok=True)
+            pd.to_pickle(frames, history_path)
+
+        records = np.concatenate(parts) if parts else np.empty(0, dtype=_event_dtype)
+        return cls(records, tz, history_path, triggers)
+
+    def __len__(self) -> int:
+        return len(self._symbols)
+
+    def __iter__(self):
+        return iter(self._symbols)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._symbols
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_history"] = None
+        return state
+
+    def events(self, symbol: str) -> list[SignalEvent]:
+        """
+        Returns a symbol's kept events, oldest first.
+        """
+        return [self._event(record) for record in self.records[self.records["symbol"] == symbol]]
+
+    def latest(self, symbol: str, back: int = 0) -> SignalEvent:
+        """
+        Returns a symbol's latest event, or the one back events before it.
+        """
+        records = self.records[self.records["symbol"] == symbol]
+        if back >= len(records):
+            raise IndexError(f"{symbol} has {len(records)} kept events")
+        return self._event(records[len(records) - 1 - back])
+
+    def history(self, symbol: str) -> pd.DataFrame | None:
+        """
+        Returns a symbol's full signal history, None when the scan did not keep it.
+        """
+        if self._history is None:
+            if self.history_path is None or not os.path.exists(self.history_path):
+                return None
+            self._history = pd.read_pickle(self.history_path)
+        return self._history.get(symbol)
+
+    def _event(self, record) -> SignalEvent:
+        date = record["date"].astype("datetime64[us]").astype(datetime.datetime)
+        if self.tz is not None:
+            date = pytz.timezone(self.tz).localize(date)
+        return SignalEvent(
+            str(record["symbol"]),
+            date,
+            str(record["action"]),
+            float(record["open"]),
+            float(record["close"]),
+            float(record["rsi"]),
+            int(record["bars_ago"]),
+        )
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+_level_dtype = np.dtype(
+    [
+        ("symbol", "U16"),
+        ("date", "datetime64[ns]"),
+        ("close", "f8"),
+        ("buy_below", "f8"),
+        ("buy_floor", "f8"),
+        ("sell_above", "f8"),
+    ]
+)
+
+
+class TriggerLevels:
+    """
+    The closes at which each symbol's next bar would signal, solved from the indicator state after the last bar.
+    A buy fires for a close strictly between buy_floor and buy_below, a sell for a close above sell_above.
+    Levels are NaN when the next bar cannot signal, e.g. no buy while a buy phase is open.
+    records: ndarray - One row per scanned symbol, dates are the last bar's wall clock time
+    tz: str - Time zone of the bars, None when they are naive
+    """
+
+    def __init__(self, records: np.ndarray, tz: str = None):
+        self.records = records
+        self.tz = tz
+        self._rows = {symbol: i for i, symbol in enumerate(records["symbol"].tolist())}
+
+    @classmethod
+    def from_rows(cls, rows: list[tuple]) -> "TriggerLevels":
+        """
+        rows: list[tuple] - (symbol, last bar time, close, buy_below, buy_floor, sell_above) per symbol
+        """
+        records = np.empty(len(rows), dtype=_level_dtype)
+        if not rows:
+            return cls(records)
+        dates = pd.DatetimeIndex([row[1] for row in rows])
+        tz = str(dates.tz) if dates.tz is not None else None
+        records["symbol"] = [row[0] for row in rows]
+        records["date"] = (dates.tz_localize(None) if tz else dates).to_numpy(dtype="datetime64[ns]")
+        for i, name in enumerate(("close", "buy_below", "buy_floor", "sell_above"), start=2):
+            records[name] = [row[i] for row in rows]
+        return cls(records, tz)
+
+    @classmethod
+    def concat(cls, levels: list["TriggerLevels"]) -> "TriggerLevels":
+        records = [lv.records for lv in levels]
+        tz = next((lv.tz for lv in levels if lv.tz is not None), None)
+        return cls(np.concatenate(records) if records else np.empty(0, dtype=_level_dtype), tz)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._rows
+
+    def level(self, symbol: str) -> np.void:
+        return self.records[self._rows[symbol]]
+
+    def signal(self, symbol: str, price: float) -> str | None:
+        """
+        Returns "Buy" or "Sell" when the next bar closing at price would signal, otherwise None.
+        """
+        if symbol not in self._rows:
+            return None
+        level = self.level(symbol)
+        if level["buy_floor"] < price < level["buy_below"]:
+            return "Buy"
+        if price > level["sell_above"]:
+            return "Sell"
+        return None
+
+    def signals(self, prices: dict[str, float]) -> dict[str, str]:
+        """
+        Checks a batch of prices against the levels, returning the symbols that would signal.
+        """
+        symbols = [s for s in prices if s in self._rows]
+        if not symbols:
+            return {}
+        rows = self.records[[self._rows[s] for s in symbols]]
+        price = np.array([prices[s] for s in symbols], dtype="f8")
+        buy = (rows["buy_floor"] < price) & (price < rows["buy_below"])
+        sell = price > rows["sell_above"]
+        return {s: "Buy" if b else "Sell" for s, b, x in zip(symbols, buy, sell) if b or x}
@@ -1 +1 @@
-from .dollar_volume_filter import filter_by_dollar_vol
\ No newline at end of file
+from .dollar_volume_filter import filter_by_dollar_vol, dollar_volume, top_dollar_volume_tickers
@@ -6,6 +6,8 @@ def filter_by_dollar_vol(
     take_top: int = 100,
     price_col: str = "close",
     vol_col: str = "volume",
+    window: int = 30,
+    min_periods: int = 12,
 ) -> DataFrame:
     df["dollar_volume"] = (df[price_col] * df[vol_col]) / 1e6
 
@@ -14,7 +16,7 @@ def filter_by_dollar_vol(
     data["dollar_volume"] = (
         data.loc[:, "dollar_volume"]
         .unstack("ticker")
-        .rolling(1 * 30, min_periods=12)
+        .rolling(window, min_periods=min_periods)
         .mean()
         .stack()
     )
@@ -28,3 +30,24 @@ def filter_by_dollar_vol(
     )
 
     return data
+
+
+def dollar_volume(df: DataFrame, price_col: str = "close", vol_col: str = "volume") -> DataFrame:
+    """
+    Returns the dollar volume in millions of a (date, ticker) panel as a date by ticker frame.
+    """
+    return ((df[price_col] * df[vol_col]) / 1e6).unstack("ticker")
+
+
+def top_dollar_volume_tickers(
+    dollar_volume: DataFrame,
+    take_top: int = 100,
+    window: int = 30,
+    min_periods: int = 12,
+) -> set[str]:
+    """
+    Returns the tickers filter_by_dollar_vol keeps, i.e. those ranked in the top on any date,
+    from a date by ticker dollar volume frame.
+    """
+    ranks = dollar_volume.sort_index().rolling(window, min_periods=min_periods).mean().rank(axis=1, ascending=False)
+    return set(ranks.columns[(ranks < take_top).any()])
@@ -1,13 +1,25 @@
+import asyncio
 import logging
+import os
 import signal as system_signal
-import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
 
 import click
 
+from pytrader import services
 from pytrader.model import SignalModel, TradeModel
-from pytrader.services import AlpacaClient, TraderDatabase, rsi_signals
-from pytrader.utils import localtime, TradeConfig
-from pytrader.utils.need_something_better import _df_row_to_signal, _get_trade_key
+from pytrader.utils import cache, localtime, profiling, TradeConfig
+from pytrader.utils.lazy import LazyServices
+from pytrader.utils.log_setup import configure_logging
+from pytrader.utils.rate_limit import TokenBucket
+from pytrader.utils.timeframe import DAILY, Timeframe, get_timeframe
+from pytrader.utils.need_something_better import _event_to_signal, _get_trade_key
+
+if TYPE_CHECKING:
+    from pytrader.algos.signal_events import SignalEvents
+    from pytrader.services import AlpacaClient, MonitoredAccount, OrderJournal, ProvisionalSignal, TraderDatabase
 
 
 @click.group()
@@ -15,6 +27,32 @@ from pytrader.utils.need_something_better import _df_row_to_signal, _get_trade_k
 @click.option("-c", "--config", default=None, help="Path to configuration file.")
 @click.option("-l", "--live", is_flag=True, help="Execute against live account.")
 @click.option("-o", "--log-path", default="pytrader.log", help="Path to write log file.")
+@click.option("--log-json", is_flag=True, help="Write logs as one JSON object per line.")
+@click.option(
+    "--log-max-bytes",
+    default=10_000_000,
+    show_default=True,
+    help="Rotate the log file at this size, 0 disables rotation.",
+)
+@click.option("--log-backups", default=5, show_default=True, help="Rotated log files to keep.")
+@click.option(
+    "-s",
+    "--simulate",
+    default=None,
+    help="Trade against a simulated broker filling orders from a pickled (date, ticker) bar panel.",
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Record wall time, CPU time and peak memory per pipeline stage and write them as Prometheus metrics.",
+)
+@click.option("--profile-dump", default=None, help="With --profile, also write cProfile stats to this path.")
+@click.option(
+    "--metrics-path",
+    default="pytrader.prom",
+    show_default=True,
+    help="Prometheus text file written by --profile, e.g. in node_exporter's textfile directory.",
+)
 @click.option(
     "-v",
     "--log-level",
@@ -33,45 +71,225 @@ from pytrader.utils.need_something_better import _df_row_to_signal, _get_trade_k
     show_default=True,
     help="Set log level",
 )
-def cli(ctx: click.Context, config: str, live: bool, log_path: str, log_level: str):
+def cli(
+    ctx: click.Context,
+    config: str,
+    live: bool,
+    log_path: str,
+    log_json: bool,
+    log_max_bytes: int,
+    log_backups: int,
+    simulate: str,
+    profile: bool,
+    profile_dump: str,
+    metrics_path: str,
+    log_level: str,
+):
     numeric_level = getattr(logging, log_level.upper(), None)
 
-    logging.basicConfig(
-        level=numeric_level,
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        handlers=[logging.FileHandler(log_path), logging.StreamHandler()],
+    queued_logging = configure_logging(numeric_level, log_path, log_json, log_max_bytes, log_backups)
+    ctx.call_on_close(queued_logging.stop)
+
+    def _build_broker(obj: LazyServices):
+        if simulate:
+            return _load_simulated_broker(obj, simulate)
+        cfg: TradeConfig = obj["cfg"]
+        policy = services.CallPolicy(TokenBucket.per_minute(cfg.broker_rate_per_minute))
+        return services.AlpacaClient(cfg.alpaca_key, cfg.alpaca_secret, live or cfg.alpaca_paper, policy)
+
+    ctx.obj = LazyServices(
+        {
+            "cfg": lambda obj: _load_config(config),
+            "simulation": lambda obj: _simulation_dir(obj, simulate) if simulate else None,
+            "db": _build_database,
+            "broker": _build_broker,
+            "notifications": _build_notifications,
+            "journal": _build_journal,
+        }
     )
-
-    ctx.ensure_object(dict)
+    if simulate:
+        # Everything reading the time runs on the simulated session's clock
+        localtime.set_clock(lambda: ctx.obj["broker"].now)
+        ctx.call_on_close(lambda: _close_simulation(ctx.obj))
+    ctx.call_on_close(lambda: _close_notifications(ctx.obj))
+    ctx.call_on_close(lambda: _close_journal(ctx.obj))
+    ctx.call_on_close(lambda: _log_broker_calls(ctx.obj))
+    ctx.call_on_close(lambda: cache.get_manager().save_counters())
+
+    if profile:
+        profiler = profiling.StageProfiler(metrics_path, profile_dump)
+        profiler.start()
+        ctx.call_on_close(profiler.stop)
+
+
+def _load_config(config: str) -> TradeConfig:
     cfg = TradeConfig(config)
-    ctx.obj["db"] = TraderDatabase(cfg)
-    ctx.obj["broker"] = AlpacaClient(cfg.alpaca_key, cfg.alpaca_secret, live or cfg.alpaca_paper)
-    ctx.obj["cfg"] = cfg
+    cache.configure(cfg.cache_dir, cfg.cache_budgets)
+    if cfg.market_data_provider == "alpaca":
+        # Market data has its own request budget, separate from the trading calls
+        policy = services.CallPolicy(TokenBucket.per_minute(cfg.alpaca_data_rate_per_minute))
+        services.configure_alpaca_data(cfg.alpaca_key, cfg.alpaca_secret, feed=cfg.alpaca_data_feed, policy=policy)
+    return cfg
+
+
+def _simulation_dir(obj: LazyServices, bars_path: str) -> str:
+    """
+    Where a simulation keeps its database, broker state, journal and checkpoints, one directory per bar panel.
+    """
+    obj["cfg"]  # Loading the configuration points the cache manager at the configured root
+    name = os.path.splitext(os.path.basename(bars_path))[0]
+    return os.path.join(cache.get_manager().root, "simulation", name)
+
+
+def _load_simulated_broker(obj: LazyServices, bars_path: str):
+    """
+    Resumes the simulation of a bar panel where the last command left it, or starts it on the first bar.
+    """
+    path = os.path.join(obj["simulation"], "broker.pkl")
+    if os.path.exists(path):
+        return services.SimulatedBroker.load(path)
+    return services.SimulatedBroker.from_pickle(bars_path)
+
+
+def _close_simulation(obj: LazyServices):
+    if "broker" in obj:
+        obj["broker"].save(os.path.join(obj["simulation"], "broker.pkl"))
+    if "db" in obj:
+        obj["db"].close()
+    localtime.set_clock(None)
+
+
+def _build_database(obj: LazyServices):
+    # A simulation never writes to the configured Firestore project
+    if obj["simulation"] is not None:
+        return services.LocalDatabase(os.path.join(obj["simulation"], "database.pkl"))
+    return services.TraderDatabase(obj["cfg"])
+
+
+def _build_notifications(obj: LazyServices):
+    cfg: TradeConfig = obj["cfg"]
+    if not cfg.rsi_gchat_webhook or obj["simulation"] is not None:
+        return None
+    notifier = services.GoogleChatNotification(cfg.rsi_gchat_webhook)
+    return services.NotificationDispatcher(notifier, cfg.gchat_digest_size).start()
+
+
+def _close_notifications(obj: LazyServices):
+    if obj.get("notifications") is not None:
+        obj["notifications"].close()
+
+
+def _journal_path(obj: LazyServices) -> str:
+    obj["cfg"]  # Loading the configuration points the cache manager at the configured root
+    if obj["simulation"] is not None:
+        return os.path.join(obj["simulation"], "order_journal")
+    name = "paper" if obj["broker"].paper else "live"
+    return os.path.join(cache.get_manager().root, "order_journal", name)
+
+
+def _build_journal(obj: LazyServices):
+    cfg: TradeConfig = obj["cfg"]
+    return services.OrderJournal(_journal_path(obj), retention_days=cfg.order_journal_retention_days)
+
+
+def _close_journal(obj: LazyServices):
+    if "journal" in obj:
+        obj["journal"].close()
+
+
+def _log_broker_calls(obj: LazyServices):
+    if "broker" not in obj or not hasattr(obj["broker"], "policy"):
+        return
+    log = logging.getLogger("pytrader.broker.policy")
+    for endpoint, stats in obj["broker"].policy.summary().items():
+        log.debug(
+            f"{endpoint}: {stats['calls']} calls, {stats['errors']} errors, mean {stats['mean'] * 1000:.0f}ms, "
+            f"p50 <= {stats['p50'] * 1000:.0f}ms, p99 <= {stats['p99'] * 1000:.0f}ms."
+        )
 
 
 @cli.command()
 @click.pass_context
 @click.option("--refresh", is_flag=True, help="Force refresh of RSI signals.")
-def rsi(ctx: click.Context, refresh: bool):
+@click.option(
+    "--timeframe",
+    type=click.Choice(["1d", "1h", "15m"]),
+    default=None,
+    help="Bar size to scan, defaults to rsi_timeframe from the configuration.",
+)
+def rsi(ctx: click.Context, refresh: bool, timeframe: str):
     """Calculate RSI signals for all tickers in the S&P 500."""
-    signals_by_symbol = rsi_signals(refresh)
-    broker: AlpacaClient = ctx.obj["broker"]
-    db: TraderDatabase = ctx.obj["db"]
-    cfg: TradeConfig = ctx.obj["cfg"]
+    _scan_rsi(ctx.obj, refresh, timeframe)
+
+
+@profiling.stage("rsi")
+def _scan_rsi(obj: LazyServices, refresh: bool, timeframe: str = None):
+    cfg: TradeConfig = obj["cfg"]
+    tf = get_timeframe(timeframe or cfg.rsi_timeframe)
+    with profiling.stage("load_signals"):
+        if obj["simulation"] is not None:
+            if tf.intraday:
+                raise click.UsageError("Simulations replay daily bars, scan them with --timeframe 1d.")
+            # The simulation's bars up to its current session, nothing is downloaded
+            signals_by_symbol = services.panel_rsi_signals(obj["broker"].history(cfg.rsi_lookback_bars), tf.name)
+        else:
+            signals_by_symbol = services.rsi_signals(
+                refresh,
+                tf.name,
+                cfg.rsi_lookback_bars,
+                cfg.rsi_scan_chunk_size,
+                cfg.rsi_workers,
+                incremental=cfg.rsi_incremental_bars,
+                data_provider=cfg.market_data_provider,
+            )
+    profiling.count("symbols_scanned", len(signals_by_symbol))
+    if signals_by_symbol.triggers is not None:
+        profiling.count("trigger_levels", len(signals_by_symbol.triggers))
+    _store_rsi_signals(obj, signals_by_symbol, tf)
+
+
+def _execute_on(broker: "AlpacaClient", timeframe: Timeframe):
+    """
+    Intraday signals execute in the current session while it is open, daily signals in the next one.
+    """
+    now = localtime.today()
+    if timeframe.intraday and now.hour < 16 and broker.calendar.is_trading_day(now.date()):
+        return localtime.to_day(now)
+    return broker.get_next_trade_day()
+
+
+def _timed_out(broker: "AlpacaClient", cfg: TradeConfig, timeframe: Timeframe, execute_date) -> bool:
+    if not timeframe.intraday:
+        return (localtime.today() - execute_date).days > cfg.rsi_timeout_days
+
+    timeout_bars = cfg.rsi_timeout_bars or cfg.rsi_timeout_days * timeframe.bars_per_session
+    sessions_held = len(broker.get_open_market_days_since(execute_date)) - 1
+    return sessions_held > timeframe.sessions(timeout_bars)
+
+
+@profiling.stage("store_signals")
+def _store_rsi_signals(obj: LazyServices, signals_by_symbol: "SignalEvents", timeframe: Timeframe = DAILY):
+    broker: AlpacaClient = obj["broker"]
+    db: TraderDatabase = obj["db"]
+    cfg: TradeConfig = obj["cfg"]
     log = logging.getLogger("pytrader.signals.rsi")
+    notifications = obj["notifications"] if cfg.rsi_send_gchat else None
+
+    def notify(line: str):
+        if notifications is not None:
+            notifications.add(line)
 
     for symbol in signals_by_symbol:
-        signal_data = signals_by_symbol[symbol]
-        last_signal = _df_row_to_signal(symbol, signal_data.iloc[-1])
+        last_signal = _event_to_signal(symbol, signals_by_symbol.latest(symbol), timeframe)
 
         d = last_signal["date"]
         today = localtime.today()
         market_days = None
-        key = _get_trade_key(symbol, last_signal)
+        key = _get_trade_key(symbol, last_signal, timeframe)
 
         if last_signal["action"] == "Buy":
             market_days = broker.get_open_market_days_since(d)
-            next_trade_day = broker.get_next_trade_day()
+            next_trade_day = _execute_on(broker, timeframe)
 
             signal = SignalModel.create_signal(symbol, key, "Buy", "RSI", last_signal["metadata"], next_trade_day)
             result = db.add_signal(signal)
@@ -79,6 +297,7 @@ def rsi(ctx: click.Context, refresh: bool):
             if result is None:
                 log.warning(f"BUY signal for {symbol} has already been triggered: {key}.")
                 continue
+            profiling.count("signals_emitted")
 
             trade = TradeModel.create_trade(symbol, key, "RSI", [])
             db.add_trade(trade)
@@ -88,11 +307,12 @@ def rsi(ctx: click.Context, refresh: bool):
                 f"Buy Signal for {symbol} on {d} is {(today - d).days} days old but {len(market_days)} market days old."
             )
             log.debug(f"Next trade day is {next_trade_day} which is {(next_trade_day - today).days} days away.")
+            notify(f"Buy {symbol} on {next_trade_day:%Y-%m-%d}, close {last_signal['metadata']['close']:.2f}.")
 
         elif last_signal["action"] == "Sell":
             market_days = broker.get_open_market_days_since(d)
-            buy_signal = _df_row_to_signal(symbol, signal_data.iloc[-2])
-            buy_key = _get_trade_key(symbol, buy_signal).replace("hold", "buy")
+            buy_signal = _event_to_signal(symbol, signals_by_symbol.latest(symbol, 1), timeframe)
+            buy_key = _get_trade_key(symbol, buy_signal, timeframe).replace("hold", "buy")
 
             trade = db.get_trade(buy_key)
 
@@ -121,7 +341,7 @@ def rsi(ctx: click.Context, refresh: bool):
                 log.warning(msg)
                 continue
 
-            next_trade_day = broker.get_next_trade_day()
+            next_trade_day = _execute_on(broker, timeframe)
             metadata = last_signal["metadata"]
             close_signal = SignalModel.create_signal(symbol, key, "Sell", "RSI", metadata, next_trade_day)
             result = db.add_signal(close_signal)
@@ -129,42 +349,53 @@ def rsi(ctx: click.Context, refresh: bool):
             if result is None:
                 log.warning(f"Close signal for {symbol} has already been triggered: {key}.")
                 continue
+            profiling.count("signals_emitted")
 
             db.add_signal_ref_to_trade(trade.id, close_signal.id)
 
             log.info(f"Close Signal for {symbol}")
+            notify(f"Sell {symbol} on {next_trade_day:%Y-%m-%d}.")
 
-    open_trades = db.get_trades()
-
-    for tradeDoc in open_trades:
-        trade = db.get_trade(tradeDoc.id)
+    for trade_id in db.get_trade_ids():
+        trade = db.get_trade(trade_id)
 
         if len(trade.signals) != 1:
             continue
 
-        today = localtime.today()
-        executeDate = trade.resolved_signals[0].executeOn
-        age = today - executeDate
-        if age.days > cfg.rsi_timeout_days:
+        open_signal = trade.resolved_signals[0]
+        executeDate = open_signal.executeOn
+        # A trade is held by the rules of the bars that opened it, whichever timeframe this scan is on
+        trade_timeframe = get_timeframe((open_signal.metadata or {}).get("timeframe", DAILY.name))
+        if _timed_out(broker, cfg, trade_timeframe, executeDate):
             log.warning(f"Trade timed out, creating closing signal for: {trade.id}")
-            next_trade_day = broker.get_next_trade_day()
-            key = _get_trade_key(trade.symbol, {"action": "SELL", "date": localtime.today()})
+            next_trade_day = _execute_on(broker, trade_timeframe)
+            key = _get_trade_key(trade.symbol, {"action": "SELL", "date": localtime.today()}, trade_timeframe)
             signal = SignalModel.create_signal(trade.symbol, key, "Sell", "RSI", {"note": "Timed out"}, next_trade_day)
             result = db.add_signal(signal)
             if result is None:
                 log.warning(f"Close signal for {trade.symbol} has already been triggered: {key}.")
                 continue
+            profiling.count("signals_emitted")
             db.add_signal_ref_to_trade(trade.id, signal.id)
             log.info(f"Close Signal for {trade.symbol}")
+            notify(f"Sell {trade.symbol} on {next_trade_day:%Y-%m-%d}, the trade timed out.")
+
+    if notifications is not None:
+        notifications.flush()
 
 
 @cli.command()
 @click.pass_context
 def process_signals(ctx: click.Context):
     """Process RSI signals and execute trades."""
-    broker: AlpacaClient = ctx.obj["broker"]
-    db: TraderDatabase = ctx.obj["db"]
-    cfg: TradeConfig = ctx.obj["cfg"]
+    _process_signals(ctx.obj)
+
+
+@profiling.stage("process-signals")
+def _process_signals(obj: LazyServices):
+    broker: AlpacaClient = obj["broker"]
+    db: TraderDatabase = obj["db"]
+    cfg: TradeConfig = obj["cfg"]
     log = logging.getLogger("pytrader.signal.processor")
     enabled, account = broker.account()
     if not enabled:
@@ -180,9 +411,13 @@ def process_signals(ctx: click.Context):
     log.debug(f"Account Value: {account_value}")
     log.debug(f"Cash: {cash}")
 
-    signals = db.get_pending_signals()
+    with profiling.stage("load_signals"):
+        signals = db.get_pending_signals()
     log.info(f"Processing {len(signals)} signals.")
 
+    positions = {position.symbol: position for position in broker.get_positions()}
+    intents = []
+
     for signal in signals:
         symbol = signal.symbol
 
@@ -193,7 +428,7 @@ def process_signals(ctx: click.Context):
 
             existing_cost_basis = 0
 
-            position = broker.get_position_for(symbol)
+            position = positions.get(symbol)
             if position is not None:
                 existing_cost_basis = float(position.avg_entry_price) * int(position.qty)
 
@@ -201,74 +436,281 @@ def process_signals(ctx: click.Context):
             available_symbol_funds = available_trade_funds - existing_cost_basis
 
             qty = int(available_symbol_funds / last_close_price)
-            if qty == 0:
+            if qty <= 0:
                 log.warning(f"Insufficient funds to buy {symbol}.")
                 continue
 
             log.info(f"Buying {qty} shares of {symbol} at {last_open_price}.")
-
-            order = broker.buy_with_stop_loss(symbol, qty, last_open_price, stop_price)
-            if order is not None:
-                signal.orderId = order.id
-                db.update_signal_order(signal.id, order.id)
-                log.info(f"Order placed for {symbol} with id {order.id}.")
+            intents.append(services.OrderIntent(signal.id, symbol, "Buy", qty, last_open_price, stop_price))
 
         elif signal.action == "Sell":
-            order = None
-            try:
-                order = broker.close_position(symbol)
-            except:  # noqa: E722
-                pass
-            if order is not None:
-                signal.orderId = order.id
-                db.update_signal_order(signal.id, order.id)
-                log.info(f"Sell order placed for {symbol} with id {order.id}.")
-            else:
-                log.warning(f"Failed to place order for {symbol}. id: {signal.id}.")
+            intents.append(services.OrderIntent(signal.id, symbol, "Sell"))
+
+    with profiling.stage("submit_orders"):
+        results = services.OrderExecutor(broker, cfg.max_parallel_orders).execute(intents)
+
+    placed = {}
+    for result in results:
+        symbol = result.intent.symbol
+        if result.order_id is not None:
+            placed[result.intent.signal_id] = result.order_id
+            log.info(f"{result.intent.action} order placed for {symbol} with id {result.order_id}.")
+        else:
+            log.warning(f"Failed to place order for {symbol}. id: {result.intent.signal_id}. {result.error}")
+
+    profiling.count("orders_submitted", len(placed))
+    profiling.count("orders_failed", len(results) - len(placed))
+    if placed:
+        with profiling.stage("store_orders"):
+            db.update_signal_orders(placed)
 
 
 @cli.command()
 @click.pass_context
-def monitor_orders(ctx: click.Context):
+@click.option(
+    "--flush-window",
+    default=0.5,
+    show_default=True,
+    help="Seconds to coalesce order updates before writing them.",
+)
+def monitor_orders(ctx: click.Context, flush_window: float):
     """Monitor open orders and execute stop losses."""
-    db: TraderDatabase = ctx.obj["db"]
     broker: AlpacaClient = ctx.obj["broker"]
     log = logging.getLogger("pytrader.broker.order_monitor")
 
-    async def _trade_event_handler(event: str, order: dict):
-        ao_key = f"alpaca_{order['id']}"
-        db.upsert_order(ao_key, order)
-        log.info(f"{event}: {order['side']} {order['order_type']} order {order['symbol']}.")
-
     enabled, account = broker.account()
     if not enabled:
         log.error("Account is not enabled for trading. Exiting.")
         return -1
 
-    def signal_handler(sig, frame):
-        log.info(f"Received shutdown event: {system_signal.Signals(sig).name}.")
-        broker.close_stream()
-        log.info("Gracefully shutdown. Exiting")
-        sys.exit(0)
+    writer, streams = _order_monitor(ctx.obj, flush_window)
+
+    async def _run():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (system_signal.SIGINT, system_signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+
+        orders = asyncio.create_task(streams.run(), name="orders")
+        stopped = asyncio.create_task(stop.wait())
+        done, _ = await asyncio.wait([stopped, orders], return_when=asyncio.FIRST_COMPLETED)
+        if orders in done and orders.exception() is not None:
+            log.error("Order streams stopped unexpectedly.", exc_info=orders.exception())
+        log.info("Received shutdown event.")
+        for task in (stopped, orders):
+            task.cancel()
+        await asyncio.gather(stopped, orders, return_exceptions=True)
+
+    log.info(f"Starting order streams of {', '.join(a.name for a in streams.accounts)}.")
+    writer.start()
+    try:
+        asyncio.run(_run())
+    finally:
+        writer.close()
+    log.info("Gracefully shutdown. Exiting")
+
+
+_notified_order_events = {"fill", "partial_fill", "canceled", "expired", "rejected"}
+
+
+def _order_monitor(obj: LazyServices, flush_window: float):
+    """
+    Builds the order streams of the monitored accounts along with the writer they share.
+    """
+    cfg: TradeConfig = obj["cfg"]
+    db: TraderDatabase = obj["db"]
+    broker: AlpacaClient = obj["broker"]
+    log = logging.getLogger("pytrader.broker.order_monitor")
+    accounts = _monitored_accounts(obj)
+    primary = accounts[0]
+    journal: OrderJournal = obj["journal"]
+    settler = services.TradeSettler(db, _order_finder(broker, journal))
+
+    def _on_flush(orders: dict[str, dict]):
+        streams.on_flush(orders)
+        # Trades are only placed with the primary account
+        settler.on_orders({k: o for k, o in orders.items() if primary.owns(k, o)})
+
+    writer = services.OrderEventWriter(db.merge_orders, broker.order_to_dict, window=flush_window, on_flush=_on_flush)
+
+    notifications = obj["notifications"] if cfg.orders_send_gchat else None
+
+    async def _trade_event_handler(account: "MonitoredAccount", event: str, order):
+        key = account.order_key(order.id)
+        writer.submit(key, order)
+        try:
+            journal.append(key, event, broker.order_to_dict(order))
+        except Exception as e:
+            log.error(f"Unable to journal {event} of order {order.id}: {e}")
+        on = f" on {account.name}" if len(accounts) > 1 else ""
+        log.info(f"{event}: {order.side.name} {order.order_type.name} order {order.symbol}{on}.")
+        if notifications is not None and event in _notified_order_events:
+            notifications.add(f"{event}: {order.side.name} {order.filled_qty}/{order.qty} {order.symbol}{on}.")
+
+    streams = services.AccountStreams(accounts, _trade_event_handler)
+    return writer, streams
+
+
+def _monitored_accounts(obj: LazyServices) -> list["MonitoredAccount"]:
+    """
+    The broker's account keeps the alpaca_<id> order keys, each configured further account is keyed by its name.
+    """
+    cfg: TradeConfig = obj["cfg"]
+    broker: AlpacaClient = obj["broker"]
+    if obj["simulation"] is not None:
+        # The other accounts are real ones, a simulation only streams its own broker
+        checkpoint = services.StreamCheckpoint(os.path.join(obj["simulation"], "order_monitor.json"))
+        return [services.MonitoredAccount("simulated", broker, "alpaca", checkpoint)]
+
+    checkpoints = os.path.join(cache.get_manager().root, "order_monitor")
+    name = "paper" if broker.paper else "live"
+    checkpoint = services.StreamCheckpoint(os.path.join(checkpoints, f"{name}.json"))
+    accounts = [services.MonitoredAccount(name, broker, "alpaca", checkpoint)]
+
+    for account in cfg.monitor_accounts:
+        # Alpaca rate limits each account on its own
+        policy = services.CallPolicy(TokenBucket.per_minute(cfg.broker_rate_per_minute))
+        client = services.AlpacaClient(account.api_key, account.secret_key, account.paper, policy)
+        checkpoint = services.StreamCheckpoint(os.path.join(checkpoints, "accounts", f"{account.name}.json"))
+        accounts.append(services.MonitoredAccount(account.name, client, f"alpaca_{account.name}", checkpoint))
+    return accounts
 
-    system_signal.signal(system_signal.SIGINT, signal_handler)
-    system_signal.signal(system_signal.SIGTERM, signal_handler)
 
-    log.info("Starting order stream.")
-    broker.get_order_stream(_trade_event_handler)
+@cli.command()
+@click.pass_context
+@click.option(
+    "--timeframe",
+    type=click.Choice(["1d", "1h", "15m"]),
+    default=None,
+    help="Bar size to evaluate, defaults to rsi_timeframe from the configuration.",
+)
+@click.option("--replay", default=None, help="Replay a pickled (date, ticker) panel of bars instead of live prices.")
+def stream(ctx: click.Context, timeframe: str, replay: str):
+    """Evaluate RSI signals on live prices and record them as provisional signals."""
+    obj: LazyServices = ctx.obj
+    cfg: TradeConfig = obj["cfg"]
+    tf = get_timeframe(timeframe or cfg.rsi_timeframe)
+    log = logging.getLogger("pytrader.signals.stream")
+
+    prices = services.ReplayPrices.from_pickle(replay) if replay else obj["broker"]
+    before = tf.bar_start(prices.start if replay else localtime.today())
+    evaluator, writes = _signal_stream(obj, tf, before)
+    elapsed = 0.0
+
+    def _on_price(symbol: str, timestamp, price: float):
+        nonlocal elapsed
+        started = time.perf_counter()
+        evaluator.on_price(symbol, timestamp, price)
+        elapsed += time.perf_counter() - started
+
+    async def _run():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (system_signal.SIGINT, system_signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+
+        prices_task = asyncio.create_task(prices.stream_prices(_on_price, list(evaluator.states)), name="prices")
+        stopped = asyncio.create_task(stop.wait())
+        done, _ = await asyncio.wait([stopped, prices_task], return_when=asyncio.FIRST_COMPLETED)
+        if prices_task in done and prices_task.exception() is not None:
+            log.error("Price stream stopped unexpectedly.", exc_info=prices_task.exception())
+        for task in (stopped, prices_task):
+            task.cancel()
+        await asyncio.gather(stopped, prices_task, return_exceptions=True)
+
+    log.info(f"Streaming {tf.name} RSI signals for {len(evaluator.states)} symbols.")
+    try:
+        asyncio.run(_run())
+    finally:
+        writes.shutdown(wait=True)
+    if evaluator.ticks:
+        log.info(f"Evaluated {evaluator.ticks} prices, {elapsed / evaluator.ticks * 1e6:.1f}us per price.")
+    profiling.count("prices_evaluated", evaluator.ticks)
+
+
+def _signal_stream(obj: LazyServices, timeframe: Timeframe, before):
+    """
+    Seeds the streaming evaluator with the scanned symbols' completed bars. Provisional signals are written
+    on a background thread so the database never holds up the price stream.
+    """
+    cfg: TradeConfig = obj["cfg"]
+    db: TraderDatabase = obj["db"]
+    log = logging.getLogger("pytrader.signals.stream")
+
+    scan = services.rsi_signals(
+        False,
+        timeframe.name,
+        cfg.rsi_lookback_bars,
+        cfg.rsi_scan_chunk_size,
+        cfg.rsi_workers,
+        incremental=cfg.rsi_incremental_bars,
+        data_provider=cfg.market_data_provider,
+    )
+    symbols = scan.triggers.records["symbol"].tolist() if scan.triggers is not None else []
+    with profiling.stage("seed_stream"):
+        download = (
+            services.get_alpaca_market_data
+            if cfg.market_data_provider == "alpaca"
+            else services.get_adjusted_market_data
+        )
+        bars = download(
+            symbols,
+            timeframe.interval,
+            end_date=before,
+            lookback_bars=cfg.rsi_lookback_bars,
+            incremental=cfg.rsi_incremental_bars,
+        )
+    writes = ThreadPoolExecutor(1, thread_name_prefix="provisional-signals")
+
+    def _store(signal: "ProvisionalSignal"):
+        key = _get_trade_key(signal.symbol, {"action": signal.action, "date": signal.bar}, timeframe)
+        metadata = {
+            "provisional": True,
+            "price": round(signal.price, 4),
+            "rsi": round(signal.rsi, 2),
+            "timeframe": timeframe.name,
+        }
+        # Without an execution date process-signals never acts on a provisional signal
+        model = SignalModel.create_signal(signal.symbol, f"{key}_provisional", signal.action, "RSI", metadata, None)
+        try:
+            if db.add_signal(model) is None:
+                log.debug(f"Provisional signal {model.id} was already recorded.")
+                return
+        except Exception as e:
+            log.error(f"Unable to record provisional signal {model.id}: {e}")
+            return
+        profiling.count("provisional_signals")
+        log.info(f"Provisional {signal.action} signal for {signal.symbol} at {signal.price:.2f}.")
+
+    evaluator = services.StreamingRsiEvaluator.from_panel(
+        bars, symbols, timeframe, lambda signal: writes.submit(_store, signal), before
+    )
+    return evaluator, writes
 
 
 @cli.command()
 @click.pass_context
 def complete_the_trade(ctx: click.Context):
-    db: TraderDatabase = ctx.obj["db"]
-    broker = ctx.obj["broker"]
+    """Settle every open trade. The order monitor settles trades as their orders finish, this catches any it missed."""
+    # The monitor appends to the journal from its own process, this one only reads it
+    journal = services.OrderJournal(_journal_path(ctx.obj), read_only=True)
+    _complete_the_trade(ctx.obj, journal)
+
+
+@profiling.stage("complete-the-trade")
+def _complete_the_trade(obj: LazyServices, journal: "OrderJournal" = None):
+    """
+    Settles every open trade whose orders have finished, resolving orders missing from the database first.
+    journal: OrderJournal - Journal to resolve missing orders from, the monitor's own when it runs in this process
+    """
+    db: TraderDatabase = obj["db"]
+    broker = obj["broker"]
+    journal = journal or obj["journal"]
+    find_order = _order_finder(broker, journal)
     log = logging.getLogger("pytrader.trade")
 
-    trades = db.get_trades()
-
-    for tradeDoc in trades:
-        trade = db.get_trade(tradeDoc.id)
+    for trade_id in db.get_trade_ids():
+        trade = db.get_trade(trade_id)
 
         trade_incomplete = len(trade.resolved_signals) < 2
         if trade_incomplete:
@@ -276,61 +718,235 @@ def complete_the_trade(ctx: click.Context):
             continue
 
         for signal in trade.resolved_signals:
-            if signal.resolvedOrder is None:
+            if signal.resolvedOrder is None and signal.orderId is not None:
                 log.debug(f"Order database is missing order for signal: {signal.id}")
-                broker_order = broker.get_order_by_id(signal.orderId)
+                ao_key = f"alpaca_{signal.orderId}"
+                broker_order = find_order(signal.orderId)
                 if broker_order is not None:
                     signal.resolvedOrder = broker_order
-                    ao_key = f"alpaca_{signal.orderId}"
                     db.upsert_order(ao_key, broker_order)
                 else:
                     logging.warning(f"Unable to locate order for {signal.id}: {signal.orderId}")
                     trade_incomplete = True
                     break
 
-            order_status = signal.resolvedOrder.get("status") or None
-            if not order_status:
-                log.warning(f"Closing trade for {signal.id}: No corresponding order found.")
-                trade.status = "canceled"
-                trade.canceled_reason = "Order not found on broker."
-                db.close_trade(trade)
-                trade_incomplete = True
-            elif order_status.lower() == "expired":
-                log.warning(f"Closing trade for {signal.id}: Order expired on broker.")
-                trade.status = "canceled"
-                trade.canceled_reason = "Order expired on broker."
-                db.close_trade(trade)
-                trade_incomplete = True
-            elif order_status.lower() not in ["filled", "partially_filled"]:
-                log.warning(f"Skipping {signal.id}: Order is {order_status}")
-                trade_incomplete = True
-
         if trade_incomplete:
             log.debug(f"Ignoring trade {trade.id} as it is incomplete.")
             continue
 
-        open_order = trade.resolved_signals[0].resolvedOrder
-        close_order = trade.resolved_signals[-1].resolvedOrder
+        if services.settle_trade(trade):
+            db.close_trade(trade)
+            profiling.count("trades_settled")
 
-        open_qty = float(open_order["qty"])
-        close_qty = float(close_order["qty"])
+        # log.info(trade.id, trade.market_exposure, trade.revenue, format(trade.result_pct, ".2%"))
 
-        if open_qty - close_qty != 0:
-            log.debug(f"Ignoring trade {trade.id}, quantities don't match. Open qty: {open_qty} Close qty: {close_qty}")
-            continue
 
-        trade.cost_basis = float(open_order["filled_avg_price"])
-        trade.sale_price = float(close_order["filled_avg_price"])
-        trade.result_pct = round((trade.sale_price - trade.cost_basis) / trade.cost_basis, 4)
-        trade.revenue = round((trade.sale_price - trade.cost_basis) * open_qty, 2)
+def _order_finder(broker: "AlpacaClient", journal: "OrderJournal"):
+    """
+    Looks up an order missing from the database by its broker id.
+    """
 
-        trade.opened_on = open_order["filled_at"]
-        trade.closed_on = close_order["filled_at"]
-        trade.market_exposure = (trade.closed_on - trade.opened_on).days
+    def _find(order_id: str) -> dict | None:
+        # The monitor's journal has every order it saw, the broker is only asked for the rest
+        return journal.order(f"alpaca_{order_id}") or broker.get_order_by_id(order_id)
 
-        db.close_trade(trade)
+    return _find
 
-        # log.info(trade.id, trade.market_exposure, trade.revenue, format(trade.result_pct, ".2%"))
+
+@cli.command()
+@click.pass_context
+@click.option("--full", is_flag=True, help="Re-read every closed trade instead of only the newly settled ones.")
+@click.option(
+    "--path",
+    default=None,
+    help="Columnar export of the closed trades, defaults to analytics/trades.npz under cache_dir or the simulation.",
+)
+@click.option("--top", default=10, show_default=True, help="Number of symbols to list.")
+def analytics(ctx: click.Context, full: bool, path: str, top: int):
+    """Summarize closed trades: P&L, drawdown, win rate and results per symbol."""
+    db: TraderDatabase = ctx.obj["db"]
+    log = logging.getLogger("pytrader.analytics")
+
+    if path is None:
+        path = os.path.join(ctx.obj["simulation"] or cache.get_manager().root, "analytics", "trades.npz")
+    trades = services.ClosedTrades(path).load()
+    trades.refresh(db, full=full)
+    trades.save()
+
+    summary = services.summarize_trades(trades)
+    if summary["trades"] == 0:
+        log.info("No closed trades yet.")
+        return
+
+    log.info(
+        f"{summary['trades']} trades, revenue {summary['revenue']:.2f}, win rate {summary['win_rate']:.1%}, "
+        f"profit factor {summary['profit_factor']:.2f}, max drawdown {summary['max_drawdown']:.2f}."
+    )
+    log.info(
+        f"Average win {summary['average_win']:.2f}, average loss {summary['average_loss']:.2f}, "
+        f"{summary['average_exposure_days']:.1f} days in the market per trade, "
+        f"{summary['exposure_adjusted_return']:.3%} return per day of exposure."
+    )
+
+    stats = services.per_symbol_stats(trades)
+    for i in range(min(top, len(stats["symbol"]))):
+        log.info(
+            f"{stats['symbol'][i]}: {stats['trades'][i]} trades, win rate {stats['win_rate'][i]:.1%}, "
+            f"revenue {stats['revenue'][i]:.2f}, average return {stats['average_return'][i]:.2%}."
+        )
+
+
+@cli.command()
+@click.pass_context
+@click.option("--sessions", default=None, type=int, help="Sessions to replay, defaults to every remaining bar.")
+@click.option(
+    "--until",
+    default=None,
+    type=click.DateTime(["%Y-%m-%d"]),
+    help="Last session to replay, defaults to the last bar.",
+)
+def backtest(ctx: click.Context, sessions: int, until):
+    """Replay a --simulate panel: every session fills orders, then scans, processes signals and settles trades."""
+    obj: LazyServices = ctx.obj
+    if obj["simulation"] is None:
+        raise click.UsageError("backtest replays a simulation, pass the bars with --simulate.")
+
+    broker = obj["broker"]
+    log = logging.getLogger("pytrader.backtest")
+    end = until.date() if until else broker.sessions[-1]
+    writer, streams = _order_monitor(obj, flush_window=0)
+    account = streams.accounts[0]
+    events = []
+
+    def _record(event: str, order):
+        events.append((event, order))
+
+    async def _replay():
+        for event, order in events:
+            await streams.handler(account, event, order)
+
+    def _monitor():
+        """
+        Hands the session's order events to the monitor's handler and writes them, as the order stream would.
+        """
+        asyncio.run(_replay())
+        events.clear()
+        writer.flush()
+
+    broker.add_listener(_record)
+    replayed = 0
+    try:
+        while broker.today < end and (sessions is None or replayed < sessions) and broker.advance():
+            replayed += 1
+            _monitor()
+            _scan_rsi(obj, refresh=True, timeframe=DAILY.name)
+            _process_signals(obj)
+            _monitor()
+            _complete_the_trade(obj)
+
+            enabled, account_info = broker.account()
+            log.info(
+                f"{broker.today}: portfolio value {float(account_info.portfolio_value):.2f}, "
+                f"cash {float(account_info.cash):.2f}, {len(broker.positions)} positions."
+            )
+    finally:
+        broker.remove_listener(_record)
+        writer.close()
+    log.info(f"Replayed {replayed} sessions, the simulation is at {broker.today}.")
+
+
+@cli.group("cache")
+@click.pass_context
+def cache_group(ctx: click.Context):
+    """Inspect and prune the on-disk caches."""
+    # Loading the configuration points the cache manager at the configured root and budgets
+    ctx.obj["cfg"]
+
+
+@cache_group.command("stats")
+def cache_stats():
+    """Show the size, age budget and hit rate of every cache."""
+    log = logging.getLogger("pytrader.cache")
+    for stats in cache.get_manager().stats():
+        budget = f"{stats['max_bytes'] / 1024**2:.0f} MB" if stats["max_bytes"] else "unlimited"
+        oldest = f"{stats['oldest_days']:.1f} days" if stats["oldest_days"] is not None else "n/a"
+        hit_rate = f"{stats['hit_rate']:.1%}" if stats["hit_rate"] is not None else "n/a"
+        log.info(
+            f"{stats['name']}: {stats['bytes'] / 1024**2:.1f} MB of {budget} in {stats['entries']} entries, "
+            f"oldest used {oldest} ago, hit rate {hit_rate} ({stats['hits']} hits, {stats['misses']} misses). "
+            f"{stats['path']}"
+        )
+
+
+@cache_group.command("prune")
+def cache_prune():
+    """Evict cache entries past their age budget and the least recently used ones over the size budget."""
+    log = logging.getLogger("pytrader.cache")
+    result = cache.get_manager().prune()
+    removed = sum(r[0] for r in result.values())
+    freed = sum(r[1] for r in result.values())
+    log.info(f"Evicted {removed} entries, freed {freed / 1024**2:.1f} MB.")
+
+
+@cli.command()
+@click.pass_context
+@click.option(
+    "--flush-window",
+    default=0.5,
+    show_default=True,
+    help="Seconds to coalesce order updates before writing them.",
+)
+def run(ctx: click.Context, flush_window: float):
+    """Scan, process signals and complete trades on a schedule while monitoring orders."""
+    obj: LazyServices = ctx.obj
+    cfg: TradeConfig = obj["cfg"]
+    broker: AlpacaClient = obj["broker"]
+    log = logging.getLogger("pytrader.daemon")
+
+    enabled, account = broker.account()
+    if not enabled:
+        log.error("Account is not enabled for trading. Exiting.")
+        return -1
+
+    scheduler = services.SessionScheduler(
+        broker.calendar,
+        [
+            services.ScheduledJob("rsi", cfg.scan_time, lambda: _scan_rsi(obj, refresh=True)),
+            services.ScheduledJob("process-signals", cfg.process_time, lambda: _process_signals(obj)),
+            services.ScheduledJob("complete-the-trade", cfg.complete_time, lambda: _complete_the_trade(obj)),
+            services.ScheduledJob("prune-cache", cfg.complete_time, lambda: cache.get_manager().prune()),
+        ],
+    )
+    writer, streams = _order_monitor(obj, flush_window)
+
+    async def _run():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (system_signal.SIGINT, system_signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+
+        tasks = [
+            asyncio.create_task(scheduler.run(), name="scheduler"),
+            asyncio.create_task(streams.run(), name="orders"),
+        ]
+        stopped = asyncio.create_task(stop.wait())
+        done, _ = await asyncio.wait([stopped, *tasks], return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task is not stopped and task.exception() is not None:
+                log.error(f"{task.get_name()} stopped unexpectedly.", exc_info=task.exception())
+
+        log.info("Shutting down.")
+        for task in [stopped, *tasks]:
+            task.cancel()
+        await asyncio.gather(stopped, *tasks, return_exceptions=True)
+
+    log.info("Starting pytrader daemon.")
+    writer.start()
+    try:
+        asyncio.run(_run())
+    finally:
+        writer.close()
+    log.info("Gracefully shutdown. Exiting")
 
 
 if __name__ == "__main__":
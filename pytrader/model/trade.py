@@ -1,8 +1,8 @@
 from dataclasses import dataclass
 from datetime import datetime
-import pytz
 
 from pytrader.model import SignalModel
+from pytrader.utils import localtime
 
 
 @dataclass
@@ -58,5 +58,5 @@ class TradeModel:
 
     @staticmethod
     def create_trade(symbol, trade_id: str, strategy: str, signals: list[str]):
-        timestamp = datetime.now(pytz.timezone("US/Eastern"))
+        timestamp = localtime.today()
         return TradeModel(trade_id, symbol, timestamp, strategy, signals=signals, status="created")
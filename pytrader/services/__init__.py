@@ -1,6 +1,60 @@
-from .tickers import get_tickers
-from .yf_data import get_adjusted_market_data
-from .rsi_signal_provider import rsi_signals
-from .alpaca import AlpacaClient
-from .database import TraderDatabase
-from .google_chat_notifications import GoogleChatNotification
\ No newline at end of file
+import importlib
+
+# Services are imported on first attribute access so that a command only pays for the
+# dependencies it uses, e.g. the order monitor never imports pandas or yfinance.
+
+_exports = {
+    "get_tickers": ".tickers",
+    "get_adjusted_market_data": ".yf_data",
+    "get_alpaca_market_data": ".alpaca_data",
+    "configure_alpaca_data": ".alpaca_data",
+    "AlpacaBars": ".alpaca_data",
+    "rsi_signals": ".rsi_signal_provider",
+    "panel_rsi_signals": ".rsi_signal_provider",
+    "MarketCalendar": ".market_calendar",
+    "StreamCheckpoint": ".stream_checkpoint",
+    "AccountStreams": ".account_monitor",
+    "MonitoredAccount": ".account_monitor",
+    "CallPolicy": ".call_policy",
+    "BrokerError": ".call_policy",
+    "RateLimitedError": ".call_policy",
+    "TransientBrokerError": ".call_policy",
+    "NotFoundError": ".call_policy",
+    "RejectedError": ".call_policy",
+    "AlpacaClient": ".alpaca",
+    "TraderDatabase": ".database",
+    "LocalDatabase": ".local_database",
+    "OrderEventWriter": ".order_writer",
+    "OrderJournal": ".order_journal",
+    "JournalEvent": ".order_journal",
+    "OrderExecutor": ".order_executor",
+    "OrderIntent": ".order_executor",
+    "ExecutionResult": ".order_executor",
+    "SimulatedBroker": ".sim_broker",
+    "TradeSettler": ".trade_settlement",
+    "settle_trade": ".trade_settlement",
+    "ClosedTrades": ".trade_analytics",
+    "summarize_trades": ".trade_analytics",
+    "per_symbol_stats": ".trade_analytics",
+    "ProvisionalSignal": ".signal_stream",
+    "ReplayPrices": ".signal_stream",
+    "StreamingRsiEvaluator": ".signal_stream",
+    "ScheduledJob": ".scheduler",
+    "SessionScheduler": ".scheduler",
+    "GoogleChatNotification": ".google_chat_notifications",
+    "NotificationDispatcher": ".notification_dispatcher",
+}
+
+__all__ = list(_exports)
+
+
+def __getattr__(name: str):
+    if name not in _exports:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_exports[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+from .stream_checkpoint import StreamCheckpoint
+
+
+@dataclass
+class MonitoredAccount:
+    """
+    An account whose trade updates the order monitor streams.
+    name: str - Account name, used in logs and notifications
+    broker: AlpacaClient - Client of the account, its stream_orders is run
+    key_prefix: str - Prefix of the account's order keys, keeps the accounts' documents apart
+    checkpoint: StreamCheckpoint - How far the account's stream has been persisted
+    """
+
+    name: str
+    broker: Any
+    key_prefix: str = "alpaca"
+    checkpoint: StreamCheckpoint = None
+
+    def order_key(self, order_id) -> str:
+        return f"{self.key_prefix}_{order_id}"
+
+    def owns(self, order_key: str, order: dict) -> bool:
+        return order_key == self.order_key(order["id"])
+
+
+class AccountStreams:
+    """
+    Runs the trade update streams of several accounts on one event loop, feeding a shared handler so the
+    accounts share a single writer, journal and database client. A stream that fails or ends is restarted
+    on its own with a growing delay, the other accounts keep streaming.
+    accounts: list[MonitoredAccount] - Accounts to stream, order keys must be distinct
+    handler: Callable - Async handler receiving the account, the event name and the broker order
+    min_backoff: float - Seconds before the first restart of a stream
+    max_backoff: float - Longest wait between restarts, a stream that ran this long restarts after min_backoff again
+    """
+
+    def __init__(
+        self,
+        accounts: list[MonitoredAccount],
+        handler: Callable[[MonitoredAccount, str, Any], Awaitable[None]],
+        min_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+    ):
+        if len({a.key_prefix for a in accounts}) != len(accounts):
+            raise ValueError("Every monitored account needs its own order key prefix")
+        self.accounts = accounts
+        self.handler = handler
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.restarts = {a.name: 0 for a in accounts}
+        self.log = logging.getLogger("pytrader.broker.accounts")
+
+    async def run(self):
+        """
+        Streams every account until cancelled.
+        """
+        tasks = [asyncio.create_task(self._supervise(a), name=f"orders-{a.name}") for a in self.accounts]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def on_flush(self, orders: dict[str, dict]):
+        """
+        Advances each account's checkpoint past its orders in a flushed batch.
+        orders: dict - Serialized orders keyed by order key
+        """
+        for account in self.accounts:
+            if account.checkpoint is None:
+                continue
+            owned = {k: o for k, o in orders.items() if account.owns(k, o)}
+            if owned:
+                account.checkpoint.advance(owned)
+
+    async def _supervise(self, account: MonitoredAccount):
+        async def _handle(event: str, order):
+            await self.handler(account, event, order)
+
+        backoff = self.min_backoff
+        while True:
+            started = time.monotonic()
+            try:
+                await account.broker.stream_orders(_handle, raw_orders=True, checkpoint=account.checkpoint)
+                reason = "ended"
+            except Exception as e:
+                reason = f"failed: {e}"
+
+            # A stream that stayed up for a while is healthy again, so it restarts quickly
+            if time.monotonic() - started >= self.max_backoff:
+                backoff = self.min_backoff
+            self.log.error(f"Order stream of {account.name} {reason}, restarting in {backoff:.0f}s.")
+            self.restarts[account.name] += 1
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
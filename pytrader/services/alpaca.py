@@ -1,5 +1,13 @@
+import asyncio
 import datetime
-from typing import Callable
+import logging
+import os
+from collections import OrderedDict
+from typing import Callable, Iterator
+import websockets
+from alpaca.data.enums import DataFeed
+from alpaca.data.live import StockDataStream
+from alpaca.data.models import Bar
 from alpaca.trading.client import TradingClient
 from alpaca.trading.stream import TradingStream
 from alpaca.trading.models import TradeUpdate, Order
@@ -11,45 +19,184 @@ from alpaca.trading.requests import (
     StopLossRequest,
 )
 from alpaca.trading.enums import OrderSide, QueryOrderStatus, TimeInForce, OrderClass
-from alpaca.common.exceptions import APIError
+from alpaca.common.enums import Sort
 
-from pytrader.utils import localtime
+from pytrader.utils import cache, localtime
+from .call_policy import CallPolicy, NotFoundError, RejectedError
+from .market_calendar import MarketCalendar
+from .stream_checkpoint import StreamCheckpoint
+
+
+class _ResyncingTradingStream(TradingStream):
+    """
+    TradingStream that runs a callback every time the websocket (re)connects.
+    Dropped connections are reconnected as TradingStream does, any other error closes the connection and is
+    raised to the caller, which owns restarting the stream, instead of being logged and retried every 10ms.
+    """
+
+    def __init__(self, *args, on_connect: Callable = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._on_connect = on_connect
+
+    async def _start_ws(self):
+        await super()._start_ws()
+        if self._on_connect:
+            try:
+                await self._on_connect()
+            except BaseException:
+                # The socket is already authenticated and subscribed, close it so a retry opens the only one
+                await self.close()
+                raise
+
+    async def _run_forever(self):
+        self._loop = asyncio.get_running_loop()
+        self._should_run = True
+        self._running = False
+        log = logging.getLogger("pytrader.broker.stream")
+        while self._should_run:
+            try:
+                if not self._running:
+                    await self._start_ws()
+                    self._running = True
+                await self._consume()
+            except websockets.WebSocketException as e:
+                await self.close()
+                log.warning(f"Trade update connection dropped, reconnecting: {e}")
+                await asyncio.sleep(0.01)
+            except BaseException:
+                await self.close()
+                raise
 
 
 class AlpacaClient:
-    def __init__(self, api_key, secret_key, use_paper=True):
+    def __init__(self, api_key, secret_key, use_paper=True, policy: CallPolicy = None):
         self.api_key = api_key
         self.secret_key = secret_key
         self.paper = use_paper
         self.client = TradingClient(api_key, secret_key, paper=use_paper)
+        # Retries are owned by the call policy, so turn off alpaca-py's fixed-delay retry of 429/504
+        self.client._retry_codes = []
+        self.policy = policy or CallPolicy()
+        self.calendar = MarketCalendar(
+            self._fetch_sessions,
+            os.path.join(cache.get_manager().root, "calendar", "alpaca.json"),
+        )
 
         self._streamer = None
+        self._price_streamer = None
 
     def account(self):
-        result = self.client.get_account()
+        result = self.policy.call("get_account", self.client.get_account)
         disabled = (result.account_blocked or result.trading_blocked) or not result.status == "ACTIVE"
 
         return (not disabled, result)
 
-    def get_order_stream(self, trade_updates_handler: Callable[[str, dict], None]) -> None:
-        async def _handle_trade_update(event: TradeUpdate):
-            ao = self._order_to_dict(event.order)
-            await trade_updates_handler(event.event, ao)
-
+    def get_order_stream(
+        self,
+        trade_updates_handler: Callable[[str, dict], None],
+        raw_orders: bool = False,
+        checkpoint: StreamCheckpoint = None,
+    ) -> None:
+        """
+        Streams trade updates to the handler until the stream is closed, raising errors other than dropped connections.
+        trade_updates_handler: Callable - Async handler receiving the event name and the order
+        raw_orders: bool - Pass the broker Order instead of converting it with order_to_dict
+        checkpoint: StreamCheckpoint - When set, every (re)connect first replays the orders that changed
+            since the checkpoint with a single paged order query, skipping updates that were already seen
+        """
         if trade_updates_handler:
-            trade_stream_client = TradingStream(self.api_key, self.secret_key, self.paper)
-            trade_stream_client.subscribe_trade_updates(_handle_trade_update)
+            trade_stream_client = self._build_order_stream(trade_updates_handler, raw_orders, checkpoint)
             trade_stream_client.run()
             self._streamer = trade_stream_client
         else:
             return None
 
+    async def stream_orders(
+        self,
+        trade_updates_handler: Callable[[str, dict], None],
+        raw_orders: bool = False,
+        checkpoint: StreamCheckpoint = None,
+    ) -> None:
+        """
+        Same as get_order_stream but runs on the caller's event loop until cancelled or failed.
+        """
+        trade_stream_client = self._build_order_stream(trade_updates_handler, raw_orders, checkpoint)
+        self._streamer = trade_stream_client
+        try:
+            await trade_stream_client._run_forever()
+        finally:
+            await trade_stream_client.close()
+
+    def _build_order_stream(
+        self,
+        trade_updates_handler: Callable[[str, dict], None],
+        raw_orders: bool,
+        checkpoint: StreamCheckpoint,
+    ) -> TradingStream:
+        log = logging.getLogger("pytrader.broker.stream")
+        seen: OrderedDict[str, datetime.datetime] = OrderedDict()
+
+        async def _dispatch(event: str, order: Order):
+            order_id = str(order.id)
+            last_seen = seen.get(order_id)
+            if last_seen is not None and order.updated_at <= last_seen:
+                return
+            seen[order_id] = order.updated_at
+            seen.move_to_end(order_id)
+            if len(seen) > 10_000:
+                seen.popitem(last=False)
+
+            ao = order if raw_orders else self.order_to_dict(order)
+            await trade_updates_handler(event, ao)
+
+        async def _handle_trade_update(event: TradeUpdate):
+            await _dispatch(event.event, event.order)
+
+        async def _backfill():
+            after = checkpoint.resume_from()
+            if after is None:
+                return
+
+            orders = await asyncio.to_thread(lambda: list(self.get_orders_since(after)))
+            missed = [o for o in self._flatten_orders(orders) if checkpoint.is_newer(o.updated_at)]
+            log.info(f"Replaying {len(missed)} order updates missed since {after}.")
+            for order in sorted(missed, key=lambda o: o.updated_at):
+                await _dispatch("resync", order)
+
+        on_connect = _backfill if checkpoint is not None else None
+        trade_stream_client = _ResyncingTradingStream(self.api_key, self.secret_key, self.paper, on_connect=on_connect)
+        trade_stream_client.subscribe_trade_updates(_handle_trade_update)
+        return trade_stream_client
+
+    async def stream_prices(
+        self,
+        price_handler: Callable[[str, datetime.datetime, float], None],
+        symbols: list[str],
+        feed: str = "iex",
+    ) -> None:
+        """
+        Streams the symbols' minute bars to the handler as (symbol, bar start, close) until cancelled.
+        price_handler: Callable - Called on the event loop for every bar, so it has to return quickly
+        feed: str - Market data feed, iex on the free plan or sip with a subscription
+        """
+        price_stream_client = StockDataStream(self.api_key, self.secret_key, feed=DataFeed(feed))
+
+        async def _handle_bar(bar: Bar):
+            price_handler(bar.symbol, bar.timestamp, bar.close)
+
+        price_stream_client.subscribe_bars(_handle_bar, *symbols)
+        self._price_streamer = price_stream_client
+        try:
+            await price_stream_client._run_forever()
+        finally:
+            await price_stream_client.close()
+
     def close_stream(self):
         if self._streamer:
             self._streamer.stop()
             self._streamer.close()
 
-    def _order_to_dict(self, order: Order) -> dict:
+    def order_to_dict(self, order: Order) -> dict:
         alpaca_order = {
             "id": str(order.id),
             "client_order_id": order.client_order_id,
@@ -79,7 +226,7 @@ class AlpacaClient:
             "stop_price": float(order.stop_price) if order.stop_price else None,
             "status": order.status.name,
             "extended_hours": order.extended_hours,
-            "legs": [self._order_to_dict(leg) for leg in order.legs] if order.legs else None,
+            "legs": [self.order_to_dict(leg) for leg in order.legs] if order.legs else None,
             "trail_percent": float(order.trail_percent) if order.trail_percent else None,
             "trail_price": float(order.trail_price) if order.trail_price else None,
             "hwm": order.hwm if order.hwm else None,
@@ -94,13 +241,44 @@ class AlpacaClient:
         Closes an order.
         order_id: str - The ID of the order
         """
-        return self.client.cancel_order_by_id(order_id)
+        return self.policy.call("cancel_order", self.client.cancel_order_by_id, order_id)
 
     def get_orders(self):
         """
         Returns a list of all orders.
         """
-        return self.client.get_orders()
+        return self.policy.call("get_orders", self.client.get_orders)
+
+    def get_orders_since(self, after: datetime.datetime, page_size: int = 500) -> Iterator[Order]:
+        """
+        Yields every order submitted after a point in time, oldest first, paging through the results.
+        after: datetime - Orders submitted at or before this time are excluded
+        page_size: int - Orders requested per page, 500 at most
+        """
+        yielded = set()
+        while True:
+            request = GetOrdersRequest(
+                status=QueryOrderStatus.ALL,
+                after=after,
+                direction=Sort.ASC,
+                limit=page_size,
+                nested=True,
+            )
+            page = self.policy.call("get_orders", self.client.get_orders, request)
+            new_orders = [order for order in page if order.id not in yielded]
+            yield from new_orders
+
+            if len(page) < page_size or not new_orders:
+                return
+            yielded.update(order.id for order in new_orders)
+            # Step back a tick so orders sharing the last timestamp are not skipped by the exclusive bound
+            after = page[-1].submitted_at - datetime.timedelta(microseconds=1)
+
+    def _flatten_orders(self, orders: list[Order]) -> Iterator[Order]:
+        for order in orders:
+            yield order
+            if order.legs:
+                yield from self._flatten_orders(order.legs)
 
     def get_order_by_id(self, order_id):
         """
@@ -109,61 +287,56 @@ class AlpacaClient:
         """
         if order_id is None:
             return None
-        return self._order_to_dict(self.client.get_order_by_id(order_id))
+        return self.order_to_dict(self.policy.call("get_order", self.client.get_order_by_id, order_id))
 
     def get_open_orders(self):
         """
         Returns a list of all open orders.
         """
-        return self.client.get_orders(GetOrdersRequest(status=QueryOrderStatus.OPEN))
+        request = GetOrdersRequest(status=QueryOrderStatus.OPEN)
+        return self.policy.call("get_orders", self.client.get_orders, request)
 
     def get_positions(self):
         """
         Returns a list of all open positions.
         """
-        return self.client.get_all_positions()
+        return self.policy.call("get_positions", self.client.get_all_positions)
 
     def get_position_for(self, symbol):
         """
         Returns a list of all open positions for a specific symbol.
         """
         try:
-            return self.client.get_open_position(symbol)
-        except APIError as e:
-            if e.code == 40410000:  # Position not found
-                return None
-            raise e
+            return self.policy.call("get_position", self.client.get_open_position, symbol)
+        except NotFoundError:
+            return None
 
-    def get_open_market_days_since(self, since: datetime.date, till: datetime.date = datetime.date.today()):
+    def get_open_market_days_since(self, since: datetime.date, till: datetime.date = None):
         """
-        Returns the open market days in the last week.
+        Returns the open market days between two dates (inclusive).
+        since: date - The first day of the range
+        till: date - The last day of the range, defaults to today
         """
-        end_date = till
-        start_date = since
-        request = GetCalendarRequest(start=start_date, end=end_date)
-        calendar = self.client.get_calendar(request)
-        return [day.date for day in calendar if day.date.weekday() < 5 and day.open is not None]
+        till = till or localtime.today().date()
+        return self.calendar.market_days_between(since, till)
 
     def get_next_trade_day(self):
         """
         Returns the next open market day.
         """
-        today = localtime.today()
+        return self.calendar.next_trade_day()
 
-        upcoming_trade_days = self.get_open_market_days_since(today.date(), today.date() + datetime.timedelta(days=10))
-        if len(upcoming_trade_days) > 1:
-            timezone_aware_date = localtime.to_day(upcoming_trade_days[0])
-            if timezone_aware_date.date() == today.date() and today.hour > 15:
-                timezone_aware_date = localtime.to_day(upcoming_trade_days[1])
-            return timezone_aware_date
-        return None
+    def _fetch_sessions(self, start: datetime.date, end: datetime.date) -> list[datetime.date]:
+        request = GetCalendarRequest(start=start, end=end)
+        calendar = self.policy.call("get_calendar", self.client.get_calendar, request)
+        return [day.date for day in calendar if day.date.weekday() < 5 and day.open is not None]
 
     def close_position(self, symbol):
         """
         Closes a position.
         symbol: str - The symbol of the position
         """
-        return self.client.close_position(symbol)
+        return self.policy.call("close_position", self.client.close_position, symbol, idempotent=False)
 
     def buy_with_stop_loss(
         self,
@@ -172,8 +345,15 @@ class AlpacaClient:
         limit_price: float,
         stop_price: float,
         time_in_force=TimeInForce.DAY,
+        client_order_id: str = None,
     ):
+        """
+        Places a limit buy with an attached stop loss.
+        client_order_id: str - Idempotency key, when set a submission whose outcome is unknown is retried
+            and a duplicate rejection resolves to the order that was already accepted
+        """
         request = LimitOrderRequest(
+            client_order_id=client_order_id,
             symbol=symbol,
             qty=qty,
             limit_price=limit_price,
@@ -183,5 +363,20 @@ class AlpacaClient:
             stop_loss=StopLossRequest(stop_price=stop_price),
         )
 
-        response = self.client.submit_order(request)
-        return response
+        try:
+            return self.policy.call(
+                "submit_order", self.client.submit_order, request, idempotent=client_order_id is not None
+            )
+        except RejectedError:
+            if client_order_id is None:
+                raise
+            existing = self._get_order_by_client_id(client_order_id)
+            if existing is None:
+                raise
+            return existing
+
+    def _get_order_by_client_id(self, client_order_id: str) -> Order | None:
+        try:
+            return self.policy.call("get_order", self.client.get_order_by_client_id, client_order_id)
+        except NotFoundError:
+            return None
@@ -0,0 +1,210 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import requests
+from alpaca.common.exceptions import APIError
+
+from pytrader.utils import cache, profiling
+from pytrader.utils.timeframe import Timeframe, get_timeframe
+from .call_policy import CallPolicy
+
+ny_tz = "America/New_York"
+
+# Alpaca's hourly bars start on the hour, so hours are built from half hours to start at 9:30 like the scan's
+_request_timeframes = {"1d": "1Day", "1h": "30Min", "15m": "15Min"}
+_columns = ["close", "high", "low", "open", "volume"]
+
+
+class AlpacaBars:
+    """
+    Downloads bars from Alpaca's multi-symbol historical bars endpoint as the (date, ticker) panel
+    get_adjusted_market_data returns, so filtering and the scan work on either.
+    Symbols are requested in batches and long ranges in date windows, each batch and window following
+    its own page chain, and the chains are fetched concurrently within the policy's rate budget.
+    feed: str - Market data feed, iex on the free plan or sip with a subscription
+    adjustment: str - Corporate action adjustment of the prices, raw, split, dividend or all
+    policy: CallPolicy - Rate limits and retries the requests, Alpaca allows 200 data requests a minute
+    workers: int - Page chains fetched at once
+    symbols_per_request: int - Symbols per request, long symbol lists are split over several chains
+    page_size: int - Bars per page, at most 10000
+    base_url: str - Data API root, e.g. a local stub in tests
+    """
+
+    base_url = "https://data.alpaca.markets"
+
+    def __init__(
+        self,
+        api_key: str,
+        secret_key: str,
+        feed: str = "iex",
+        adjustment: str = "all",
+        policy: CallPolicy = None,
+        workers: int = 4,
+        symbols_per_request: int = 100,
+        page_size: int = 10000,
+        base_url: str = None,
+    ):
+        self.feed = feed
+        self.adjustment = adjustment
+        self.policy = policy or CallPolicy()
+        self.workers = workers
+        self.symbols_per_request = symbols_per_request
+        self.page_size = page_size
+        self.base_url = (base_url or self.base_url).rstrip("/")
+        self.session = requests.Session()
+        self.session.headers.update({"APCA-API-KEY-ID": api_key or "", "APCA-API-SECRET-KEY": secret_key or ""})
+        self.log = logging.getLogger("pytrader.data.alpaca")
+
+    def download(
+        self, tickers: list[str], timeframe: Timeframe, start: pd.Timestamp, end: pd.Timestamp, actions: bool = False
+    ) -> pd.DataFrame:
+        """
+        Returns the bars of the tickers from start until end, as a (date, ticker) panel.
+        actions: bool - Accepted for BarStore, Alpaca reports corporate actions through a separate endpoint
+        """
+        batches = [tickers[i : i + self.symbols_per_request] for i in range(0, len(tickers), self.symbols_per_request)]
+        windows, window = [], pd.Timedelta(days=timeframe.window_days)
+        window_start = start
+        while window_start < end:
+            windows.append((window_start, min(window_start + window, end)))
+            window_start = windows[-1][1]
+
+        requests_ = [(batch, w_start, w_end) for batch in batches for w_start, w_end in windows]
+        with ThreadPoolExecutor(max(1, min(self.workers, len(requests_)))) as pool:
+            chains = list(pool.map(lambda r: self._bars(r[0], timeframe, r[1], r[2]), requests_))
+
+        rows = [row for chain in chains for row in chain]
+        if not rows:
+            return _empty_panel(timeframe)
+        return self._panel(rows, timeframe)
+
+    def _bars(self, symbols: list[str], timeframe: Timeframe, start: pd.Timestamp, end: pd.Timestamp) -> list[tuple]:
+        """
+        Follows one request's page chain, returning (symbol, time, open, high, low, close, volume) rows.
+        """
+        params = {
+            "symbols": ",".join(symbols),
+            "timeframe": _request_timeframes[timeframe.name],
+            "start": _rfc3339(start),
+            "end": _rfc3339(end),
+            "limit": self.page_size,
+            "adjustment": self.adjustment,
+            "feed": self.feed,
+            "sort": "asc",
+        }
+        rows = []
+        while True:
+            page = self.policy.call("get_stock_bars", self._get, "/v2/stocks/bars", params)
+            profiling.count("alpaca_bar_pages")
+            for symbol, bars in (page.get("bars") or {}).items():
+                rows.extend((symbol, b["t"], b["o"], b["h"], b["l"], b["c"], b["v"]) for b in bars)
+            token = page.get("next_page_token")
+            if not token:
+                return rows
+            params = params | {"page_token": token}
+
+    def _get(self, path: str, params: dict) -> dict:
+        response = self.session.get(f"{self.base_url}{path}", params=params, timeout=30)
+        if response.status_code >= 400:
+            # Raised as the broker's error type so the call policy classifies, retries and backs off
+            # as it does for trading calls
+            raise APIError(response.text, requests.HTTPError(response=response))
+        return response.json()
+
+    def _panel(self, rows: list[tuple], timeframe: Timeframe) -> pd.DataFrame:
+        df = pd.DataFrame(rows, columns=["ticker", "date", "open", "high", "low", "close", "volume"])
+        dates = pd.to_datetime(df["date"], utc=True).dt.tz_convert(ny_tz)
+        if not timeframe.intraday:
+            # Daily bars are dated like the provider's, without a time zone
+            df["date"] = dates.dt.tz_localize(None).dt.normalize()
+        else:
+            df["date"] = dates
+            minutes = dates.dt.hour * 60 + dates.dt.minute
+            df = df[(minutes >= 9 * 60 + 30) & (minutes < 16 * 60)]
+        df = df.drop_duplicates(["date", "ticker"], keep="last")
+        if timeframe.name == "1h":
+            df = self._hours(df)
+
+        df = df.set_index(["date", "ticker"]).sort_index()[_columns]
+        df = df.unstack("ticker").stack(future_stack=True)
+        return df.astype("float32") if timeframe.intraday else df.astype("float64")
+
+    def _hours(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Folds half hour bars into hours starting at 9:30, the last bar of the session is a half hour.
+        """
+        df = df.sort_values(["ticker", "date"])
+        minutes = df["date"].dt.hour * 60 + df["date"].dt.minute - (9 * 60 + 30)
+        df = df.assign(date=df["date"] - pd.to_timedelta(minutes % 60, unit="min"))
+        return (
+            df.groupby(["date", "ticker"], sort=False)
+            .agg(
+                open=("open", "first"),
+                high=("high", "max"),
+                low=("low", "min"),
+                close=("close", "last"),
+                volume=("volume", "sum"),
+            )
+            .reset_index()
+        )
+
+
+def _empty_panel(timeframe: Timeframe) -> pd.DataFrame:
+    """
+    Returns a panel without bars, still indexed by (date, ticker) so filtering and the scan find nothing.
+    """
+    dates = pd.DatetimeIndex([], tz=ny_tz if timeframe.intraday else None)
+    index = pd.MultiIndex.from_arrays([dates, pd.Index([], dtype=object)], names=["date", "ticker"])
+    return pd.DataFrame(columns=_columns, index=index, dtype="float32" if timeframe.intraday else "float64")
+
+
+def _rfc3339(timestamp: pd.Timestamp) -> str:
+    timestamp = pd.Timestamp(timestamp)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.tz_localize(ny_tz)
+    return timestamp.tz_convert("UTC").strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+_client: AlpacaBars | None = None
+
+
+def configure_alpaca_data(api_key: str, secret_key: str, **kwargs) -> AlpacaBars:
+    """
+    Sets the credentials and options get_alpaca_market_data downloads with.
+    """
+    global _client
+    _client = AlpacaBars(api_key, secret_key, **kwargs)
+    return _client
+
+
+def get_alpaca_market_data(
+    tickers: list[str],
+    interval: str = "1d",
+    end_date: pd.Timestamp = None,
+    start_date: pd.Timestamp = None,
+    lookback_bars: int = 1100,
+    incremental: bool = False,
+) -> pd.DataFrame:
+    """
+    Same as get_adjusted_market_data, downloading from Alpaca with the client set by configure.
+    """
+    if _client is None:
+        raise RuntimeError("The Alpaca market data client is not configured, see configure_alpaca_data")
+    timeframe = get_timeframe(interval)
+    if end_date is None:
+        # Downloads end where the forming bar starts
+        now = pd.Timestamp.now(tz=ny_tz)
+        end_date = timeframe.bar_start(now) or now
+    if start_date is None:
+        start_date = pd.Timestamp(end_date) - pd.DateOffset(timeframe.lookback_days(lookback_bars))
+    start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+
+    if incremental:
+        from .bar_store import BarStore
+
+        return BarStore(os.path.join(cache.path("bars"), "alpaca"), _client.download).refresh(
+            tickers, timeframe, start, end
+        )
+    return _client.download(tickers, timeframe, start, end)
@@ -0,0 +1,144 @@
+import logging
+import os
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from pytrader.utils import profiling
+from pytrader.utils.timeframe import Timeframe
+
+# Columns the provider adds when asked for corporate actions, they are not part of the panel
+_action_columns = ["dividends", "stock splits", "capital gains"]
+
+
+def _like(timestamp: pd.Timestamp, index: pd.DatetimeIndex) -> pd.Timestamp:
+    """
+    Returns a timestamp comparable with the index, daily bars are dated without a time zone.
+    """
+    if index.tz is None and timestamp.tzinfo is not None:
+        return timestamp.tz_convert("America/New_York").tz_localize(None)
+    if index.tz is not None and timestamp.tzinfo is None:
+        return timestamp.tz_localize(index.tz)
+    return timestamp
+
+
+Download = Callable[[list[str], Timeframe, pd.Timestamp, pd.Timestamp, bool], pd.DataFrame]
+
+
+class BarStore:
+    """
+    Keeps adjusted bars on disk and refreshes them by downloading only the bars since the last refresh.
+    Adjusted prices are rewritten all the way back whenever a symbol splits or pays a dividend, so a symbol
+    whose new bars report a split or dividend, or whose re-downloaded overlap bars no longer match the stored
+    ones, has its whole history downloaded again. Every other symbol is appended to.
+    path: str - Directory of the stored bars, one pickle per timeframe and symbol
+    download: Callable - Downloads a (date, ticker) panel for a date range, with corporate action columns when asked
+    overlap_bars: int - Stored bars downloaded again to check their adjustment
+    tolerance: float - Relative difference of an overlap close that counts as a changed adjustment
+    """
+
+    def __init__(self, path: str, download: Download, overlap_bars: int = 5, tolerance: float = 1e-4):
+        self.path = path
+        self._download = download
+        self.overlap_bars = overlap_bars
+        self.tolerance = tolerance
+        self.log = logging.getLogger("pytrader.data.bars")
+
+    def refresh(self, tickers: list[str], timeframe: Timeframe, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+        """
+        Brings the stored bars of the tickers up to end and returns them from start as a (date, ticker) panel.
+        """
+        frames = {}
+        stored = {}
+        for ticker in tickers:
+            frame = self._load(timeframe, ticker)
+            # Bars stored for a shorter lookback are downloaded again
+            if frame is not None and len(frame) > self.overlap_bars and frame.attrs.get("start", end) <= start:
+                stored[ticker] = frame
+
+        rewrite = [t for t in tickers if t not in stored]
+        appended = 0
+        if stored:
+            since = min(frame.index[-self.overlap_bars] for frame in stored.values())
+            with profiling.stage("download_new_bars"):
+                fresh = self._download(list(stored), timeframe, since, end, True)
+            fresh_tickers = set(fresh.index.unique(1)) if not fresh.empty else set()
+            for ticker, frame in stored.items():
+                if ticker not in fresh_tickers:
+                    frames[ticker] = frame
+                    continue
+                new = fresh.xs(ticker, level=1).dropna(how="all")
+                if self._adjustment_changed(frame, new):
+                    rewrite.append(ticker)
+                    continue
+                # The last stored bar may have been downloaded while it was still forming, so it is replaced too
+                new = new.drop(columns=_action_columns, errors="ignore")
+                frames[ticker] = pd.concat([frame[frame.index < min(new.index[0], frame.index[-1])], new])
+                self._save(timeframe, ticker, frames[ticker], start)
+                appended += 1
+            profiling.count("bars_appended", appended)
+
+        if rewrite:
+            self.log.info(f"Downloading the full history of {len(rewrite)} symbols.")
+            profiling.count("bars_rewritten", len(rewrite))
+            with profiling.stage("download_full_bars"):
+                full = self._download(rewrite, timeframe, start, end, False)
+            full_tickers = set(full.index.unique(1)) if not full.empty else set()
+            for ticker in rewrite:
+                if ticker in full_tickers:
+                    frames[ticker] = full.xs(ticker, level=1).dropna(how="all")
+                    self._save(timeframe, ticker, frames[ticker], start)
+                elif ticker in stored:
+                    frames[ticker] = stored[ticker]
+
+        if not frames:
+            return pd.DataFrame(columns=["close", "high", "low", "open", "volume"])
+        df = pd.concat({t: self._since(f, start) for t, f in frames.items()}, names=["ticker", "date"])
+        return df.swaplevel().sort_index()
+
+    def _since(self, frame: pd.DataFrame, start: pd.Timestamp) -> pd.DataFrame:
+        return frame[frame.index >= _like(start, frame.index)]
+
+    def _adjustment_changed(self, stored: pd.DataFrame, new: pd.DataFrame) -> bool:
+        """
+        Returns whether the new bars carry a split or dividend past the stored ones, or disagree with the
+        stored closes they overlap. The last stored bar is left out, it may have been a forming bar.
+        """
+        after = new[new.index > stored.index[-1]]
+        for column in _action_columns:
+            if column in after and (after[column].fillna(0) != 0).any():
+                self.log.debug(f"{column.title()} since {stored.index[-1]}, rewriting the adjusted history.")
+                return True
+
+        overlap = stored.index[:-1].intersection(new.index)
+        if overlap.empty:
+            # Nothing to compare the adjustment on, e.g. a gap longer than the overlap
+            return True
+        stored_close = stored.loc[overlap, "close"].to_numpy(dtype="f8")
+        new_close = new.loc[overlap, "close"].to_numpy(dtype="f8")
+        with np.errstate(divide="ignore", invalid="ignore"):
+            drift = np.abs(new_close / stored_close - 1)
+        return bool(np.nanmax(drift, initial=0) > self.tolerance)
+
+    def _file(self, timeframe: Timeframe, ticker: str) -> str:
+        return os.path.join(self.path, timeframe.name, f"{ticker}.pkl")
+
+    def _load(self, timeframe: Timeframe, ticker: str) -> pd.DataFrame | None:
+        path = self._file(timeframe, ticker)
+        if not os.path.exists(path):
+            return None
+        try:
+            return pd.read_pickle(path)
+        except Exception as e:
+            self.log.warning(f"Ignoring unreadable stored bars {path}: {e}")
+            return None
+
+    def _save(self, timeframe: Timeframe, ticker: str, frame: pd.DataFrame, start: pd.Timestamp):
+        path = self._file(timeframe, ticker)
+        frame = self._since(frame, start)
+        # The requested start, the first bar can be later when the range starts on a closed day
+        frame.attrs["start"] = start
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        frame.to_pickle(f"{path}.tmp")
+        os.replace(f"{path}.tmp", path)
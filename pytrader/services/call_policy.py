@@ -0,0 +1,189 @@
+import bisect
+import json
+import logging
+import random
+import threading
+import time
+from typing import Callable, TypeVar
+
+import requests
+from alpaca.common.exceptions import APIError
+
+from pytrader.utils.rate_limit import TokenBucket
+
+T = TypeVar("T")
+
+
+class BrokerError(Exception):
+    """
+    A classified failure of a broker call.
+    endpoint: str - The logical endpoint that failed
+    status_code: int - HTTP status code, when there was a response
+    code: int - Alpaca error code, when the response carried one
+    """
+
+    retryable = False
+
+    def __init__(self, endpoint: str, message: str, status_code: int = None, code: int = None):
+        super().__init__(f"{endpoint}: {message}")
+        self.endpoint = endpoint
+        self.status_code = status_code
+        self.code = code
+
+
+class RateLimitedError(BrokerError):
+    """The broker rejected the call before processing it, so it is always safe to retry."""
+
+    retryable = True
+
+
+class TransientBrokerError(BrokerError):
+    """Server errors, timeouts and dropped connections. Only idempotent calls are retried."""
+
+    retryable = True
+
+
+class NotFoundError(BrokerError):
+    pass
+
+
+class RejectedError(BrokerError):
+    """The broker understood the call and refused it, e.g. insufficient buying power."""
+
+
+def classify_error(endpoint: str, error: Exception) -> BrokerError:
+    """
+    Maps exceptions raised by alpaca-py and requests onto BrokerError types.
+    """
+    if isinstance(error, BrokerError):
+        return error
+
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return TransientBrokerError(endpoint, str(error) or type(error).__name__)
+
+    if not isinstance(error, APIError):
+        return BrokerError(endpoint, str(error) or type(error).__name__)
+
+    status_code = error.status_code
+    try:
+        body = json.loads(str(error))
+        code, message = body.get("code"), body.get("message", str(error))
+    except (ValueError, AttributeError):
+        code, message = None, str(error)
+
+    if status_code == 429:
+        return RateLimitedError(endpoint, message, status_code, code)
+    if status_code is not None and status_code >= 500:
+        return TransientBrokerError(endpoint, message, status_code, code)
+    if status_code == 404 or code == 40410000:
+        return NotFoundError(endpoint, message, status_code, code)
+    return RejectedError(endpoint, message, status_code, code)
+
+
+class LatencyHistogram:
+    """
+    Cumulative latency histogram with fixed, Prometheus style bucket bounds in seconds.
+    """
+
+    buckets = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.errors = 0
+
+    def observe(self, seconds: float, failed: bool = False):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.errors += int(failed)
+
+    def quantile(self, q: float) -> float:
+        """
+        Returns the upper bound of the bucket holding the q-th quantile.
+        """
+        if self.count == 0:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class CallPolicy:
+    """
+    Rate limits, retries and times every call made to the broker's REST API.
+    rate_limiter: TokenBucket - Shared budget for every call, defaults to Alpaca's 200 requests per minute
+    max_retries: int - Retries for retryable failures
+    base_delay: float - First backoff in seconds, doubled on every attempt with full jitter
+    max_delay: float - Longest backoff in seconds
+    """
+
+    def __init__(
+        self,
+        rate_limiter: TokenBucket = None,
+        max_retries: int = 3,
+        base_delay: float = 0.25,
+        max_delay: float = 4.0,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.rate_limiter = rate_limiter or TokenBucket.per_minute(200)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self.histograms: dict[str, LatencyHistogram] = {}
+        self.log = logging.getLogger("pytrader.broker.policy")
+
+    def call(self, endpoint: str, fn: Callable[..., T], *args, idempotent: bool = True, **kwargs) -> T:
+        """
+        Calls fn within the rate budget, retrying failures that are safe to retry.
+        Raises a BrokerError subclass when the call ultimately fails.
+        endpoint: str - Name the latency and failures are recorded under
+        idempotent: bool - Whether server errors and timeouts may be retried
+        """
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            started = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+                self._observe(endpoint, time.perf_counter() - started)
+                return result
+            except Exception as e:
+                self._observe(endpoint, time.perf_counter() - started, failed=True)
+                error = classify_error(endpoint, e)
+                can_retry = isinstance(error, RateLimitedError) or (error.retryable and idempotent)
+                if not can_retry or attempt >= self.max_retries:
+                    raise error from e
+
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+                self.log.warning(f"{error}. Retrying in {delay:.2f}s ({attempt + 1}/{self.max_retries}).")
+                self._sleep(delay)
+                attempt += 1
+
+    def summary(self) -> dict[str, dict]:
+        """
+        Returns call counts, failures and latency quantiles per endpoint.
+        """
+        with self._lock:
+            return {
+                endpoint: {
+                    "calls": h.count,
+                    "errors": h.errors,
+                    "mean": h.sum / h.count if h.count else 0.0,
+                    "p50": h.quantile(0.5),
+                    "p99": h.quantile(0.99),
+                }
+                for endpoint, h in self.histograms.items()
+            }
+
+    def _observe(self, endpoint: str, seconds: float, failed: bool = False):
+        with self._lock:
+            if endpoint not in self.histograms:
+                self.histograms[endpoint] = LatencyHistogram()
+            self.histograms[endpoint].observe(seconds, failed)
@@ -1,4 +1,7 @@
+import datetime
 import logging as l
+from typing import Iterator
+
 from firebase_admin import firestore, credentials, initialize_app
 from google.cloud.firestore_v1.base_query import FieldFilter
 from google.cloud.firestore_v1.document import DocumentReference
@@ -11,6 +14,21 @@ class TraderDatabase:
     _order_collection = "orders"
     _signals_collection = "signals"
     _trade_collection = "trades"
+    _max_batch_size = 500
+    _trade_summary_fields = [
+        "symbol",
+        "cost_basis",
+        "sale_price",
+        "revenue",
+        "result_pct",
+        "opened_on",
+        "closed_on",
+        "settled_at",
+        "market_exposure",
+        "canceled_reason",
+    ]
+    # Everything processing a signal reads, resolved orders can be large and are left out
+    _pending_signal_fields = ["symbol", "action", "date", "strategy", "metadata", "executeOn", "orderId"]
 
     def __init__(self, cfg: TradeConfig = None):
         cred = credentials.Certificate(cfg.db_creds_path)
@@ -22,6 +40,21 @@ class TraderDatabase:
         doc_ref = collection.document(order_key)
         doc_ref.set(order_data)
 
+    def merge_orders(self, orders: dict[str, dict]):
+        """
+        Merges partial order documents in batched writes.
+        orders: dict - Changed fields keyed by order key, fields set to None are deleted
+        """
+        collection = self.db.collection(self._order_collection)
+        items = list(orders.items())
+
+        for start in range(0, len(items), self._max_batch_size):
+            batch = self.db.batch()
+            for order_key, fields in items[start : start + self._max_batch_size]:
+                data = {k: (firestore.DELETE_FIELD if v is None else v) for k, v in fields.items()}
+                batch.set(collection.document(order_key), data, merge=True)
+            batch.commit()
+
     def get_order(self, order_id):
         """
         Retrieves a document from the collection.
@@ -77,9 +110,9 @@ class TraderDatabase:
                     doc = signal.get().to_dict()
                     model = SignalModel(signal.id, **doc)
                     if doc["orderId"] is not None:
-                        order = self.get_order(f'alpaca_{doc["orderId"]}')
+                        order = self.get_order(f"alpaca_{doc['orderId']}")
                         if order is None:
-                            order = self.get_order(f'alapca_{doc["orderId"]}')
+                            order = self.get_order(f"alapca_{doc['orderId']}")
                         model.resolvedOrder = order
                     resolved_signals.append(model)
 
@@ -105,23 +138,167 @@ class TraderDatabase:
         doc_ref = trades.document(trade_id)
         doc_ref.update(trade_data)
 
-    def get_trades(self, include_closed: bool = False):
+    def get_trades(self, include_closed: bool = False) -> Iterator[dict]:
         """
-        Retrieves all trades from the database.
+        Streams every field of the open trades, or of all trades, a page at a time. See query_trades.
         """
-        trades = self.db.collection(self._trade_collection)
-        if include_closed:
-            query = trades
-        else:
-            data_filter = FieldFilter("status", "not-in", ["closed", "canceled"])
-            query = trades.where(filter=data_filter)
+        return self.query_trades(include_closed=include_closed)
 
-        results = query.stream()
-        return results
-        # return [TradeModel.from_dict(doc.id, doc.to_dict()) for doc in results]
+    def get_trade_ids(self, include_closed: bool = False) -> Iterator[str]:
+        """
+        Streams the IDs of the open trades, or of all trades, without reading their fields.
+        """
+        for trade in self.query_trades(include_closed=include_closed, select=[]):
+            yield trade["id"]
+
+    def query_trades(
+        self,
+        include_closed: bool = False,
+        select: list[str] = None,
+        order_by: str | list[str] = None,
+        descending: bool = False,
+        page_size: int = 500,
+        start_after: str = None,
+    ) -> Iterator[dict]:
+        """
+        Streams trades a page at a time, as dicts of the selected fields and the trade's "id".
+        include_closed: bool - Include closed and canceled trades
+        select: list[str] - Fields to read, all when None and only the IDs when empty
+        order_by: str | list[str] - Fields the trades are sorted on by the database, the status of open trades
+            and otherwise the ID by default
+        descending: bool - Sort from the highest value
+        page_size: int - Documents per read
+        start_after: str - ID of the trade to resume after, e.g. the last one a previous read yielded
+        """
+        filters = [] if include_closed else [FieldFilter("status", "not-in", ["closed", "canceled"])]
+        default_order = "__name__" if include_closed else "status"
+        return self._query(
+            self._trade_collection, filters, select, order_by or default_order, descending, page_size, start_after
+        )
+
+    def query_signals(
+        self,
+        pending: bool = False,
+        select: list[str] = None,
+        order_by: str | list[str] = None,
+        descending: bool = False,
+        page_size: int = 500,
+        start_after: str = None,
+    ) -> Iterator[dict]:
+        """
+        Streams signals a page at a time, as dicts of the selected fields and the signal's "id".
+        pending: bool - Only the signals executing today or later that have no order yet
+        select: list[str] - Fields to read, all when None and only the IDs when empty
+        order_by: str | list[str] - Fields the signals are sorted on by the database, the execution date
+            of pending signals and otherwise the ID by default
+        descending: bool - Sort from the highest value
+        page_size: int - Documents per read
+        start_after: str - ID of the signal to resume after
+        """
+        filters = []
+        if pending:
+            today = localtime.to_day(localtime.today())
+            filters = [FieldFilter("executeOn", ">=", today), FieldFilter("orderId", "==", None)]
+        default_order = "executeOn" if pending else "__name__"
+        return self._query(
+            self._signals_collection, filters, select, order_by or default_order, descending, page_size, start_after
+        )
+
+    def query_orders(
+        self,
+        updated_since: datetime.datetime = None,
+        select: list[str] = None,
+        order_by: str | list[str] = None,
+        descending: bool = False,
+        page_size: int = 500,
+        start_after: str = None,
+    ) -> Iterator[dict]:
+        """
+        Streams orders a page at a time, as dicts of the selected fields and the order key as "id".
+        updated_since: datetime - Only the orders the broker updated at or after this time
+        select: list[str] - Fields to read, all when None and only the keys when empty
+        order_by: str | list[str] - Fields the orders are sorted on by the database, the update time
+            when updated_since is given and otherwise the key by default
+        descending: bool - Sort from the highest value
+        page_size: int - Documents per read
+        start_after: str - Key of the order to resume after
+        """
+        filters = [] if updated_since is None else [FieldFilter("updated_at", ">=", updated_since)]
+        default_order = "__name__" if updated_since is None else "updated_at"
+        return self._query(
+            self._order_collection, filters, select, order_by or default_order, descending, page_size, start_after
+        )
+
+    def _query(
+        self,
+        collection_name: str,
+        filters: list[FieldFilter],
+        select: list[str] | None,
+        order_by: str | list[str],
+        descending: bool,
+        page_size: int,
+        start_after: str | None,
+    ) -> Iterator[dict]:
+        """
+        Builds a filtered, sorted and projected query and streams its pages. The ID is always the last sort
+        field, so every document has a distinct cursor and pages neither skip nor repeat documents.
+        """
+        collection = self.db.collection(collection_name)
+        query = collection
+        for data_filter in filters:
+            query = query.where(filter=data_filter)
+
+        direction = firestore.Query.DESCENDING if descending else firestore.Query.ASCENDING
+        fields = [order_by] if isinstance(order_by, str) else list(order_by)
+        if "__name__" not in fields:
+            fields.append("__name__")
+        for field in fields:
+            query = query.order_by(field, direction=direction)
+        if select is not None:
+            # An empty projection would read every field, naming the ID reads none
+            query = query.select(list(select) or ["__name__"])
+
+        cursor = None
+        if start_after is not None:
+            cursor = collection.document(start_after).get()
+            if not cursor.exists:
+                raise ValueError(f"Unable to resume after {start_after}, it is not in {collection_name}")
+        return self._paged(query, page_size, cursor)
+
+    def _paged(self, query, page_size: int, cursor=None) -> Iterator[dict]:
+        """
+        Streams a sorted query a page at a time, each page starting after the last document of the one before,
+        so only one page is held in memory at once.
+        """
+        query = query.limit(page_size)
+        while True:
+            page = list((query.start_after(cursor) if cursor is not None else query).stream())
+            for doc in page:
+                yield {"id": doc.id, **doc.to_dict()}
+            if len(page) < page_size:
+                return
+            cursor = page[-1]
 
     def close_trade(self, trade: TradeModel):
-        self.update_trade(trade.id, trade.to_summary_dict())
+        summary = trade.to_summary_dict()
+        summary["settled_at"] = firestore.SERVER_TIMESTAMP
+        self.update_trade(trade.id, summary)
+
+    def get_closed_trades(self, settled_since: datetime.datetime = None, page_size: int = 500) -> Iterator[dict]:
+        """
+        Streams the summaries of closed trades a page at a time.
+        settled_since: datetime - Only read trades settled at or after this time, trades settled before
+            settlement times were recorded are only read when this is None
+        page_size: int - Documents per read
+        """
+        filters = [FieldFilter("status", "==", "closed")]
+        order_by = "__name__"
+        if settled_since is not None:
+            filters.append(FieldFilter("settled_at", ">=", settled_since))
+            order_by = "settled_at"
+        return self._query(
+            self._trade_collection, filters, self._trade_summary_fields, order_by, False, page_size, None
+        )
 
     def add_signal(self, signal: SignalModel) -> SignalModel | None:
         """
@@ -185,18 +362,13 @@ class TraderDatabase:
         except Exception:
             return None
 
-    def get_pending_signals(self) -> list[SignalModel]:
+    def get_pending_signals(self, page_size: int = 500) -> list[SignalModel]:
         """
-        Retrieves all pending trades from the database.
+        Retrieves the signals executing today or later that have no order yet, without their resolved orders.
+        page_size: int - Documents per read
         """
-        signals = self.db.collection(self._signals_collection)
-        today = localtime.to_day(localtime.today())
-        data_filter = FieldFilter("executeOn", ">=", today)
-        order_filter = FieldFilter("orderId", "==", None)
-        query = signals.where(filter=data_filter).where(filter=order_filter)
-        results = query.stream()
-
-        return [SignalModel(doc.id, **doc.to_dict()) for doc in results]
+        signals = self.query_signals(pending=True, select=self._pending_signal_fields, page_size=page_size)
+        return [SignalModel(**signal) for signal in signals]
 
     def update_signal_order(self, signal_id: str, order_id: str):
         """
@@ -209,6 +381,43 @@ class TraderDatabase:
         data = {"orderId": str(order_id)}
         doc_ref.update(data)
 
+    def update_signal_orders(self, signal_orders: dict[str, str]):
+        """
+        Records the orders placed for several signals in batched writes.
+        signal_orders: dict - Order IDs keyed by signal ID
+        """
+        signals = self.db.collection(self._signals_collection)
+        items = list(signal_orders.items())
+
+        for start in range(0, len(items), self._max_batch_size):
+            batch = self.db.batch()
+            for signal_id, order_id in items[start : start + self._max_batch_size]:
+                batch.update(signals.document(signal_id), {"orderId": str(order_id)})
+            batch.commit()
+
+    def get_signal_id_for_order(self, order_id: str) -> str | None:
+        """
+        Retrieves the ID of the signal an order was placed for.
+        order_id: str - The broker's ID of the order
+        """
+        signals = self.db.collection(self._signals_collection)
+        query = signals.where(filter=FieldFilter("orderId", "==", str(order_id))).limit(1)
+        for doc in query.stream():
+            return doc.id
+        return None
+
+    def get_trade_id_for_signal(self, signal_id: str) -> str | None:
+        """
+        Retrieves the ID of the trade a signal belongs to.
+        signal_id: str - The ID of the signal
+        """
+        trades = self.db.collection(self._trade_collection)
+        signal_ref = self.db.collection(self._signals_collection).document(signal_id)
+        query = trades.where(filter=FieldFilter("signals", "array_contains", signal_ref)).limit(1)
+        for doc in query.stream():
+            return doc.id
+        return None
+
     def get_trade_by_signal(self, signal_key) -> TradeModel:
         """
         Retrieves the first trade that was triggered by a specific signal.
@@ -3,8 +3,12 @@ import logging
 
 
 class GoogleChatNotification:
-    def __init__(self, webhook_url):
+    def __init__(self, webhook_url, timeout: float = 10.0):
         self.webhook_url = webhook_url
+        self.timeout = timeout
+        # One pooled session keeps the TLS connection to the webhook open between messages
+        self.session = requests.Session()
+        self.session.headers["Content-Type"] = "application/json; charset=UTF-8"
         self.log = logging.getLogger("pytrader.notifications.googlechat")
 
     def send_text(self, message_text):
@@ -12,10 +16,19 @@ class GoogleChatNotification:
         self.send_object(message)
 
     def send_object(self, chat_object):
-        headers = {"Content-Type": "application/json; charset=UTF-8"}
         try:
-            response = requests.post(self.webhook_url, headers=headers, json=chat_object)
-            response.raise_for_status()
+            response = self.post(chat_object)
             self.log.debug(f"Google chat sent successfully with response code: {response.status_code}")
         except requests.exceptions.RequestException as e:
-            self.log.warn(f"Error sending message: {e}")
+            self.log.warning(f"Error sending message: {e}")
+
+    def post(self, chat_object) -> requests.Response:
+        """
+        Posts a message and raises requests exceptions on failure.
+        """
+        response = self.session.post(self.webhook_url, json=chat_object, timeout=self.timeout)
+        response.raise_for_status()
+        return response
+
+    def close(self):
+        self.session.close()
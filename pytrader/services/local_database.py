@@ -0,0 +1,273 @@
+import datetime
+import os
+import pickle
+import threading
+from typing import Callable, Iterator
+
+from pytrader.model import SignalModel, TradeModel
+from pytrader.utils import localtime
+
+
+def _sort_value(value):
+    # Missing fields sort first, as Firestore sorts nulls first
+    return (value is not None, value)
+
+
+class LocalDatabase:
+    """
+    TraderDatabase kept in memory and saved to a local file, for simulations that must never write to Firestore.
+    Documents are stored as Firestore would return them, except that trades reference their signals by ID.
+    Queries take the same filters, projections, sort orders and cursors and are answered from memory.
+    path: str - Pickle the documents are loaded from and saved to on close
+    """
+
+    _order_collection = "orders"
+    _signals_collection = "signals"
+    _trade_collection = "trades"
+    _trade_summary_fields = [
+        "symbol",
+        "cost_basis",
+        "sale_price",
+        "revenue",
+        "result_pct",
+        "opened_on",
+        "closed_on",
+        "settled_at",
+        "market_exposure",
+        "canceled_reason",
+    ]
+    _pending_signal_fields = ["symbol", "action", "date", "strategy", "metadata", "executeOn", "orderId"]
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._collections: dict[str, dict[str, dict]] = {
+            self._order_collection: {},
+            self._signals_collection: {},
+            self._trade_collection: {},
+        }
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                self._collections.update(pickle.load(f))
+
+    def close(self):
+        """
+        Saves the documents, replacing the file only once they are fully written.
+        """
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(f"{self.path}.tmp", "wb") as f:
+                pickle.dump(self._collections, f)
+            os.replace(f"{self.path}.tmp", self.path)
+
+    def upsert_order(self, order_key, order_data):
+        with self._lock:
+            self._collections[self._order_collection][order_key] = dict(order_data)
+
+    def merge_orders(self, orders: dict[str, dict]):
+        with self._lock:
+            collection = self._collections[self._order_collection]
+            for order_key, fields in orders.items():
+                doc = collection.setdefault(order_key, {})
+                for name, value in fields.items():
+                    if value is None:
+                        doc.pop(name, None)
+                    else:
+                        doc[name] = value
+
+    def get_order(self, order_id):
+        return self._get(self._order_collection, order_id)
+
+    def add_trade(self, trade: TradeModel) -> TradeModel | None:
+        with self._lock:
+            trades = self._collections[self._trade_collection]
+            if trade.id in trades:
+                return None
+            trades[trade.id] = trade.to_dict()
+        return TradeModel(trade.id, trade.symbol, trade.timestamp, trade.strategy, trade.status, trade.signals)
+
+    def get_trade(self, trade_id: str) -> TradeModel | None:
+        trade_doc = self._get(self._trade_collection, trade_id)
+        if trade_doc is None:
+            return None
+
+        resolved_signals = []
+        for signal_id in trade_doc.get("signals", []):
+            doc = self._get(self._signals_collection, signal_id)
+            if doc is None:
+                continue
+            model = SignalModel(signal_id, **doc)
+            if doc["orderId"] is not None:
+                model.resolvedOrder = self.get_order(f'alpaca_{doc["orderId"]}')
+            resolved_signals.append(model)
+
+        return TradeModel(
+            id=trade_id,
+            symbol=trade_doc["symbol"],
+            timestamp=trade_doc["timestamp"],
+            strategy=trade_doc["strategy"],
+            status=trade_doc.get("status"),
+            signals=list(trade_doc.get("signals", [])),
+            resolved_signals=resolved_signals,
+        )
+
+    def update_trade(self, trade_id: str, trade_data: dict):
+        with self._lock:
+            self._collections[self._trade_collection][trade_id].update(trade_data)
+
+    def get_trades(self, include_closed: bool = False) -> Iterator[dict]:
+        return self.query_trades(include_closed=include_closed)
+
+    def get_trade_ids(self, include_closed: bool = False) -> Iterator[str]:
+        for trade in self.query_trades(include_closed=include_closed, select=[]):
+            yield trade["id"]
+
+    def query_trades(
+        self,
+        include_closed: bool = False,
+        select: list[str] = None,
+        order_by: str | list[str] = None,
+        descending: bool = False,
+        page_size: int = 500,
+        start_after: str = None,
+    ) -> Iterator[dict]:
+        def _match(doc):
+            return include_closed or doc.get("status") not in ("closed", "canceled")
+
+        default_order = "__name__" if include_closed else "status"
+        return self._query(
+            self._trade_collection, _match, select, order_by or default_order, descending, start_after
+        )
+
+    def query_signals(
+        self,
+        pending: bool = False,
+        select: list[str] = None,
+        order_by: str | list[str] = None,
+        descending: bool = False,
+        page_size: int = 500,
+        start_after: str = None,
+    ) -> Iterator[dict]:
+        today = localtime.to_day(localtime.today())
+
+        def _match(doc):
+            if not pending:
+                return True
+            return doc.get("executeOn") is not None and doc["executeOn"] >= today and doc.get("orderId") is None
+
+        default_order = "executeOn" if pending else "__name__"
+        return self._query(
+            self._signals_collection, _match, select, order_by or default_order, descending, start_after
+        )
+
+    def query_orders(
+        self,
+        updated_since: datetime.datetime = None,
+        select: list[str] = None,
+        order_by: str | list[str] = None,
+        descending: bool = False,
+        page_size: int = 500,
+        start_after: str = None,
+    ) -> Iterator[dict]:
+        def _match(doc):
+            return updated_since is None or (doc.get("updated_at") is not None and doc["updated_at"] >= updated_since)
+
+        default_order = "__name__" if updated_since is None else "updated_at"
+        return self._query(
+            self._order_collection, _match, select, order_by or default_order, descending, start_after
+        )
+
+    def close_trade(self, trade: TradeModel):
+        summary = trade.to_summary_dict()
+        # The simulated clock, where Firestore would stamp the server time
+        summary["settled_at"] = localtime.today()
+        self.update_trade(trade.id, summary)
+
+    def get_closed_trades(self, settled_since: datetime.datetime = None, page_size: int = 500) -> Iterator[dict]:
+        def _match(doc):
+            if doc.get("status") != "closed":
+                return False
+            return settled_since is None or (doc.get("settled_at") is not None and doc["settled_at"] >= settled_since)
+
+        order_by = "__name__" if settled_since is None else "settled_at"
+        return self._query(self._trade_collection, _match, self._trade_summary_fields, order_by, False, None)
+
+    def add_signal(self, signal: SignalModel) -> SignalModel | None:
+        with self._lock:
+            signals = self._collections[self._signals_collection]
+            if signal.id in signals:
+                return None
+            signals[signal.id] = signal.to_dict()
+        return SignalModel(signal.id, signal.symbol, signal.action, signal.date, signal.strategy, signal.metadata)
+
+    def add_signal_ref_to_trade(self, trade_id: str, signal_id: str):
+        with self._lock:
+            trade = self._collections[self._trade_collection][trade_id]
+            if signal_id not in trade["signals"]:
+                trade["signals"].append(signal_id)
+
+    def get_signal(self, signal_id: str) -> SignalModel | None:
+        doc = self._get(self._signals_collection, signal_id)
+        return SignalModel(signal_id, **doc) if doc is not None else None
+
+    def get_pending_signals(self, page_size: int = 500) -> list[SignalModel]:
+        signals = self.query_signals(pending=True, select=self._pending_signal_fields, page_size=page_size)
+        return [SignalModel(**signal) for signal in signals]
+
+    def update_signal_order(self, signal_id: str, order_id: str):
+        self.update_signal_orders({signal_id: order_id})
+
+    def update_signal_orders(self, signal_orders: dict[str, str]):
+        with self._lock:
+            signals = self._collections[self._signals_collection]
+            for signal_id, order_id in signal_orders.items():
+                signals[signal_id]["orderId"] = str(order_id)
+
+    def get_signal_id_for_order(self, order_id: str) -> str | None:
+        with self._lock:
+            signals = self._collections[self._signals_collection]
+            return next((i for i, doc in signals.items() if doc.get("orderId") == str(order_id)), None)
+
+    def get_trade_id_for_signal(self, signal_id: str) -> str | None:
+        with self._lock:
+            trades = self._collections[self._trade_collection]
+            return next((i for i, doc in trades.items() if signal_id in doc.get("signals", [])), None)
+
+    def _get(self, collection: str, doc_id: str) -> dict | None:
+        with self._lock:
+            doc = self._collections[collection].get(doc_id)
+            return dict(doc) if doc is not None else None
+
+    def _query(
+        self,
+        collection_name: str,
+        match: Callable[[dict], bool],
+        select: list[str] | None,
+        order_by: str | list[str],
+        descending: bool,
+        start_after: str | None,
+    ) -> Iterator[dict]:
+        fields = [order_by] if isinstance(order_by, str) else list(order_by)
+        if "__name__" not in fields:
+            fields.append("__name__")
+
+        def _key(doc_id: str, doc: dict) -> tuple:
+            return tuple(_sort_value(doc_id if f == "__name__" else doc.get(f)) for f in fields)
+
+        with self._lock:
+            collection = self._collections[collection_name]
+            docs = sorted(
+                ((_key(i, d), i, dict(d)) for i, d in collection.items() if match(d)),
+                key=lambda item: item[0],
+                reverse=descending,
+            )
+            if start_after is not None:
+                if start_after not in collection:
+                    raise ValueError(f"Unable to resume after {start_after}, it is not in {collection_name}")
+                after = _key(start_after, collection[start_after])
+                docs = [item for item in docs if (item[0] < after if descending else item[0] > after)]
+
+        for _, doc_id, doc in docs:
+            if select is not None:
+                doc = {k: v for k, v in doc.items() if k in select}
+            yield {"id": doc_id, **doc}
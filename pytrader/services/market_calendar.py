@@ -0,0 +1,134 @@
+import bisect
+import datetime
+import json
+import logging
+import os
+from typing import Callable, Iterable
+
+from pytrader.utils import localtime
+
+
+def _as_date(value: datetime.date | datetime.datetime) -> datetime.date:
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    return value
+
+
+class MarketCalendar:
+    """
+    Locally persisted list of trading sessions.
+    fetch_sessions: Callable - Returns the open market dates between two dates (inclusive)
+    cache_path: str - JSON file the sessions are persisted to between runs
+    max_age: timedelta - How long persisted sessions are trusted before being refetched
+    """
+
+    _window = datetime.timedelta(days=365)
+
+    def __init__(
+        self,
+        fetch_sessions: Callable[[datetime.date, datetime.date], Iterable[datetime.date]],
+        cache_path: str = None,
+        max_age: datetime.timedelta = datetime.timedelta(days=7),
+    ):
+        self._fetch_sessions = fetch_sessions
+        self._cache_path = cache_path
+        self._max_age = max_age
+        self._sessions: list[datetime.date] = []
+        self._start: datetime.date | None = None
+        self._end: datetime.date | None = None
+        self._fetched_at: datetime.datetime | None = None
+        self._loaded = False
+        self.log = logging.getLogger("pytrader.broker.calendar")
+
+    def market_days_between(self, since: datetime.date, till: datetime.date) -> list[datetime.date]:
+        """
+        Returns the open market days between two dates (inclusive).
+        since: date - The first day of the range
+        till: date - The last day of the range
+        """
+        since, till = _as_date(since), _as_date(till)
+        self._ensure(since, till)
+        lo = bisect.bisect_left(self._sessions, since)
+        hi = bisect.bisect_right(self._sessions, till)
+        return self._sessions[lo:hi]
+
+    def is_trading_day(self, day: datetime.date) -> bool:
+        day = _as_date(day)
+        self._ensure(day, day)
+        i = bisect.bisect_left(self._sessions, day)
+        return i < len(self._sessions) and self._sessions[i] == day
+
+    def next_trade_day(self, now: datetime.datetime = None) -> datetime.datetime | None:
+        """
+        Returns the next open market day. Today counts until 4pm eastern.
+        now: datetime - The point in time to look forward from, defaults to now
+        """
+        now = now or localtime.today()
+        today = now.date()
+        self._ensure(today, today + datetime.timedelta(days=10))
+
+        i = bisect.bisect_left(self._sessions, today)
+        if i < len(self._sessions) and self._sessions[i] == today and now.hour > 15:
+            i += 1
+        if i >= len(self._sessions):
+            return None
+        return localtime.to_day(self._sessions[i])
+
+    def refresh(self, start: datetime.date = None, end: datetime.date = None):
+        """
+        Fetches sessions from the broker and persists them.
+        start: date - First day to fetch, defaults to a year ago
+        end: date - Last day to fetch, defaults to a year from now
+        """
+        today = localtime.today().date()
+        start = min(start or today, today - self._window)
+        end = max(end or today, today + self._window)
+
+        self.log.debug(f"Refreshing market calendar from {start} to {end}.")
+        self._sessions = sorted({_as_date(d) for d in self._fetch_sessions(start, end)})
+        self._start, self._end = start, end
+        self._fetched_at = localtime.today()
+        self._save()
+
+    def _ensure(self, start: datetime.date, end: datetime.date):
+        if not self._loaded:
+            self._load()
+
+        stale = self._fetched_at is None or localtime.today() - self._fetched_at > self._max_age
+        uncovered = self._start is None or start < self._start or end > self._end
+        if stale or uncovered:
+            if not stale:
+                start, end = min(start, self._start), max(end, self._end)
+            self.refresh(start, end)
+
+    def _load(self):
+        self._loaded = True
+        if self._cache_path is None or not os.path.exists(self._cache_path):
+            return
+
+        try:
+            with open(self._cache_path) as f:
+                data = json.load(f)
+            self._sessions = [datetime.date.fromisoformat(d) for d in data["sessions"]]
+            self._start = datetime.date.fromisoformat(data["start"])
+            self._end = datetime.date.fromisoformat(data["end"])
+            self._fetched_at = datetime.datetime.fromisoformat(data["fetched_at"])
+        except (OSError, ValueError, KeyError) as e:
+            self.log.warning(f"Ignoring unreadable market calendar cache {self._cache_path}: {e}")
+            self._sessions, self._start, self._end, self._fetched_at = [], None, None, None
+
+    def _save(self):
+        if self._cache_path is None:
+            return
+
+        data = {
+            "start": self._start.isoformat(),
+            "end": self._end.isoformat(),
+            "fetched_at": self._fetched_at.isoformat(),
+            "sessions": [d.isoformat() for d in self._sessions],
+        }
+        os.makedirs(os.path.dirname(self._cache_path) or ".", exist_ok=True)
+        tmp_path = f"{self._cache_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self._cache_path)
@@ -0,0 +1,149 @@
+import logging
+import queue
+import random
+import threading
+import time
+from typing import Callable
+
+import requests
+
+from .google_chat_notifications import GoogleChatNotification
+
+_flush = object()
+_stop = object()
+
+
+def _is_retryable(error: requests.RequestException) -> bool:
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    status_code = error.response.status_code if error.response is not None else None
+    return status_code == 429 or (status_code is not None and status_code >= 500)
+
+
+class NotificationDispatcher:
+    """
+    Sends chat notifications from a background thread, coalescing lines into digest messages.
+    Adding a line never blocks and never raises, delivery failures are only logged.
+    notifier: GoogleChatNotification - Posts the digests
+    digest_size: int - Lines after which a digest is sent
+    digest_window: float - Seconds a line may wait for more lines before its digest is sent
+    max_retries: int - Retries for connection failures, 429 and 5xx responses
+    base_delay: float - First backoff in seconds, doubled on every attempt with full jitter
+    """
+
+    _max_message_length = 4000
+
+    def __init__(
+        self,
+        notifier: GoogleChatNotification,
+        digest_size: int = 20,
+        digest_window: float = 30.0,
+        max_retries: int = 3,
+        base_delay: float = 1.0,
+        max_queue: int = 10_000,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.notifier = notifier
+        self.digest_size = max(1, digest_size)
+        self.digest_window = digest_window
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self._sleep = sleep
+        self._queue: queue.Queue = queue.Queue(max_queue)
+        self._thread: threading.Thread | None = None
+        self.stats = {"lines": 0, "messages": 0, "failed": 0, "dropped": 0}
+        self.log = logging.getLogger("pytrader.notifications.dispatcher")
+
+    def add(self, line: str):
+        """
+        Queues a line for the next digest.
+        """
+        self._put(line)
+
+    def flush(self):
+        """
+        Sends the lines queued so far as one digest without waiting for it, e.g. at the end of a scan.
+        """
+        self._put(_flush)
+
+    def start(self) -> "NotificationDispatcher":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="notifications", daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self, timeout: float = 30.0):
+        """
+        Sends anything still queued and stops the background thread.
+        """
+        if self._thread is None:
+            return
+        self._queue.put(_stop)
+        self._thread.join(timeout)
+        self._thread = None
+        self.notifier.close()
+        self.log.info(
+            f"Sent {self.stats['messages']} messages with {self.stats['lines']} notifications, "
+            f"{self.stats['failed']} messages failed and {self.stats['dropped']} lines were dropped."
+        )
+
+    def _put(self, item):
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.stats["dropped"] += 1
+
+    def _run(self):
+        lines: list[str] = []
+        first_at = None
+        while True:
+            timeout = None if not lines else max(0.0, first_at + self.digest_window - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = _flush
+
+            if item is not _flush and item is not _stop:
+                if not lines:
+                    first_at = time.monotonic()
+                lines.append(item)
+                if len(lines) < self.digest_size:
+                    continue
+
+            if lines:
+                self._send(lines)
+                lines = []
+            if item is _stop:
+                return
+
+    def _send(self, lines: list[str]):
+        messages, current = [], ""
+        for line in lines:
+            line = line[: self._max_message_length]
+            if current and len(current) + len(line) + 1 > self._max_message_length:
+                messages.append(current)
+                current = ""
+            current = f"{current}\n{line}" if current else line
+        messages.append(current)
+
+        for message in messages:
+            if self._post({"text": message}):
+                self.stats["messages"] += 1
+            else:
+                self.stats["failed"] += 1
+        self.stats["lines"] += len(lines)
+
+    def _post(self, chat_object: dict) -> bool:
+        attempt = 0
+        while True:
+            try:
+                self.notifier.post(chat_object)
+                return True
+            except requests.RequestException as e:
+                if not _is_retryable(e) or attempt >= self.max_retries:
+                    self.log.warning(f"Dropping notification after {attempt + 1} attempts: {e}")
+                    return False
+                delay = random.uniform(0, self.base_delay * 2**attempt)
+                self.log.debug(f"Notification failed, retrying in {delay:.2f}s: {e}")
+                self._sleep(delay)
+                attempt += 1
@@ -0,0 +1,101 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from pytrader.utils.rate_limit import TokenBucket
+
+
+@dataclass
+class OrderIntent:
+    signal_id: str
+    symbol: str
+    action: str
+    qty: int | None = None
+    limit_price: float | None = None
+    stop_price: float | None = None
+
+
+@dataclass
+class ExecutionResult:
+    intent: OrderIntent
+    order_id: str | None = None
+    error: str | None = None
+    latency: float = 0.0
+    submitted_after: float = 0.0
+
+
+class OrderExecutor:
+    """
+    Submits orders to the broker concurrently.
+    broker: AlpacaClient - Anything exposing buy_with_stop_loss and close_position
+    max_parallel: int - Most orders in flight at once
+    rate_limiter: TokenBucket - Optional client side limit on order submissions
+    """
+
+    def __init__(self, broker, max_parallel: int = 8, rate_limiter: TokenBucket = None):
+        self.broker = broker
+        self.max_parallel = max(1, max_parallel)
+        self.rate_limiter = rate_limiter
+        self.log = logging.getLogger("pytrader.broker.executor")
+
+    def execute(self, intents: list[OrderIntent]) -> list[ExecutionResult]:
+        """
+        Submits every intent and returns the results in the same order.
+        Failures are reported on the result instead of raised.
+        """
+        if not intents:
+            return []
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=min(self.max_parallel, len(intents))) as pool:
+            results = list(pool.map(lambda intent: self._submit(intent, started), intents))
+
+        self._report(results, time.perf_counter() - started)
+        return results
+
+    def _submit(self, intent: OrderIntent, started: float) -> ExecutionResult:
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+
+        result = ExecutionResult(intent)
+        call_started = time.perf_counter()
+        try:
+            if intent.action == "Buy":
+                order = self.broker.buy_with_stop_loss(
+                    intent.symbol,
+                    intent.qty,
+                    intent.limit_price,
+                    intent.stop_price,
+                    client_order_id=intent.signal_id,
+                )
+            elif intent.action == "Sell":
+                order = self.broker.close_position(intent.symbol)
+            else:
+                raise ValueError(f"Unknown order action: {intent.action}")
+
+            if order is not None:
+                result.order_id = str(order.id)
+            else:
+                result.error = "Broker returned no order."
+        except Exception as e:
+            result.error = str(e) or type(e).__name__
+
+        finished = time.perf_counter()
+        result.latency = finished - call_started
+        result.submitted_after = finished - started
+        return result
+
+    def _report(self, results: list[ExecutionResult], elapsed: float):
+        for result in results:
+            self.log.debug(
+                f"{result.intent.action} {result.intent.symbol}: {result.latency * 1000:.0f}ms call, "
+                f"acknowledged {result.submitted_after * 1000:.0f}ms after the batch started."
+            )
+
+        latencies = sorted(result.latency for result in results)
+        failed = sum(1 for result in results if result.error)
+        self.log.info(
+            f"Submitted {len(results)} orders ({failed} failed) in {elapsed:.2f}s. "
+            f"Latency p50: {latencies[len(latencies) // 2] * 1000:.0f}ms max: {latencies[-1] * 1000:.0f}ms."
+        )
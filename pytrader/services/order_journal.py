@@ -0,0 +1,332 @@
+import datetime
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from typing import Iterator
+
+from pytrader.utils import localtime
+from .order_writer import _diff
+
+
+@dataclass(frozen=True)
+class JournalEvent:
+    """
+    An order update as journaled.
+    key: str - Order key, as used for the order documents
+    event: str - Trade update event, e.g. new, fill or canceled
+    at: datetime - When the broker updated the order
+    order: dict - The order's full state after the update
+    """
+
+    key: str
+    event: str
+    at: datetime.datetime
+    order: dict
+
+
+def _encode(value):
+    if isinstance(value, datetime.datetime):
+        return {"$t": value.isoformat()}
+    raise TypeError(f"Unable to journal {type(value).__name__}")
+
+
+def _decode(obj: dict):
+    if len(obj) == 1 and "$t" in obj:
+        return localtime.convert_to_est(datetime.datetime.fromisoformat(obj["$t"]))
+    return obj
+
+
+def _apply(previous: dict | None, changes: dict) -> dict:
+    state = dict(previous or {})
+    for name, value in changes.items():
+        if value is None:
+            state.pop(name, None)
+        else:
+            state[name] = value
+    return state
+
+
+class _Segment:
+    """
+    Index of one segment file: where each order's records start and the time span of its events.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.offsets: dict[str, list[int]] = {}
+        self.first: datetime.datetime | None = None
+        self.last: datetime.datetime | None = None
+        self.count = 0
+
+    @property
+    def index_path(self) -> str:
+        return f"{os.path.splitext(self.path)[0]}.idx"
+
+    def add(self, key: str, offset: int, at: datetime.datetime):
+        self.offsets.setdefault(key, []).append(offset)
+        self.first = at if self.first is None or at < self.first else self.first
+        self.last = at if self.last is None or at > self.last else self.last
+        self.count += 1
+
+    def overlaps(self, since: datetime.datetime = None, until: datetime.datetime = None) -> bool:
+        if self.first is None:
+            return False
+        return (since is None or self.last >= since) and (until is None or self.first <= until)
+
+    def save_index(self):
+        data = {
+            "first": self.first.isoformat() if self.first else None,
+            "last": self.last.isoformat() if self.last else None,
+            "count": self.count,
+            "offsets": self.offsets,
+        }
+        with open(f"{self.index_path}.tmp", "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(f"{self.index_path}.tmp", self.index_path)
+
+    def load_index(self) -> bool:
+        if not os.path.exists(self.index_path):
+            return False
+        try:
+            with open(self.index_path) as f:
+                data = json.load(f)
+            self.first = datetime.datetime.fromisoformat(data["first"]) if data["first"] else None
+            self.last = datetime.datetime.fromisoformat(data["last"]) if data["last"] else None
+            self.count = data["count"]
+            self.offsets = data["offsets"]
+            return True
+        except (OSError, ValueError, KeyError):
+            return False
+
+
+class OrderJournal:
+    """
+    Append-only local journal of every order update the monitor receives, so order and trade state can
+    be rebuilt without reading the database or the broker.
+    Updates are appended as JSON lines to numbered segment files. The first record of an order in a segment
+    holds its full state and later ones only the fields that changed, so a segment can be read on its own.
+    Each sealed segment has an index of the offsets of every order's records and the span of its event times.
+    path: str - Directory holding the segments
+    segment_bytes: int - Size after which the current segment is sealed and a new one started
+    retention_days: float - Sealed segments whose newest event is older than this are deleted when the journal
+        is opened and whenever a segment is sealed, None keeps every segment
+    read_only: bool - Only read the journal, e.g. from another process while the monitor appends to it. Nothing
+        is truncated, appended, indexed or deleted and a record still being written is skipped
+    """
+
+    def __init__(
+        self,
+        path: str,
+        segment_bytes: int = 16 * 1024 * 1024,
+        retention_days: float = None,
+        read_only: bool = False,
+    ):
+        self.path = path
+        self.segment_bytes = segment_bytes
+        self.retention_days = retention_days
+        self.read_only = read_only
+        self._segments: list[_Segment] = []
+        self._file = None
+        # Full state of every order in the current segment, the base its next record is diffed against
+        self._states: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self.log = logging.getLogger("pytrader.broker.journal")
+        if not read_only:
+            os.makedirs(path, exist_ok=True)
+        self._open()
+
+    def append(self, key: str, event: str, order: dict):
+        """
+        Journals an order update.
+        key: str - Order key, as used for the order documents
+        event: str - Trade update event
+        order: dict - Serialized order, see AlpacaClient.order_to_dict
+        """
+        if self.read_only:
+            raise ValueError(f"The journal at {self.path} was opened read-only")
+        at = order.get("updated_at") or localtime.today()
+        with self._lock:
+            if self._file.tell() >= self.segment_bytes:
+                self._seal()
+            previous = self._states.get(key)
+            changes = _diff(previous, order)
+            record = {"k": key, "e": event, "t": at, "d": changes}
+            segment = self._segments[-1]
+            segment.add(key, self._file.tell(), at)
+            self._file.write(json.dumps(record, default=_encode, separators=(",", ":")) + "\n")
+            self._file.flush()
+            self._states[key] = dict(order)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                self._segments[-1].save_index()
+
+    def order(self, key: str) -> dict | None:
+        """
+        Returns the latest journaled state of an order, reading only the last segment that has it.
+        """
+        with self._lock:
+            segment = next((s for s in reversed(self._segments) if key in s.offsets), None)
+            if segment is None:
+                return None
+            if segment is self._segments[-1] and self._file is not None:
+                return dict(self._states[key])
+            offsets = list(segment.offsets[key])
+        state = None
+        with open(segment.path, "rb") as f:
+            for offset in offsets:
+                f.seek(offset)
+                record = json.loads(f.readline(), object_hook=_decode)
+                state = _apply(state, record["d"])
+        return state
+
+    def events(
+        self, key: str = None, since: datetime.datetime = None, until: datetime.datetime = None
+    ) -> Iterator[JournalEvent]:
+        """
+        Yields the journaled updates in the order they were received, optionally of one order or within a time span.
+        Segments outside the span or without the order are skipped using their index.
+        """
+        with self._lock:
+            segments = [s for s in self._segments if s.overlaps(since, until) and (key is None or key in s.offsets)]
+        for segment in segments:
+            for event in self._read(segment, key):
+                if (since is None or event.at >= since) and (until is None or event.at <= until):
+                    yield event
+
+    def replay(self) -> dict[str, dict]:
+        """
+        Rebuilds the latest state of every journaled order, keyed by order key.
+        Only the segments that hold some order's last update are read.
+        """
+        with self._lock:
+            last_segment = {}
+            for segment in self._segments:
+                for key in segment.offsets:
+                    last_segment[key] = segment
+            segments = [s for s in self._segments if s in set(last_segment.values())]
+        states = {}
+        for segment in segments:
+            for event in self._read(segment):
+                if last_segment[event.key] is segment:
+                    states[event.key] = event.order
+        return states
+
+    def _read(self, segment: _Segment, key: str = None) -> Iterator[JournalEvent]:
+        states: dict[str, dict] = {}
+        with open(segment.path, "rb") as f:
+            offsets = segment.offsets.get(key, []) if key is not None else None
+            lines = (self._line_at(f, o) for o in offsets) if offsets is not None else f
+            for line in lines:
+                if not line.endswith(b"\n"):
+                    break
+                record = json.loads(line, object_hook=_decode)
+                state = _apply(states.get(record["k"]), record["d"])
+                states[record["k"]] = state
+                yield JournalEvent(record["k"], record["e"], record["t"], dict(state))
+
+    def _line_at(self, f, offset: int) -> bytes:
+        f.seek(offset)
+        return f.readline()
+
+    def _open(self):
+        names = sorted(n for n in os.listdir(self.path) if n.endswith(".log")) if os.path.isdir(self.path) else []
+        for name in names:
+            segment = _Segment(os.path.join(self.path, name))
+            if name != names[-1] and segment.load_index():
+                self._segments.append(segment)
+                continue
+            self._rebuild(segment)
+            self._segments.append(segment)
+            if name != names[-1] and not self.read_only:
+                segment.save_index()
+
+        if self.read_only:
+            return
+        if not self._segments:
+            self._segments.append(_Segment(self._segment_path(1)))
+        self._file = _LineWriter(open(self._segments[-1].path, "ab"))
+        self._expire()
+
+    def _rebuild(self, segment: _Segment):
+        """
+        Indexes a segment by scanning it, dropping a partly written last record. A read-only journal leaves
+        the record in place, the writer may still be finishing it.
+        """
+        self._states = {}
+        valid = 0
+        with open(segment.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line, object_hook=_decode)
+                except ValueError:
+                    break
+                segment.add(record["k"], valid, record["t"])
+                self._states[record["k"]] = _apply(self._states.get(record["k"]), record["d"])
+                valid += len(line)
+        if valid < os.path.getsize(segment.path) and not self.read_only:
+            self.log.warning(f"Dropping a partly written record at the end of {segment.path}.")
+            with open(segment.path, "r+b") as f:
+                f.truncate(valid)
+
+    def _seal(self):
+        self._file.close()
+        self._segments[-1].save_index()
+        # Numbered after the last segment, earlier ones may have been deleted
+        number = int(os.path.splitext(os.path.basename(self._segments[-1].path))[0]) + 1
+        self._segments.append(_Segment(self._segment_path(number)))
+        self._file = _LineWriter(open(self._segments[-1].path, "ab"))
+        self._states = {}
+        self._expire()
+
+    def _expire(self):
+        """
+        Deletes the sealed segments past the retention, the segment being written is always kept.
+        """
+        if self.retention_days is None:
+            return
+        cutoff = localtime.today() - datetime.timedelta(days=self.retention_days)
+        kept = []
+        for segment in self._segments[:-1]:
+            if segment.last is not None and segment.last < cutoff:
+                self.log.info(f"Deleting journal segment {segment.path}, its last event was {segment.last}.")
+                for path in (segment.path, segment.index_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+            else:
+                kept.append(segment)
+        self._segments = kept + self._segments[-1:]
+
+    def _segment_path(self, number: int) -> str:
+        return os.path.join(self.path, f"{number:08d}.log")
+
+
+class _LineWriter:
+    """
+    Appends text lines to a binary file while tracking the byte offset the next line starts at.
+    """
+
+    def __init__(self, f):
+        self._f = f
+        self._offset = f.seek(0, os.SEEK_END)
+
+    def tell(self) -> int:
+        return self._offset
+
+    def write(self, line: str):
+        data = line.encode()
+        self._f.write(data)
+        self._offset += len(data)
+
+    def flush(self):
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
@@ -0,0 +1,128 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable
+
+
+def _diff(previous: dict | None, current: dict) -> dict:
+    """
+    Returns the fields of current that differ from previous. Fields that were removed map to None.
+    """
+    if previous is None:
+        return dict(current)
+
+    changes = {k: v for k, v in current.items() if previous.get(k) != v}
+    changes.update({k: None for k in previous if k not in current})
+    return changes
+
+
+class OrderEventWriter:
+    """
+    Coalesces order updates per order and periodically writes only the fields that changed.
+    persist: Callable - Writes a batch of {order_key: changed_fields}, removed fields are None
+    serialize: Callable - Converts a broker order into the dict that is persisted
+    window: float - Seconds updates are coalesced for before being flushed
+    on_flush: Callable - Called with {order_key: order_dict} after each successful flush
+    """
+
+    _max_snapshots = 10_000
+
+    def __init__(
+        self,
+        persist: Callable[[dict[str, dict]], None],
+        serialize: Callable[[Any], dict] = None,
+        window: float = 0.5,
+        on_flush: Callable[[dict[str, dict]], None] = None,
+    ):
+        self._persist = persist
+        self._serialize = serialize or (lambda order: order)
+        self._window = window
+        self._on_flush = on_flush
+        self._pending: dict[str, Any] = {}
+        self._snapshots: OrderedDict[str, dict] = OrderedDict()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.stats = {"updates": 0, "documents": 0, "batches": 0}
+        self.log = logging.getLogger("pytrader.broker.order_writer")
+
+    def submit(self, order_key: str, order: Any):
+        """
+        Queues the latest state of an order. Never blocks on I/O.
+        order_key: str - The document key of the order
+        order: Any - The broker order, serialized when flushed
+        """
+        with self._lock:
+            self._pending[order_key] = order
+            self.stats["updates"] += 1
+
+    def flush(self) -> int:
+        """
+        Writes the changed fields of every pending order in one batch.
+        Returns the number of documents written.
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+
+            if not pending:
+                return 0
+
+            current = {key: self._serialize(order) for key, order in pending.items()}
+            changes = {}
+            for key, order in current.items():
+                diff = _diff(self._snapshots.get(key), order)
+                if diff:
+                    changes[key] = diff
+
+            if changes:
+                try:
+                    self._persist(changes)
+                except Exception as e:
+                    self.log.error(f"Failed to write {len(changes)} orders, retrying next flush: {e}")
+                    with self._lock:
+                        for key, order in pending.items():
+                            self._pending.setdefault(key, order)
+                    return 0
+                self.stats["documents"] += len(changes)
+                self.stats["batches"] += 1
+
+            for key, order in current.items():
+                self._snapshots[key] = order
+                self._snapshots.move_to_end(key)
+            while len(self._snapshots) > self._max_snapshots:
+                self._snapshots.popitem(last=False)
+
+            if self._on_flush:
+                self._on_flush(current)
+
+            return len(changes)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="order-writer", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """
+        Stops the background flusher and writes anything still pending.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        self.log.info(
+            f"Order writer received {self.stats['updates']} updates and wrote "
+            f"{self.stats['documents']} documents in {self.stats['batches']} batches."
+        )
+
+    def _run(self):
+        while not self._stop.wait(self._window):
+            try:
+                self.flush()
+            except Exception as e:
+                self.log.error(f"Order writer flush failed: {e}")
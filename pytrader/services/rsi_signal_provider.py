@@ -1,24 +1,176 @@
+import logging
 import os
+import tempfile
 
-from pytrader.services import get_adjusted_market_data, get_tickers
-from pytrader.filters import filter_by_dollar_vol
-from pytrader.algos import calculate_signals as calc_bullish_rsi
+import pandas as pd
+
+from pytrader.services import get_adjusted_market_data, get_alpaca_market_data, get_tickers
+from pytrader.filters import filter_by_dollar_vol, dollar_volume, top_dollar_volume_tickers
+from pytrader.algos import scan_symbols
+from pytrader.algos.signal_events import SignalEvents
+from pytrader.algos.trigger_levels import TriggerLevels
+from pytrader.utils import cache, profiling
+from pytrader.utils.timeframe import Timeframe, get_timeframe
 from joblib import Memory
 
-memory = Memory(os.path.join(os.getcwd(), ".cache", "rsi"), verbose=0)
+memory = Memory(cache.path("rsi"), verbose=0)
+log = logging.getLogger("pytrader.rsi")
+
+
+# Chunking, workers and incremental downloads change how the scan runs, not what it returns
+@memory.cache(ignore=["chunk_size", "workers", "incremental"])
+def _cached_rsi_signals(
+    cache_key=None,
+    timeframe_name="1d",
+    lookback_bars=1100,
+    chunk_size=0,
+    workers=1,
+    history=False,
+    incremental=False,
+    data_provider="yfinance",
+) -> SignalEvents:
+    timeframe = get_timeframe(timeframe_name)
+    with profiling.stage("get_tickers"):
+        cache.record("tickers", get_tickers.check_call_in_cache())
+        tickers = get_tickers()
+    if chunk_size:
+        signals, triggers = _chunked_rsi_signals(
+            tickers, timeframe, lookback_bars, chunk_size, workers, incremental, data_provider
+        )
+    else:
+        signals, triggers = _panel_rsi_signals(tickers, timeframe, lookback_bars, workers, incremental, data_provider)
+
+    history_path = os.path.join(cache.path("rsi"), "history", f"{timeframe.name}.pkl") if history else None
+    return SignalEvents.from_frames(signals, history_path=history_path, triggers=triggers)
 
 
-@memory.cache
-def _cached_rsi_signals(cache_key=None):
-    tickers = get_tickers()
-    data = get_adjusted_market_data(tickers)
-    filtered_data = filter_by_dollar_vol(data)
-    signals = calc_bullish_rsi(filtered_data, data)
+def _market_data(data_provider: str):
+    """
+    Returns the download function of a market data provider, yfinance or alpaca.
+    """
+    if data_provider == "alpaca":
+        return get_alpaca_market_data
+    return get_adjusted_market_data
+
+
+def _panel_rsi_signals(
+    tickers: list[str],
+    timeframe: Timeframe,
+    lookback_bars: int,
+    workers: int = 1,
+    incremental: bool = False,
+    data_provider: str = "yfinance",
+) -> tuple[dict, TriggerLevels]:
+    with profiling.stage("download"):
+        data = _market_data(data_provider)(
+            tickers, timeframe.interval, lookback_bars=lookback_bars, incremental=incremental
+        )
+    with profiling.stage("filter_by_dollar_vol"):
+        # Liquidity is ranked over the same 30 sessions whatever the bar size
+        bars = timeframe.bars_per_session
+        filtered_data = filter_by_dollar_vol(data, window=30 * bars, min_periods=12 * bars)
+    with profiling.stage("calculate_signals"):
+        signals = scan_symbols(filtered_data.index.unique(1), data, timeframe, workers)
     return signals
 
 
-def rsi_signals(refresh=False):
+def _chunked_rsi_signals(
+    tickers: list[str],
+    timeframe: Timeframe,
+    lookback_bars: int,
+    chunk_size: int,
+    workers: int = 1,
+    incremental: bool = False,
+    data_provider: str = "yfinance",
+) -> tuple[dict, TriggerLevels]:
+    """
+    Scans the universe a chunk of tickers at a time so only one chunk's bars are held in memory.
+    The first pass downloads every chunk, keeps its dollar volume for the liquidity rank and spills
+    its bars to disk, the second pass reads the chunks back and computes the signals of the liquid tickers.
+    """
+    tickers = sorted(tickers)
+    chunks = [tickers[i : i + chunk_size] for i in range(0, len(tickers), chunk_size)]
+    bars = timeframe.bars_per_session
+
+    with tempfile.TemporaryDirectory(prefix="pytrader-scan-") as spill_dir:
+        spilled, volumes = [], []
+        with profiling.stage("download"):
+            for n, chunk in enumerate(chunks):
+                data = _market_data(data_provider)(
+                    chunk, timeframe.interval, lookback_bars=lookback_bars, incremental=incremental
+                )
+                if data.empty:
+                    continue
+                path = os.path.join(spill_dir, f"{n}.pkl")
+                data.to_pickle(path)
+                spilled.append(path)
+                volumes.append(dollar_volume(data))
+                log.debug(f"Downloaded chunk {n + 1} of {len(chunks)}")
+                del data
+
+        with profiling.stage("filter_by_dollar_vol"):
+            if not volumes:
+                return {}, TriggerLevels.concat([])
+            liquid = top_dollar_volume_tickers(pd.concat(volumes, axis=1), window=30 * bars, min_periods=12 * bars)
+            del volumes
+
+        signals, triggers = {}, []
+        with profiling.stage("calculate_signals"):
+            for path in spilled:
+                data = pd.read_pickle(path)
+                os.remove(path)
+                symbols = [s for s in data.index.unique(1) if s in liquid]
+                chunk_signals, chunk_triggers = scan_symbols(symbols, data, timeframe, workers)
+                signals.update(chunk_signals)
+                triggers.append(chunk_triggers)
+                del data
+    return signals, TriggerLevels.concat(triggers)
+
+
+def rsi_signals(
+    refresh=False,
+    timeframe="1d",
+    lookback_bars=1100,
+    chunk_size=0,
+    workers=1,
+    history=False,
+    incremental=False,
+    data_provider="yfinance",
+):
+    """
+    Returns the latest RSI signal events of every symbol with a recent buy.
+    refresh: bool - Discard cached results and scan again
+    timeframe: str - Bar size to scan, see pytrader.utils.timeframe
+    lookback_bars: int - Bars of history to compute the indicators over
+    chunk_size: int - Tickers downloaded and scanned at a time, 0 scans the universe as one panel
+    workers: int - Processes computing the signals
+    history: bool - Also keep every symbol's full signal history, see SignalEvents.history
+    incremental: bool - Keep the bars on disk and only download the new ones, see BarStore
+    data_provider: str - Where bars are downloaded from, yfinance or alpaca
+    """
     if refresh:
         memory.clear()
-    signals = _cached_rsi_signals()
+    scan = dict(
+        timeframe_name=timeframe,
+        lookback_bars=lookback_bars,
+        chunk_size=chunk_size,
+        workers=workers,
+        history=history,
+        incremental=incremental,
+        data_provider=data_provider,
+    )
+    cache.record("rsi", _cached_rsi_signals.check_call_in_cache(**scan))
+    signals = _cached_rsi_signals(**scan)
     return signals
+
+
+def panel_rsi_signals(data: pd.DataFrame, timeframe="1d") -> SignalEvents:
+    """
+    Returns the latest RSI signal events of every ticker in a (date, ticker) panel that is already loaded,
+    e.g. a simulation's bars. Nothing is downloaded or cached and the panel is scanned in this process,
+    so recent buys are judged against this process' clock.
+    data: DataFrame - Bars of every ticker to scan
+    timeframe: str - Bar size of the panel, see pytrader.utils.timeframe
+    """
+    signals, triggers = scan_symbols(data.index.unique(1), data, get_timeframe(timeframe))
+    return SignalEvents.from_frames(signals, triggers=triggers)
@@ -0,0 +1,107 @@
+import asyncio
+import datetime
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from pytrader.utils import localtime
+from .market_calendar import MarketCalendar
+
+
+@dataclass
+class ScheduledJob:
+    name: str
+    at: datetime.time
+    run: Callable[[], Any]
+
+
+class SessionScheduler:
+    """
+    Runs jobs once per trading session at fixed eastern times, one job at a time.
+    A job that comes due while an earlier one is still running starts as soon as that one finishes,
+    so a slow scan delays signal processing instead of skipping it.
+    calendar: MarketCalendar - Decides which days are trading sessions
+    jobs: list - Jobs in the order they should run when several are due together
+    clock: Callable - Returns the current eastern time
+    """
+
+    _max_sleep = 60.0
+
+    def __init__(
+        self,
+        calendar: MarketCalendar,
+        jobs: list[ScheduledJob],
+        clock: Callable[[], datetime.datetime] = localtime.today,
+    ):
+        self.calendar = calendar
+        self.jobs = jobs
+        self._clock = clock
+        self._last_run: dict[str, datetime.date] = {}
+        self.log = logging.getLogger("pytrader.scheduler")
+
+        # Starting after a job's time does not replay it, cron would not have either
+        now = clock()
+        for job in jobs:
+            if now.time() >= job.at:
+                self._last_run[job.name] = now.date()
+
+    def due(self, now: datetime.datetime) -> list[ScheduledJob]:
+        """
+        Returns the jobs whose time has passed today and that have not run yet this session.
+        """
+        if not self.calendar.is_trading_day(now.date()):
+            return []
+        return [job for job in self.jobs if now.time() >= job.at and self._last_run.get(job.name) != now.date()]
+
+    def next_run(self, now: datetime.datetime) -> datetime.datetime:
+        """
+        Returns the next time any job becomes due.
+        """
+        day = now.date()
+        while True:
+            if self.calendar.is_trading_day(day):
+                pending = [job.at for job in self.jobs if self._last_run.get(job.name) != day]
+                if pending:
+                    return max(now, localtime.localize_to_et(datetime.datetime.combine(day, min(pending))))
+            day += datetime.timedelta(days=1)
+
+    async def run_pending(self) -> int:
+        """
+        Runs every due job in a worker thread and returns how many ran.
+        """
+        ran = 0
+        while True:
+            now = self._clock()
+            jobs = self.due(now)
+            if not jobs:
+                return ran
+            job = jobs[0]
+            self._last_run[job.name] = now.date()
+            await self._execute(job)
+            ran += 1
+
+    async def run(self):
+        """
+        Runs jobs until cancelled.
+        """
+        for job in self.jobs:
+            self.log.info(f"Scheduled {job.name} at {job.at:%H:%M} ET on trading days.")
+
+        while True:
+            await self.run_pending()
+            now = self._clock()
+            wake_at = self.next_run(now)
+            self.log.debug(f"Next job due at {wake_at}.")
+            # Sleep in slices so clock changes and calendar refreshes are picked up
+            await asyncio.sleep(min(self._max_sleep, max(0.0, (wake_at - now).total_seconds())))
+
+    async def _execute(self, job: ScheduledJob):
+        self.log.info(f"Starting {job.name}.")
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(job.run)
+        except Exception:
+            self.log.exception(f"{job.name} failed.")
+            return
+        self.log.info(f"Finished {job.name} in {time.perf_counter() - started:.1f}s.")
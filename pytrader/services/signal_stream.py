@@ -0,0 +1,146 @@
+import asyncio
+import datetime
+import logging
+from dataclasses import dataclass
+from typing import Callable, Iterable
+
+import pandas as pd
+
+from pytrader.algos.incremental_rsi import RsiState
+from pytrader.utils.timeframe import Timeframe
+
+PriceHandler = Callable[[str, datetime.datetime, float], None]
+
+
+@dataclass(frozen=True)
+class ProvisionalSignal:
+    """
+    A signal the forming bar gives at the latest price, it only holds if the bar closes at a similar price.
+    bar: datetime - Start of the forming bar, in eastern time
+    price: float - Price the signal fired at
+    rsi: float - RSI of the forming bar at that price
+    at: datetime - Time of the price
+    """
+
+    symbol: str
+    action: str
+    bar: datetime.datetime
+    price: float
+    rsi: float
+    at: datetime.datetime
+
+
+class StreamingRsiEvaluator:
+    """
+    Evaluates the bullish RSI strategy on streamed prices, updating each symbol's indicators in constant time.
+    A price in a new bar first completes the symbol's previous bar at its last price, then the forming bar
+    is checked at the price. A symbol signals at most once per bar.
+    states: dict[str, RsiState] - Indicators of every evaluated symbol, seeded with its completed bars
+    timeframe: Timeframe - Bar size the states were seeded with
+    on_signal: Callable - Receives every ProvisionalSignal
+    """
+
+    def __init__(
+        self, states: dict[str, RsiState], timeframe: Timeframe, on_signal: Callable[[ProvisionalSignal], None]
+    ):
+        self.states = states
+        self.timeframe = timeframe
+        self.on_signal = on_signal
+        self.ticks = 0
+        # Start and last price of every symbol's forming bar
+        self._forming: dict[str, tuple[datetime.datetime, float]] = {}
+        self._signalled: dict[str, datetime.datetime] = {}
+        self.log = logging.getLogger("pytrader.signals.stream")
+
+    @classmethod
+    def from_panel(
+        cls,
+        df: pd.DataFrame,
+        symbols: Iterable[str],
+        timeframe: Timeframe,
+        on_signal: Callable[[ProvisionalSignal], None],
+        before: datetime.datetime = None,
+    ) -> "StreamingRsiEvaluator":
+        """
+        Seeds every symbol's indicators from a (date, ticker) panel of completed bars, as scanned.
+        before: datetime - Bars starting at or after this instant are still forming and are left out
+        """
+        states = {}
+        available = set(df.index.unique(1))
+        for symbol in symbols:
+            if symbol not in available:
+                continue
+            frame = df.xs(symbol, level=1).drop_duplicates()
+            if before is not None:
+                frame = frame[[timeframe.to_et(d) < before for d in frame.index]]
+            states[symbol] = RsiState.from_closes(frame["close"].dropna().to_numpy(dtype="f8").tolist())
+        return cls(states, timeframe, on_signal)
+
+    def on_price(self, symbol: str, timestamp: datetime.datetime, price: float) -> ProvisionalSignal | None:
+        """
+        Takes a price of a symbol, returning the provisional signal it raised if any.
+        """
+        state = self.states.get(symbol)
+        if state is None:
+            return None
+        bar = self.timeframe.bar_start(timestamp)
+        if bar is None:
+            return None
+
+        forming = self._forming.get(symbol)
+        if forming is not None and forming[0] != bar:
+            if bar < forming[0]:
+                # A late price of a bar that was already completed
+                return None
+            state.update(forming[1])
+        self._forming[symbol] = (bar, price)
+        self.ticks += 1
+
+        action = state.peek(price)
+        if action is None or self._signalled.get(symbol) == bar:
+            return None
+        self._signalled[symbol] = bar
+        signal = ProvisionalSignal(symbol, action, bar, price, state.peek_rsi(price), timestamp)
+        self.on_signal(signal)
+        return signal
+
+    def flush(self):
+        """
+        Completes every forming bar at its last price, e.g. once the session has closed.
+        """
+        for symbol, (_, price) in self._forming.items():
+            self.states[symbol].update(price)
+        self._forming.clear()
+
+
+class ReplayPrices:
+    """
+    Local stand-in for the broker's price stream that replays stored bars in time order.
+    bars: DataFrame - Bars indexed by (date, ticker) with a close column, usually minute bars
+    """
+
+    def __init__(self, bars: pd.DataFrame):
+        ordered = bars["close"].dropna().sort_index(level=0, kind="stable")
+        self._dates = [d.to_pydatetime() for d in ordered.index.get_level_values(0)]
+        self._tickers = ordered.index.get_level_values(1).tolist()
+        self._closes = ordered.to_numpy(dtype="f8").tolist()
+
+    @classmethod
+    def from_pickle(cls, path: str):
+        return cls(pd.read_pickle(path))
+
+    @property
+    def start(self) -> datetime.datetime | None:
+        return self._dates[0] if self._dates else None
+
+    async def stream_prices(self, price_handler: PriceHandler, symbols: Iterable[str]):
+        """
+        Passes every stored close of the symbols to the handler as (symbol, bar start, close).
+        """
+        symbols = set(symbols)
+        for n, (date, ticker, close) in enumerate(zip(self._dates, self._tickers, self._closes)):
+            if ticker in symbols:
+                price_handler(ticker, date, close)
+            if n % 1000 == 999:
+                # Let the rest of the loop run between batches of prices
+                await asyncio.sleep(0)
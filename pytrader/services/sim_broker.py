@@ -0,0 +1,477 @@
+import asyncio
+import datetime
+import logging
+import os
+import pickle
+import queue
+import threading
+import uuid
+from dataclasses import dataclass, field
+from typing import Callable, Iterator
+
+import pandas as pd
+from alpaca.common.exceptions import APIError
+from alpaca.trading.enums import (
+    AccountStatus,
+    AssetClass,
+    AssetExchange,
+    OrderClass,
+    OrderSide,
+    OrderStatus,
+    OrderType,
+    PositionSide,
+    TimeInForce,
+)
+from alpaca.trading.models import Order, Position, TradeAccount
+
+from pytrader.utils import localtime
+from .alpaca import AlpacaClient
+from .market_calendar import MarketCalendar
+from .stream_checkpoint import StreamCheckpoint
+
+_open_statuses = {OrderStatus.NEW, OrderStatus.HELD, OrderStatus.PARTIALLY_FILLED}
+
+
+@dataclass
+class _SimOrder:
+    id: uuid.UUID
+    symbol: str
+    side: OrderSide
+    order_type: OrderType
+    qty: float
+    submitted_at: datetime.datetime
+    active_from: datetime.date
+    time_in_force: TimeInForce = TimeInForce.DAY
+    order_class: OrderClass = OrderClass.SIMPLE
+    limit_price: float | None = None
+    stop_price: float | None = None
+    status: OrderStatus = OrderStatus.NEW
+    updated_at: datetime.datetime = None
+    filled_at: datetime.datetime | None = None
+    filled_avg_price: float | None = None
+    expired_at: datetime.datetime | None = None
+    canceled_at: datetime.datetime | None = None
+    legs: list["_SimOrder"] = field(default_factory=list)
+
+    def to_order(self) -> Order:
+        return Order.model_construct(
+            id=self.id,
+            client_order_id=str(self.id),
+            created_at=self.submitted_at,
+            updated_at=self.updated_at or self.submitted_at,
+            submitted_at=self.submitted_at,
+            filled_at=self.filled_at,
+            expired_at=self.expired_at,
+            canceled_at=self.canceled_at,
+            asset_id=uuid.uuid5(uuid.NAMESPACE_OID, self.symbol),
+            symbol=self.symbol,
+            asset_class=AssetClass.US_EQUITY,
+            qty=self.qty,
+            filled_qty=self.qty if self.status == OrderStatus.FILLED else 0,
+            filled_avg_price=self.filled_avg_price,
+            order_class=self.order_class,
+            order_type=self.order_type,
+            type=self.order_type,
+            side=self.side,
+            time_in_force=self.time_in_force,
+            limit_price=self.limit_price,
+            stop_price=self.stop_price,
+            status=self.status,
+            extended_hours=False,
+            legs=[leg.to_order() for leg in self.legs] or None,
+        )
+
+
+class SimulatedBroker:
+    """
+    Offline stand-in for AlpacaClient that fills orders against stored daily bars.
+    Orders placed on a session become active on the next one, which matches placing
+    orders after the close and having them worked the following day.
+    bars: DataFrame - Daily bars indexed by (date, ticker) with open, high, low and close columns
+    cash: float - Starting cash
+    slippage: float - Fraction of the price that market and stop fills are moved against the order
+    start: date - Session the simulation starts on, defaults to the first bar
+    The broker pickles with its orders, positions and clock, so save and load carry a simulation across runs.
+    """
+
+    order_to_dict = AlpacaClient.order_to_dict
+    paper = True
+
+    def __init__(self, bars: pd.DataFrame, cash: float = 100_000, slippage: float = 0.0005, start=None):
+        self.slippage = slippage
+        self.cash = float(cash)
+        self.positions: dict[str, list[float]] = {}
+        self.orders: dict[uuid.UUID, _SimOrder] = {}
+        self._open: dict[uuid.UUID, _SimOrder] = {}
+        self._listeners: list[Callable[[str, Order], None]] = []
+        self._stream_closed = True
+        self._lock = threading.RLock()
+        self._tick = 0
+        self.log = logging.getLogger("pytrader.broker.simulated")
+
+        self.bars = bars.sort_index()
+        self._bar_dates = pd.DatetimeIndex(self.bars.index.get_level_values("date")).date
+        self._bars: dict[str, dict[datetime.date, tuple]] = {}
+        for ticker, frame in bars[["open", "high", "low", "close"]].groupby(level="ticker"):
+            dates = [pd.Timestamp(d).date() for d in frame.index.get_level_values("date")]
+            self._bars[ticker] = dict(zip(dates, frame.itertuples(index=False, name=None)))
+
+        self.sessions = sorted({d for symbol_bars in self._bars.values() for d in symbol_bars})
+        self._session_index = 0
+        if start is not None:
+            self._session_index = next(i for i, d in enumerate(self.sessions) if d >= start)
+        self.calendar = self._calendar()
+        self._last_close: dict[str, float] = {}
+        self._mark_to_market()
+
+    @classmethod
+    def from_pickle(cls, path: str, **kwargs):
+        return cls(pd.read_pickle(path), **kwargs)
+
+    @classmethod
+    def load(cls, path: str) -> "SimulatedBroker":
+        """
+        Restores a simulation written by save.
+        """
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    def save(self, path: str):
+        """
+        Writes the simulation's orders, positions, cash and current session, replacing the file once written.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._lock, open(f"{path}.tmp", "wb") as f:
+            pickle.dump(self, f)
+        os.replace(f"{path}.tmp", path)
+
+    def __getstate__(self):
+        # Listeners, streams and the lock belong to the process running the simulation
+        state = {k: v for k, v in self.__dict__.items() if k not in ("_lock", "_listeners", "calendar", "log")}
+        state["_stream_closed"] = True
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+        self._listeners = []
+        self.calendar = self._calendar()
+        self.log = logging.getLogger("pytrader.broker.simulated")
+
+    @property
+    def today(self) -> datetime.date:
+        return self.sessions[self._session_index]
+
+    @property
+    def now(self) -> datetime.datetime:
+        """
+        The simulated clock, which sits at the close of the current session.
+        """
+        return self._at(self.today, 16)
+
+    def account(self):
+        reserved = sum(o.qty * o.limit_price for o in self._open.values() if o.side == OrderSide.BUY)
+        portfolio_value = self.cash + sum(qty * self._last_close[s] for s, (qty, _) in self.positions.items())
+        account = TradeAccount.model_construct(
+            id=uuid.UUID(int=0),
+            account_number="SIMULATED",
+            status=AccountStatus.ACTIVE,
+            account_blocked=False,
+            trading_blocked=False,
+            cash=str(self.cash),
+            portfolio_value=str(portfolio_value),
+            equity=str(portfolio_value),
+            non_marginable_buying_power=str(self.cash - reserved),
+            buying_power=str(self.cash - reserved),
+        )
+        return (True, account)
+
+    def get_positions(self):
+        return [self._position(symbol) for symbol in self.positions]
+
+    def get_position_for(self, symbol):
+        if symbol not in self.positions:
+            return None
+        return self._position(symbol)
+
+    def history(self, lookback_bars: int = None) -> pd.DataFrame:
+        """
+        The bars up to and including the current session, what a scan run after its close would download.
+        lookback_bars: int - Bars kept per ticker, all when None
+        """
+        bars = self.bars[self._bar_dates <= self.today]
+        if lookback_bars:
+            bars = bars.groupby(level="ticker", group_keys=False).tail(lookback_bars)
+        return bars
+
+    def get_open_market_days_since(self, since: datetime.date, till: datetime.date = None):
+        return self.calendar.market_days_between(since, till or self.today)
+
+    def get_next_trade_day(self):
+        return self.calendar.next_trade_day(self.now)
+
+    def get_orders(self):
+        return [order.to_order() for order in self.orders.values()]
+
+    def get_open_orders(self):
+        return [order.to_order() for order in self._open.values()]
+
+    def get_orders_since(self, after: datetime.datetime, page_size: int = 500) -> Iterator[Order]:
+        orders = sorted(self.orders.values(), key=lambda o: o.submitted_at)
+        return (order.to_order() for order in orders if order.submitted_at > after)
+
+    def get_order_by_id(self, order_id):
+        if order_id is None:
+            return None
+        order = self.orders.get(uuid.UUID(str(order_id)))
+        return self.order_to_dict(order.to_order()) if order else None
+
+    def close_order(self, order_id):
+        with self._lock:
+            order = self.orders.get(uuid.UUID(str(order_id)))
+            if order is not None and order.status in _open_statuses:
+                self._finish(order, OrderStatus.CANCELED, self._clock())
+
+    def buy_with_stop_loss(self, symbol: str, qty: float | int, limit_price: float, stop_price: float, **kwargs):
+        if symbol not in self._bars:
+            raise APIError(f'{{"code": 40010001, "message": "asset {symbol} not found"}}')
+
+        with self._lock:
+            submitted_at = self._clock()
+            active_from = self._next_session()
+        stop_loss = _SimOrder(
+            uuid.uuid4(),
+            symbol,
+            OrderSide.SELL,
+            OrderType.STOP,
+            qty,
+            submitted_at,
+            active_from,
+            time_in_force=TimeInForce.GTC,
+            order_class=OrderClass.OTO,
+            stop_price=round(stop_price, 2),
+            status=OrderStatus.HELD,
+        )
+        order = _SimOrder(
+            uuid.uuid4(),
+            symbol,
+            OrderSide.BUY,
+            OrderType.LIMIT,
+            qty,
+            submitted_at,
+            active_from,
+            order_class=OrderClass.OTO,
+            limit_price=round(limit_price, 2),
+            legs=[stop_loss],
+        )
+        with self._lock:
+            self._accept(order)
+            return order.to_order()
+
+    def close_position(self, symbol):
+        with self._lock:
+            if symbol not in self.positions:
+                raise APIError('{"code": 40410000, "message": "position not found"}')
+
+            for order in list(self._open.values()):
+                if order.symbol == symbol and order.side == OrderSide.SELL:
+                    self._finish(order, OrderStatus.CANCELED, self._clock())
+
+            qty = self.positions[symbol][0]
+            order = _SimOrder(
+                uuid.uuid4(), symbol, OrderSide.SELL, OrderType.MARKET, qty, self._clock(), self._next_session()
+            )
+            self._accept(order)
+            return order.to_order()
+
+    def add_listener(self, listener: Callable[[str, Order], None]):
+        """
+        Registers a synchronous callback for every order event, for fast replays.
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[str, Order], None]):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def get_order_stream(self, trade_updates_handler, raw_orders: bool = False, checkpoint: StreamCheckpoint = None):
+        """
+        Streams order events to an async handler until close_stream is called.
+        """
+        asyncio.run(self.stream_orders(trade_updates_handler, raw_orders, checkpoint))
+
+    async def stream_orders(self, trade_updates_handler, raw_orders: bool = False, checkpoint: StreamCheckpoint = None):
+        """
+        Same as get_order_stream but runs on the caller's event loop until closed or cancelled.
+        """
+        events = queue.Queue()
+        self._stream_closed = False
+
+        def _listener(event, order):
+            events.put((event, order))
+
+        # Removed again when the stream ends, a restarted stream would otherwise leave its old queue behind
+        self.add_listener(_listener)
+        try:
+            while not self._stream_closed or not events.empty():
+                try:
+                    event, order = await asyncio.to_thread(events.get, True, 0.1)
+                except queue.Empty:
+                    continue
+                await trade_updates_handler(event, order if raw_orders else self.order_to_dict(order))
+        finally:
+            self.remove_listener(_listener)
+
+    def close_stream(self):
+        self._stream_closed = True
+
+    def advance(self) -> bool:
+        """
+        Moves the clock to the next session and works every open order against its bar.
+        Returns False once the bars are exhausted.
+        """
+        with self._lock:
+            if self._session_index + 1 >= len(self.sessions):
+                return False
+            self._session_index += 1
+            self._work_session(self.today)
+            return True
+
+    def _work_session(self, today: datetime.date):
+        for order in sorted(self._open.values(), key=lambda o: o.side == OrderSide.SELL):
+            if order.active_from > today or order.status == OrderStatus.HELD:
+                continue
+            bar = self._bars[order.symbol].get(today)
+            if bar is None:
+                continue
+            self._work(order, bar, today)
+
+        for order in list(self._open.values()):
+            if order.time_in_force == TimeInForce.DAY and order.active_from <= today:
+                self._finish(order, OrderStatus.EXPIRED, self._at(today, 16))
+
+        self._mark_to_market()
+
+    def run_until(self, end: datetime.date, on_session: Callable[["SimulatedBroker"], None] = None):
+        """
+        Advances session by session until end, calling on_session after every close.
+        """
+        while self.today < end and self.advance():
+            if on_session:
+                on_session(self)
+
+    def _work(self, order: _SimOrder, bar: tuple, today: datetime.date):
+        open_, high, low, close = bar
+        if order.order_type == OrderType.MARKET:
+            self._fill(order, self._slip(open_, order.side), self._at(today, 9, 30))
+        elif order.order_type == OrderType.LIMIT:
+            if open_ <= order.limit_price:
+                self._fill(order, min(self._slip(open_, order.side), order.limit_price), self._at(today, 9, 30))
+            elif low <= order.limit_price:
+                self._fill(order, order.limit_price, self._at(today, 12))
+        elif order.order_type == OrderType.STOP:
+            if open_ <= order.stop_price:
+                self._fill(order, self._slip(open_, order.side), self._at(today, 9, 30))
+            elif low <= order.stop_price:
+                self._fill(order, self._slip(order.stop_price, order.side), self._at(today, 12))
+
+    def _fill(self, order: _SimOrder, price: float, at: datetime.datetime):
+        price = round(price, 4)
+        order.filled_avg_price = price
+        order.filled_at = at
+        qty, avg_price = self.positions.get(order.symbol, (0.0, 0.0))
+
+        if order.side == OrderSide.BUY:
+            self.cash -= order.qty * price
+            new_qty = qty + order.qty
+            self.positions[order.symbol] = [new_qty, (qty * avg_price + order.qty * price) / new_qty]
+        else:
+            self.cash += order.qty * price
+            if qty - order.qty > 0:
+                self.positions[order.symbol] = [qty - order.qty, avg_price]
+            else:
+                self.positions.pop(order.symbol, None)
+
+        self._finish(order, OrderStatus.FILLED, at)
+
+        for leg in order.legs:
+            leg.status = OrderStatus.NEW
+            leg.active_from = at.date()
+            leg.updated_at = at
+            self._open[leg.id] = leg
+            self._emit("new", leg)
+            self._work(leg, self._bars[leg.symbol][at.date()], at.date())
+
+    def _finish(self, order: _SimOrder, status: OrderStatus, at: datetime.datetime):
+        order.status = status
+        order.updated_at = at
+        if status == OrderStatus.EXPIRED:
+            order.expired_at = at
+        elif status == OrderStatus.CANCELED:
+            order.canceled_at = at
+        self._open.pop(order.id, None)
+
+        for leg in order.legs:
+            if status != OrderStatus.FILLED and leg.status in _open_statuses:
+                self._finish(leg, OrderStatus.CANCELED, at)
+
+        self._emit({OrderStatus.FILLED: "fill", OrderStatus.EXPIRED: "expired"}.get(status, "canceled"), order)
+
+    def _accept(self, order: _SimOrder):
+        order.updated_at = order.submitted_at
+        self.orders[order.id] = order
+        self._open[order.id] = order
+        for leg in order.legs:
+            leg.updated_at = order.submitted_at
+            self.orders[leg.id] = leg
+        self._emit("new", order)
+
+    def _emit(self, event: str, order: _SimOrder):
+        if not self._listeners:
+            return
+        snapshot = order.to_order()
+        for listener in list(self._listeners):
+            listener(event, snapshot)
+
+    def _position(self, symbol: str) -> Position:
+        qty, avg_price = self.positions[symbol]
+        return Position.model_construct(
+            asset_id=uuid.uuid5(uuid.NAMESPACE_OID, symbol),
+            symbol=symbol,
+            exchange=AssetExchange.NASDAQ,
+            asset_class=AssetClass.US_EQUITY,
+            avg_entry_price=str(avg_price),
+            qty=str(int(qty)),
+            side=PositionSide.LONG,
+            cost_basis=str(qty * avg_price),
+            market_value=str(qty * self._last_close[symbol]),
+            current_price=str(self._last_close[symbol]),
+        )
+
+    def _slip(self, price: float, side: OrderSide) -> float:
+        return price * (1 + self.slippage) if side == OrderSide.BUY else price * (1 - self.slippage)
+
+    def _mark_to_market(self):
+        today = self.today
+        for symbol, bars in self._bars.items():
+            bar = bars.get(today)
+            if bar is not None:
+                self._last_close[symbol] = bar[3]
+
+    def _next_session(self) -> datetime.date:
+        return self.sessions[min(self._session_index + 1, len(self.sessions) - 1)]
+
+    def _clock(self) -> datetime.datetime:
+        """
+        Monotonic timestamps after the close so orders placed in one session keep their submission order.
+        """
+        self._tick += 1
+        return self.now + datetime.timedelta(microseconds=self._tick)
+
+    def _calendar(self) -> MarketCalendar:
+        return MarketCalendar(lambda start, end: [d for d in self.sessions if start <= d <= end])
+
+    def _at(self, day: datetime.date, hour: int, minute: int = 0) -> datetime.datetime:
+        return localtime.localize_to_et(datetime.datetime(day.year, day.month, day.day, hour, minute))
@@ -0,0 +1,83 @@
+import datetime
+import json
+import logging
+import os
+import threading
+
+_terminal_statuses = {"FILLED", "CANCELED", "EXPIRED", "REJECTED", "REPLACED"}
+
+
+class StreamCheckpoint:
+    """
+    Remembers how far the order stream has been persisted so a restart can backfill the gap.
+    path: str - JSON file the checkpoint is persisted to
+    """
+
+    def __init__(self, path: str = None):
+        self._path = path
+        self._lock = threading.Lock()
+        self.last_event_at: datetime.datetime | None = None
+        self.open_orders: dict[str, datetime.datetime] = {}
+        self.log = logging.getLogger("pytrader.broker.checkpoint")
+        self._load()
+
+    def resume_from(self) -> datetime.datetime | None:
+        """
+        Returns the submission time a backfill has to start from to see every order that may have
+        changed since the last persisted event, or None when nothing was ever persisted.
+        """
+        with self._lock:
+            if self.last_event_at is None:
+                return None
+            # Orders are filtered on an exclusive submission time, so step back to include the oldest open order
+            return min([self.last_event_at, *self.open_orders.values()]) - datetime.timedelta(seconds=1)
+
+    def is_newer(self, updated_at: datetime.datetime) -> bool:
+        """
+        Returns whether an order update happened after the last persisted event.
+        """
+        with self._lock:
+            return self.last_event_at is None or updated_at > self.last_event_at
+
+    def advance(self, orders: dict[str, dict]):
+        """
+        Moves the checkpoint past a batch of persisted orders.
+        orders: dict - Serialized orders keyed by order key
+        """
+        with self._lock:
+            for order in orders.values():
+                updated_at = order.get("updated_at")
+                if updated_at is not None and (self.last_event_at is None or updated_at > self.last_event_at):
+                    self.last_event_at = updated_at
+
+                if (order.get("status") or "").upper() in _terminal_statuses:
+                    self.open_orders.pop(order["id"], None)
+                elif order.get("submitted_at") is not None:
+                    self.open_orders[order["id"]] = order["submitted_at"]
+            self._save()
+
+    def _load(self):
+        if self._path is None or not os.path.exists(self._path):
+            return
+
+        try:
+            with open(self._path) as f:
+                data = json.load(f)
+            self.last_event_at = datetime.datetime.fromisoformat(data["last_event_at"])
+            self.open_orders = {k: datetime.datetime.fromisoformat(v) for k, v in data["open_orders"].items()}
+        except (OSError, ValueError, KeyError) as e:
+            self.log.warning(f"Ignoring unreadable stream checkpoint {self._path}: {e}")
+
+    def _save(self):
+        if self._path is None or self.last_event_at is None:
+            return
+
+        data = {
+            "last_event_at": self.last_event_at.isoformat(),
+            "open_orders": {k: v.isoformat() for k, v in self.open_orders.items()},
+        }
+        os.makedirs(os.path.dirname(self._path) or ".", exist_ok=True)
+        tmp_path = f"{self._path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self._path)
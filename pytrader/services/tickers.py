@@ -1,10 +1,12 @@
 import logging as l
 from joblib import Memory
 from pandas import read_html, Timestamp
-from .yf_data import ny_tz
+from pytz import timezone
 
-cachedir = "./.cache/tickers"
-memory = Memory(cachedir, verbose=0)
+from pytrader.utils import cache
+
+ny_tz = timezone("America/New_York")
+memory = Memory(cache.path("tickers"), verbose=0)
 
 
 @memory.cache
@@ -0,0 +1,175 @@
+import datetime
+import logging
+import os
+from typing import Iterable
+
+import numpy as np
+
+_text_columns = ("id", "symbol")
+_time_columns = ("opened_on", "closed_on", "settled_at")
+_number_columns = ("cost_basis", "sale_price", "revenue", "result_pct", "market_exposure")
+
+
+def _to_datetime64(value) -> np.datetime64:
+    if value is None:
+        return np.datetime64("NaT", "s")
+    if isinstance(value, datetime.datetime) and value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return np.datetime64(value, "s")
+
+
+def _to_float(value) -> float:
+    return np.nan if value is None else float(value)
+
+
+class ClosedTrades:
+    """
+    Columnar local copy of the closed trades, persisted as a numpy .npz file.
+    Times are UTC datetime64[s], missing numbers are NaN.
+    path: str - File the columns are persisted to
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.columns: dict[str, np.ndarray] = self._empty()
+        self.log = logging.getLogger("pytrader.analytics.trades")
+
+    def __len__(self) -> int:
+        return len(self.columns["id"])
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self.columns[column]
+
+    @property
+    def watermark(self) -> datetime.datetime | None:
+        """
+        The latest settlement time in the export, reads newer than this are incremental.
+        """
+        settled = self.columns["settled_at"]
+        settled = settled[~np.isnat(settled)]
+        if len(settled) == 0:
+            return None
+        return settled.max().astype(datetime.datetime).replace(tzinfo=datetime.timezone.utc)
+
+    def load(self) -> "ClosedTrades":
+        if self.path is None or not os.path.exists(self.path):
+            return self
+        with np.load(self.path) as data:
+            self.columns = {name: data[name] for name in self.columns}
+        return self
+
+    def save(self):
+        if self.path is None:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp.npz"
+        np.savez(tmp_path, **self.columns)
+        os.replace(tmp_path, self.path)
+
+    def merge(self, trades: Iterable[dict]) -> int:
+        """
+        Adds trade documents, replacing any already exported with the same id.
+        Trades without a closing fill, e.g. canceled trades, are skipped.
+        Returns the number of trades merged.
+        """
+        rows = [t for t in trades if t.get("closed_on") is not None and t.get("canceled_reason") is None]
+        if not rows:
+            return 0
+
+        incoming = {name: np.array([str(t[name]) for t in rows], dtype=str) for name in _text_columns}
+        incoming.update({name: np.array([_to_datetime64(t.get(name)) for t in rows]) for name in _time_columns})
+        incoming.update({name: np.array([_to_float(t.get(name)) for t in rows]) for name in _number_columns})
+
+        merged = {name: np.concatenate([self.columns[name], incoming[name]]) for name in self.columns}
+        # Keep the newest copy of every id, then order by close time
+        _, last = np.unique(merged["id"][::-1], return_index=True)
+        keep = len(merged["id"]) - 1 - last
+        keep = keep[np.argsort(merged["closed_on"][keep], kind="stable")]
+        self.columns = {name: column[keep] for name, column in merged.items()}
+        return len(rows)
+
+    def refresh(self, db, full: bool = False, page_size: int = 500) -> int:
+        """
+        Reads the trades settled since the last export, or every closed trade when full is set.
+        db: TraderDatabase - Source of the closed trades
+        Returns the number of trades read.
+        """
+        since = None if full else self.watermark
+        if full:
+            self.columns = self._empty()
+        count = self.merge(db.get_closed_trades(settled_since=since, page_size=page_size))
+        self.log.info(f"Read {count} closed trades settled since {since or 'the beginning'}.")
+        return count
+
+    def _empty(self) -> dict[str, np.ndarray]:
+        columns = {name: np.array([], dtype=str) for name in _text_columns}
+        columns.update({name: np.array([], dtype="datetime64[s]") for name in _time_columns})
+        columns.update({name: np.array([], dtype=float) for name in _number_columns})
+        return columns
+
+
+def equity_curve(trades: ClosedTrades) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the close times and the cumulative realized P&L after each closed trade.
+    """
+    order = np.argsort(trades["closed_on"], kind="stable")
+    return trades["closed_on"][order], np.cumsum(np.nan_to_num(trades["revenue"][order]))
+
+
+def drawdown(equity: np.ndarray) -> np.ndarray:
+    """
+    Returns how far the equity curve is below its running peak, the peak starts at zero P&L.
+    """
+    if len(equity) == 0:
+        return equity
+    return equity - np.maximum.accumulate(np.maximum(equity, 0))
+
+
+def summarize_trades(trades: ClosedTrades) -> dict:
+    """
+    Portfolio statistics over every closed trade.
+    exposure_adjusted_return is the sum of trade returns over the sum of days in the market,
+    i.e. the average return per day of market exposure.
+    """
+    if len(trades) == 0:
+        return {"trades": 0}
+
+    _, equity = equity_curve(trades)
+    revenue = np.nan_to_num(trades["revenue"])
+    result_pct = np.nan_to_num(trades["result_pct"])
+    exposure = np.maximum(np.nan_to_num(trades["market_exposure"]), 1)
+    wins, losses = revenue > 0, revenue < 0
+
+    return {
+        "trades": len(trades),
+        "revenue": float(equity[-1]),
+        "win_rate": float(wins.mean()),
+        "average_win": float(revenue[wins].mean()) if wins.any() else 0.0,
+        "average_loss": float(revenue[losses].mean()) if losses.any() else 0.0,
+        "profit_factor": float(revenue[wins].sum() / -revenue[losses].sum()) if losses.any() else float("inf"),
+        "max_drawdown": float(drawdown(equity).min()),
+        "average_exposure_days": float(exposure.mean()),
+        "exposure_adjusted_return": float(result_pct.sum() / exposure.sum()),
+    }
+
+
+def per_symbol_stats(trades: ClosedTrades) -> dict[str, np.ndarray]:
+    """
+    Trade count, win rate, revenue and average return per symbol, ordered by revenue.
+    """
+    symbols, index = np.unique(trades["symbol"], return_inverse=True)
+    count = np.bincount(index, minlength=len(symbols))
+    revenue = np.bincount(index, np.nan_to_num(trades["revenue"]), minlength=len(symbols))
+    wins = np.bincount(index, trades["revenue"] > 0, minlength=len(symbols))
+    returns = np.bincount(index, np.nan_to_num(trades["result_pct"]), minlength=len(symbols))
+    exposure = np.bincount(index, np.maximum(np.nan_to_num(trades["market_exposure"]), 1), minlength=len(symbols))
+
+    order = np.argsort(-revenue, kind="stable")
+    return {
+        "symbol": symbols[order],
+        "trades": count[order],
+        "win_rate": (wins / np.maximum(count, 1))[order],
+        "revenue": revenue[order],
+        "average_return": (returns / np.maximum(count, 1))[order],
+        "exposure_adjusted_return": (returns / np.maximum(exposure, 1))[order],
+    }
@@ -0,0 +1,141 @@
+import logging
+from collections import OrderedDict
+from typing import Callable
+
+from pytrader.model import TradeModel
+
+# Order states that can finish a trade, anything else leaves it open
+_settling_statuses = {"filled", "expired"}
+
+
+def settle_trade(trade: TradeModel) -> bool:
+    """
+    Fills in cost basis, P&L and exposure of a trade from the orders of its signals.
+    Returns True when the trade is finished and should be closed, either completed or canceled.
+    trade: TradeModel - Trade with its signals and their orders resolved
+    """
+    log = logging.getLogger("pytrader.trade")
+
+    if len(trade.resolved_signals or []) < 2:
+        log.debug(f"Ignoring trade {trade.id}. it only has 1 signal")
+        return False
+
+    for signal in trade.resolved_signals:
+        if signal.orderId is None:
+            log.debug(f"Ignoring trade {trade.id}. No order has been placed for {signal.id} yet.")
+            return False
+
+        order_status = (signal.resolvedOrder or {}).get("status") or None
+        if not order_status:
+            log.warning(f"Closing trade for {signal.id}: No corresponding order found.")
+            trade.status = "canceled"
+            trade.canceled_reason = "Order not found on broker."
+            return True
+        elif order_status.lower() == "expired":
+            log.warning(f"Closing trade for {signal.id}: Order expired on broker.")
+            trade.status = "canceled"
+            trade.canceled_reason = "Order expired on broker."
+            return True
+        elif order_status.lower() not in ["filled", "partially_filled"]:
+            log.debug(f"Ignoring trade {trade.id}. Order for {signal.id} is {order_status}")
+            return False
+
+    open_order = trade.resolved_signals[0].resolvedOrder
+    close_order = trade.resolved_signals[-1].resolvedOrder
+
+    open_qty = float(open_order["qty"])
+    close_qty = float(close_order["qty"])
+
+    if open_qty - close_qty != 0:
+        log.debug(f"Ignoring trade {trade.id}, quantities don't match. Open qty: {open_qty} Close qty: {close_qty}")
+        return False
+
+    trade.cost_basis = float(open_order["filled_avg_price"])
+    trade.sale_price = float(close_order["filled_avg_price"])
+    trade.result_pct = round((trade.sale_price - trade.cost_basis) / trade.cost_basis, 4)
+    trade.revenue = round((trade.sale_price - trade.cost_basis) * open_qty, 2)
+
+    trade.opened_on = open_order["filled_at"]
+    trade.closed_on = close_order["filled_at"]
+    trade.market_exposure = (trade.closed_on - trade.opened_on).days
+    return True
+
+
+class TradeSettler:
+    """
+    Settles the trade behind an order as soon as the order monitor persists a final state for it.
+    db: TraderDatabase - Resolves order id -> signal -> trade and stores the outcome
+    find_order: Callable - Looks up an order missing from the database by its broker id, e.g. in the journal
+        and then on the broker. Without it a trade with a missing order is left to the complete-the-trade sweep
+    """
+
+    _max_index = 10_000
+
+    def __init__(self, db, find_order: Callable[[str], dict | None] = None):
+        self.db = db
+        self.find_order = find_order
+        self._trade_by_order: OrderedDict[str, str] = OrderedDict()
+        self.log = logging.getLogger("pytrader.trade.settler")
+
+    def on_orders(self, orders: dict[str, dict]):
+        """
+        Settles the trades of every order in a flushed batch that reached a final state.
+        orders: dict - Serialized orders keyed by order key
+        """
+        for order in orders.values():
+            if (order.get("status") or "").lower() not in _settling_statuses:
+                continue
+            try:
+                self.settle_order(order["id"])
+            except Exception as e:
+                self.log.error(f"Failed to settle the trade for order {order['id']}, the sweep will retry: {e}")
+
+    def settle_order(self, order_id: str) -> bool:
+        """
+        Settles the trade an order belongs to. Returns True when the trade was closed.
+        """
+        trade_id = self._trade_for(str(order_id))
+        if trade_id is None:
+            return False
+
+        trade = self.db.get_trade(trade_id)
+        if trade is None or trade.status in ("closed", "canceled"):
+            return False
+
+        if not self._resolve_orders(trade) or not settle_trade(trade):
+            return False
+
+        self.db.close_trade(trade)
+        self.log.info(f"Settled trade {trade.id} after order {order_id}.")
+        return True
+
+    def _resolve_orders(self, trade: TradeModel) -> bool:
+        """
+        Fills in the orders of the trade's signals that are missing from the database, e.g. one placed while the
+        monitor was down. Returns False when one can't be found, the trade stays open rather than being canceled.
+        """
+        for signal in trade.resolved_signals or []:
+            if signal.resolvedOrder is not None or signal.orderId is None:
+                continue
+            order = self.find_order(signal.orderId) if self.find_order else None
+            if order is None:
+                self.log.warning(f"Order {signal.orderId} of {signal.id} is missing, leaving {trade.id} to the sweep.")
+                return False
+            signal.resolvedOrder = order
+            self.db.upsert_order(f"alpaca_{signal.orderId}", order)
+        return True
+
+    def _trade_for(self, order_id: str) -> str | None:
+        trade_id = self._trade_by_order.get(order_id)
+        if trade_id is None:
+            # Misses are not remembered, the order id may not be recorded on its signal yet
+            signal_id = self.db.get_signal_id_for_order(order_id)
+            trade_id = self.db.get_trade_id_for_signal(signal_id) if signal_id else None
+            if trade_id is None:
+                return None
+
+        self._trade_by_order[order_id] = trade_id
+        self._trade_by_order.move_to_end(order_id)
+        if len(self._trade_by_order) > self._max_index:
+            self._trade_by_order.popitem(last=False)
+        return trade_id
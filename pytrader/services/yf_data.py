@@ -7,44 +7,115 @@ from requests_cache import CacheMixin, SQLiteCache
 from requests_ratelimiter import LimiterMixin, MemoryQueueBucket
 from pyrate_limiter import Duration, RequestRate, Limiter
 
+from pytrader.utils import cache
+from pytrader.utils.timeframe import Timeframe, get_timeframe
+
 ny_tz = timezone("America/New_York")
-yf.set_tz_cache_location("./.cache/yf_tz_cache")
+yf.set_tz_cache_location(cache.path("yf_tz"))
 
 
 class CachedLimiterSession(CacheMixin, LimiterMixin, Session):
-    pass
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        cache.record("http", getattr(response, "from_cache", False))
+        return response
+
+
+_session: CachedLimiterSession | None = None
+
+
+def _get_session() -> CachedLimiterSession:
+    """
+    Returns the process wide download session so long running processes keep its connections and rate budget.
+    """
+    global _session
+    if _session is None:
+        _session = CachedLimiterSession(
+            limiter=Limiter(RequestRate(2, Duration.SECOND)),
+            bucket_class=MemoryQueueBucket,
+            backend=SQLiteCache(cache.path("http")),
+        )
+    return _session
+
+
+# Downloads end on the last completed bar
+_floor_freq = {"1d": "60min", "1h": "60min", "15m": "15min"}
 
 
 def get_adjusted_market_data(
     tickers: list[str],
     interval: str = "1d",
-    end_date: pd.Timestamp = pd.Timestamp.now(tz=ny_tz).floor("60min"),
+    end_date: pd.Timestamp = None,
     start_date: pd.Timestamp = None,
+    lookback_bars: int = 1100,
+    incremental: bool = False,
 ) -> pd.DataFrame:
+    """
+    Downloads split and dividend adjusted bars as a (date, ticker) panel.
+    Long ranges are fetched in date windows the provider accepts for the interval. Intraday prices are
+    kept as float32 to hold the larger panels in the same memory.
+    interval: str - Bar size, one of the supported timeframes
+    lookback_bars: int - Bars to download when start_date is not given
+    incremental: bool - Keep the bars on disk and only download what changed since the last call, see BarStore
+    """
+    timeframe = get_timeframe(interval)
+    if end_date is None:
+        end_date = pd.Timestamp.now(tz=ny_tz).floor(_floor_freq[timeframe.name])
     if start_date is None:
-        start_date = (pd.to_datetime(end_date) - pd.DateOffset(1600)).floor("60min")
+        start_date = (pd.to_datetime(end_date) - pd.DateOffset(timeframe.lookback_days(lookback_bars))).floor("60min")
 
-    session = CachedLimiterSession(
-        limiter=Limiter(RequestRate(2, Duration.SECOND)),
-        bucket_class=MemoryQueueBucket,
-        backend=SQLiteCache("yfinance.cache"),
-    )
+    if incremental:
+        from .bar_store import BarStore
+
+        store = BarStore(cache.path("bars"), _download_range)
+        return store.refresh(tickers, timeframe, pd.to_datetime(start_date), pd.to_datetime(end_date))
+    return _download_range(tickers, timeframe, pd.to_datetime(start_date), pd.to_datetime(end_date))
 
+
+def _download_range(
+    tickers: list[str], timeframe: Timeframe, start: pd.Timestamp, end: pd.Timestamp, actions: bool = False
+) -> pd.DataFrame:
+    frames = []
+    window = pd.Timedelta(days=timeframe.window_days)
+    window_start = start
+    while window_start < end:
+        window_end = min(window_start + window, end)
+        frame = _download(tickers, timeframe, window_start, window_end, actions)
+        if frame is not None:
+            frames.append(frame)
+        window_start = window_end
+
+    if not frames:
+        return pd.DataFrame(columns=["close", "high", "low", "open", "volume"])
+
+    df = frames[0] if len(frames) == 1 else pd.concat(frames)
+    df = df[~df.index.duplicated(keep="last")].sort_index()
+    return df
+
+
+def _download(
+    tickers: list[str], timeframe: Timeframe, start: pd.Timestamp, end: pd.Timestamp, actions: bool = False
+) -> pd.DataFrame | None:
     df = yf.download(
         tickers=tickers,
-        start=start_date,
-        end=end_date,
-        interval=interval,
+        start=start,
+        end=end,
+        interval=timeframe.interval,
         auto_adjust=True,
+        actions=actions,
         threads=3,
-        session=session,
+        session=_get_session(),
     )
-    
+
     # Remove tickers that failed to download (all data is NaN)
     df = df.dropna(axis=1, how="all")
+    if df.empty:
+        return None
 
     df = df.stack(future_stack=True)
     df.index.names = ["date", "ticker"]
     df.columns = df.columns.str.lower()
+    if timeframe.intraday:
+        df = df.astype("float32")
 
     return df
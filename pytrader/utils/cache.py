@@ -0,0 +1,266 @@
+import datetime
+import json
+import logging
+import os
+import shutil
+import time
+from dataclasses import dataclass
+
+from pytrader.utils import profiling
+
+_mb = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class CacheBudget:
+    """
+    Location and limits of one cache under the cache root.
+    name: str - Identifier used in configuration, stats and metrics
+    path: str - Directory, or .sqlite file for HTTP response caches, relative to the cache root
+    max_bytes: int - Size above which the least recently used entries are evicted, None for no limit
+    max_age_days: float - Entries unused for longer are evicted, None for no limit
+    """
+
+    name: str
+    path: str
+    max_bytes: int | None
+    max_age_days: float | None
+
+    @property
+    def sqlite(self) -> bool:
+        return self.path.endswith(".sqlite")
+
+
+default_budgets = (
+    CacheBudget("rsi", "rsi", 512 * _mb, 7),
+    CacheBudget("tickers", "tickers", 16 * _mb, 30),
+    CacheBudget("yf_tz", "yf_tz_cache", 16 * _mb, 90),
+    CacheBudget("http", "yfinance.sqlite", 1024 * _mb, 30),
+    CacheBudget("bars", "bars", 1024 * _mb, 30),
+)
+
+
+@dataclass
+class _Entry:
+    path: str
+    size: int
+    used: float
+
+
+def _file_used(path: str) -> float:
+    stat = os.stat(path)
+    return max(stat.st_atime, stat.st_mtime)
+
+
+class CacheManager:
+    """
+    Owns the on-disk caches: where they live, how large and how old they may grow and how often they hit.
+    Directory caches are evicted a leaf directory at a time, e.g. one joblib call, least recently used first.
+    HTTP response caches are evicted oldest response first, requests-cache keeps no access times.
+    root: str - Directory holding every cache
+    budgets: list[CacheBudget] - Caches under the root and their limits
+    """
+
+    _stats_file = "cache_stats.json"
+
+    def __init__(self, root: str = None, budgets=default_budgets, clock=time.time):
+        self.root = os.path.abspath(root or ".cache")
+        self.budgets = {b.name: b for b in budgets}
+        self._clock = clock
+        self._counts: dict[str, list[int]] = {}
+        self.log = logging.getLogger("pytrader.cache")
+
+    def path(self, name: str) -> str:
+        """
+        Returns the absolute location of a cache, creating its parent directory.
+        """
+        path = os.path.join(self.root, self.budgets[name].path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def record(self, name: str, hit: bool):
+        """
+        Counts a lookup in a cache, persisted by save_counters and exported as profiling counters.
+        """
+        counts = self._counts.setdefault(name, [0, 0])
+        counts[0 if hit else 1] += 1
+        profiling.count(f"cache_{name}_{'hits' if hit else 'misses'}")
+
+    def save_counters(self):
+        """
+        Adds the lookups counted by this process to the persisted totals.
+        """
+        if not self._counts:
+            return
+        totals = self._load_counters()
+        for name, (hits, misses) in self._counts.items():
+            total = totals.setdefault(name, {"hits": 0, "misses": 0})
+            total["hits"] += hits
+            total["misses"] += misses
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, self._stats_file)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(totals, f)
+        os.replace(f"{path}.tmp", path)
+        self._counts = {}
+
+    def stats(self) -> list[dict]:
+        """
+        Returns the size, entry count, oldest use and hit counts of every cache.
+        """
+        totals = self._load_counters()
+        now = self._clock()
+        result = []
+        for budget in self.budgets.values():
+            path = os.path.join(self.root, budget.path)
+            entries = self._entries(path) if not budget.sqlite else []
+            total, pending = totals.get(budget.name, {}), self._counts.get(budget.name, (0, 0))
+            hits, misses = total.get("hits", 0) + pending[0], total.get("misses", 0) + pending[1]
+            result.append(
+                {
+                    "name": budget.name,
+                    "path": path,
+                    "bytes": self._size(path),
+                    "entries": len(entries) if not budget.sqlite else self._sqlite_count(path),
+                    "oldest_days": (now - min(e.used for e in entries)) / 86400 if entries else None,
+                    "max_bytes": budget.max_bytes,
+                    "max_age_days": budget.max_age_days,
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_rate": hits / (hits + misses) if hits + misses else None,
+                }
+            )
+        return result
+
+    def prune(self) -> dict[str, tuple[int, int]]:
+        """
+        Evicts entries past their cache's age budget, then the least recently used until it fits its size budget.
+        Returns the entries removed and bytes freed per cache.
+        """
+        result = {}
+        for budget in self.budgets.values():
+            path = os.path.join(self.root, budget.path)
+            if not os.path.exists(path):
+                continue
+            try:
+                if budget.sqlite:
+                    result[budget.name] = self._prune_sqlite(budget, path)
+                else:
+                    result[budget.name] = self._prune_entries(budget, path)
+            except Exception as e:
+                self.log.warning(f"Unable to prune the {budget.name} cache: {e}")
+                continue
+            removed, freed = result[budget.name]
+            if removed:
+                self.log.info(f"Evicted {removed} entries ({freed / _mb:.1f} MB) from the {budget.name} cache.")
+        return result
+
+    def _prune_entries(self, budget: CacheBudget, path: str) -> tuple[int, int]:
+        entries = sorted(self._entries(path), key=lambda e: e.used)
+        size = self._size(path)
+        now = self._clock()
+        removed, freed = 0, 0
+        for entry in entries:
+            expired = budget.max_age_days is not None and now - entry.used > budget.max_age_days * 86400
+            oversized = budget.max_bytes is not None and size > budget.max_bytes
+            if not expired and not oversized:
+                break
+            self._remove(entry.path, keep_dir=entry.path == path)
+            size -= entry.size
+            removed, freed = removed + 1, freed + entry.size
+        return removed, freed
+
+    def _prune_sqlite(self, budget: CacheBudget, path: str) -> tuple[int, int]:
+        from requests_cache import SQLiteCache
+
+        backend = SQLiteCache(path)
+        try:
+            before_count, before_size = backend.responses.count(), backend.responses.size()
+            if budget.max_age_days is not None:
+                backend.delete(older_than=datetime.timedelta(days=budget.max_age_days))
+            excess = backend.responses.size() - budget.max_bytes if budget.max_bytes is not None else 0
+            if excess > 0:
+                keys, freed = [], 0
+                for response in sorted(backend.responses.values(), key=lambda r: r.created_at):
+                    if freed >= excess:
+                        break
+                    keys.append(response.cache_key)
+                    freed += len(response.content or b"")
+                backend.delete(*keys, vacuum=False)
+                backend.responses.vacuum()
+            return before_count - backend.responses.count(), max(0, before_size - backend.responses.size())
+        finally:
+            backend.close()
+
+    def _entries(self, path: str) -> list[_Entry]:
+        if os.path.isfile(path):
+            return [_Entry(path, os.path.getsize(path), _file_used(path))]
+        entries = []
+        for dir_path, dir_names, file_names in os.walk(path):
+            if dir_names:
+                continue
+            files = [os.path.join(dir_path, f) for f in file_names]
+            used = max((_file_used(f) for f in files), default=os.stat(dir_path).st_mtime)
+            entries.append(_Entry(dir_path, sum(os.path.getsize(f) for f in files), used))
+        return entries
+
+    def _size(self, path: str) -> int:
+        if os.path.isfile(path):
+            return os.path.getsize(path)
+        return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+
+    def _sqlite_count(self, path: str) -> int:
+        if not os.path.exists(path):
+            return 0
+        from requests_cache import SQLiteCache
+
+        backend = SQLiteCache(path)
+        try:
+            return backend.responses.count()
+        finally:
+            backend.close()
+
+    def _remove(self, path: str, keep_dir: bool = False):
+        if os.path.isfile(path):
+            os.remove(path)
+        elif keep_dir:
+            # The cache's own directory may be held open by its library, so only empty it
+            for name in os.listdir(path):
+                os.remove(os.path.join(path, name))
+        else:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def _load_counters(self) -> dict:
+        path = os.path.join(self.root, self._stats_file)
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            self.log.warning(f"Ignoring unreadable cache stats {path}: {e}")
+            return {}
+
+
+_manager = CacheManager()
+
+
+def configure(root: str = None, budgets=default_budgets) -> CacheManager:
+    """
+    Sets the cache root and budgets. Caches resolve their location when first used, so configure before the scan runs.
+    """
+    global _manager
+    _manager = CacheManager(root, budgets)
+    return _manager
+
+
+def get_manager() -> CacheManager:
+    return _manager
+
+
+def path(name: str) -> str:
+    return _manager.path(name)
+
+
+def record(name: str, hit: bool):
+    _manager.record(name, hit)
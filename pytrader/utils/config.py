@@ -1,6 +1,23 @@
+import dataclasses
+import datetime
 import os
 from dotenv import load_dotenv
 
+from pytrader.utils import cache
+
+
+@dataclasses.dataclass(frozen=True)
+class AccountConfig:
+    """
+    Credentials of an additional account the order monitor streams.
+    name: str - Account name, prefixes the account's order keys
+    """
+
+    name: str
+    api_key: str
+    secret_key: str
+    paper: bool
+
 
 class TradeConfig:
     def __init__(self, dot_env_path: str = None):
@@ -14,9 +31,31 @@ class TradeConfig:
         self.max_single_symbol = float(os.getenv("max_single_symbol") or 0.5)
         self.max_portfolio_usage = float(os.getenv("max_portfolio_usage") or 1)
         self.rsi_timeout_days = int(os.getenv("rsi_timeout_days") or 10)
+        self.rsi_timeframe = os.getenv("rsi_timeframe") or "1d"
+        self.rsi_lookback_bars = int(os.getenv("rsi_lookback_bars") or 1100)
+        self.rsi_timeout_bars = int(os.getenv("rsi_timeout_bars") or 0) or None
+        self.rsi_scan_chunk_size = int(os.getenv("rsi_scan_chunk_size") or 0)
+        self.rsi_workers = int(os.getenv("rsi_workers") or 1)
+        self.rsi_incremental_bars = self._strtobool(os.getenv("rsi_incremental_bars"))
+        self.market_data_provider = os.getenv("market_data_provider") or "yfinance"
+        self.alpaca_data_feed = os.getenv("alpaca_data_feed") or "iex"
+        self.alpaca_data_rate_per_minute = int(os.getenv("alpaca_data_rate_per_minute") or 200)
         self.use_margin = self._strtobool(os.getenv("use_margin"))
         self.rsi_send_gchat = self._strtobool(os.getenv("rsi_send_gchat"))
         self.rsi_gchat_webhook = os.getenv("rsi_gchat_webhook")
+        self.orders_send_gchat = self._strtobool(os.getenv("orders_send_gchat"))
+        self.gchat_digest_size = int(os.getenv("gchat_digest_size") or 20)
+        self.max_parallel_orders = int(os.getenv("max_parallel_orders") or 8)
+        self.broker_rate_per_minute = int(os.getenv("broker_rate_per_minute") or 200)
+        self.monitor_accounts = [
+            self._account(n) for n in (os.getenv("monitor_accounts") or "").split(",") if n.strip()
+        ]
+        self.scan_time = self._strtotime(os.getenv("scan_time"), datetime.time(16, 30))
+        self.process_time = self._strtotime(os.getenv("process_time"), datetime.time(16, 45))
+        self.complete_time = self._strtotime(os.getenv("complete_time"), datetime.time(17, 0))
+        self.cache_dir = os.getenv("cache_dir") or ".cache"
+        self.order_journal_retention_days = float(os.getenv("order_journal_retention_days") or 90) or None
+        self.cache_budgets = [self._cache_budget(b) for b in cache.default_budgets]
 
     def _strtobool(self, val: str, default=False) -> bool:
         """
@@ -37,5 +76,37 @@ class TradeConfig:
         else:
             return default
 
+    def _strtotime(self, val: str, default: datetime.time) -> datetime.time:
+        """
+        Convert an HH:MM string, in eastern time, to a time.
+        Empty/blank/none values resolve to the default.
+        """
+        if not self._has_value(val):
+            return default
+        return datetime.datetime.strptime(val.strip(), "%H:%M").time()
+
+    def _account(self, name: str) -> AccountConfig:
+        """
+        Reads alpaca_<name>_api_key, alpaca_<name>_secret_key and alpaca_<name>_paper.
+        """
+        name = name.strip()
+        api_key = os.getenv(f"alpaca_{name}_api_key")
+        secret_key = os.getenv(f"alpaca_{name}_secret_key")
+        if not self._has_value(api_key) or not self._has_value(secret_key):
+            raise ValueError(f"Monitored account {name} needs alpaca_{name}_api_key and alpaca_{name}_secret_key")
+        return AccountConfig(name, api_key, secret_key, self._strtobool(os.getenv(f"alpaca_{name}_paper"), True))
+
+    def _cache_budget(self, budget: cache.CacheBudget) -> cache.CacheBudget:
+        """
+        Applies cache_<name>_max_mb and cache_<name>_max_age_days overrides, 0 removes the limit.
+        """
+        max_mb = os.getenv(f"cache_{budget.name}_max_mb")
+        max_age_days = os.getenv(f"cache_{budget.name}_max_age_days")
+        if self._has_value(max_mb):
+            budget = dataclasses.replace(budget, max_bytes=int(float(max_mb) * 1024 * 1024) or None)
+        if self._has_value(max_age_days):
+            budget = dataclasses.replace(budget, max_age_days=float(max_age_days) or None)
+        return budget
+
     def _has_value(self, val: str):
         return bool(val and not val.isspace())
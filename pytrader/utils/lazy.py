@@ -0,0 +1,18 @@
+from typing import Any, Callable
+
+
+class LazyServices(dict):
+    """
+    Dictionary of services that are only constructed the first time they are looked up.
+    factories: dict - Callables that build each service, given this container
+    """
+
+    def __init__(self, factories: dict[str, Callable[["LazyServices"], Any]]):
+        super().__init__()
+        self._factories = factories
+
+    def __missing__(self, key: str):
+        if key not in self._factories:
+            raise KeyError(key)
+        value = self[key] = self._factories[key](self)
+        return value
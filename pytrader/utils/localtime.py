@@ -1,13 +1,26 @@
 import datetime
+from typing import Callable
+
 import pytz
 
 _eastern = pytz.timezone("US/Eastern")
+_clock: Callable[[], datetime.datetime] | None = None
 
 
 def today():
+    if _clock is not None:
+        return _clock()
     return datetime.datetime.now(_eastern)
 
 
+def set_clock(clock: Callable[[], datetime.datetime] | None):
+    """
+    Makes today() return the clock's time, e.g. a simulated broker's, None restores the wall clock.
+    """
+    global _clock
+    _clock = clock
+
+
 def convert_to_utc(dt):
     return dt.astimezone(pytz.utc)
 
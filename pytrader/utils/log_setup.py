@@ -0,0 +1,97 @@
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+
+_text_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats each record as a single line JSON object.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _QueuedLogging:
+    """
+    Owns the listener thread that writes queued records to the real handlers.
+    """
+
+    def __init__(self, listener: logging.handlers.QueueListener, handler: logging.Handler):
+        self._listener = listener
+        self._handler = handler
+
+    def stop(self):
+        """
+        Writes every queued record and detaches from the root logger. Safe to call more than once.
+        """
+        if self._listener is None:
+            return
+        logging.getLogger().removeHandler(self._handler)
+        self._listener.stop()
+        for handler in self._listener.handlers:
+            handler.close()
+        self._listener = None
+
+
+class _RecordQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queues records with only their message rendered, leaving timestamps, tracebacks and
+    the final layout to the formatter on the listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Arguments may be mutated after the call returns, so render them now
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def configure_logging(
+    level: int,
+    log_path: str,
+    json_format: bool = False,
+    max_bytes: int = 10_000_000,
+    backup_count: int = 5,
+) -> _QueuedLogging:
+    """
+    Routes all logging through a queue so log calls never wait on the terminal or the disk.
+    A background thread writes the records to stderr and to a rotating log file.
+    level: int - Root log level
+    log_path: str - File records are written to
+    json_format: bool - Write one JSON object per line instead of text
+    max_bytes: int - Rotate the log file at this size, 0 disables rotation
+    backup_count: int - Rotated files to keep
+    Returns an object whose stop() flushes the queue, call it before exiting.
+    """
+    formatter = JsonFormatter() if json_format else logging.Formatter(_text_format)
+
+    os.makedirs(os.path.dirname(log_path) or ".", exist_ok=True)
+    file_handler = logging.handlers.RotatingFileHandler(log_path, maxBytes=max_bytes, backupCount=backup_count)
+    stream_handler = logging.StreamHandler()
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = _RecordQueueHandler(log_queue)
+    listener = logging.handlers.QueueListener(log_queue, file_handler, stream_handler)
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+    listener.start()
+    return _QueuedLogging(listener, queue_handler)
@@ -1,32 +1,48 @@
+from typing import TYPE_CHECKING
+
 from pytrader.utils import localtime
+from pytrader.utils.timeframe import DAILY, Timeframe
+
+if TYPE_CHECKING:
+    from pytrader.algos.signal_events import SignalEvent
 
 
-def _convert_signal_to_action(signal: dict):
-    signal_date = localtime.localize_to_et(signal.name).date()
-    today = localtime.today().date()
-    days_old = (today - signal_date).days
+def _convert_signal_to_action(event: "SignalEvent", timeframe: Timeframe = DAILY):
+    if timeframe.intraday:
+        # Intraday signals are only actionable from the last completed bar or the one before it
+        is_fresh = event.bars_ago <= 1
+    else:
+        signal_date = localtime.localize_to_et(event.date).date()
+        today = localtime.today().date()
+        days_old = (today - signal_date).days
+        is_fresh = days_old <= 1
 
-    if signal["RSI_Buy"] == True and days_old <= 1:  # noqa: E712
+    if event.action == "Buy" and is_fresh:
         return "Buy"
-    elif signal["RSI_Sell"] == True:  # noqa: E712
+    elif event.action == "Sell":
         return "Sell"
     else:
         return "Hold"
 
 
-def _df_row_to_signal(symbol: str, row):
+def _event_to_signal(symbol: str, event: "SignalEvent", timeframe: Timeframe = DAILY):
     signal = {}
-    signal["date"] = localtime.to_day(row.name)
+    signal["date"] = timeframe.to_et(event.date) if timeframe.intraday else localtime.to_day(event.date)
     signal["symbol"] = symbol
-    signal["action"] = _convert_signal_to_action(row)
+    signal["action"] = _convert_signal_to_action(event, timeframe)
 
     signal["metadata"] = {}
-    signal["metadata"]["open"] = round(row["open"], 4)
-    signal["metadata"]["close"] = round(row["close"], 4)
-    signal["metadata"]["rsi"] = round(row["RSI"], 2)
+    signal["metadata"]["open"] = round(event.open, 4)
+    signal["metadata"]["close"] = round(event.close, 4)
+    signal["metadata"]["rsi"] = round(event.rsi, 2)
+    if timeframe.intraday:
+        signal["metadata"]["timeframe"] = timeframe.name
     return signal
 
 
-def _get_trade_key(symbol: str, signal: dict):
+def _get_trade_key(symbol: str, signal: dict, timeframe: Timeframe = DAILY):
     d = signal["date"]
-    return f"{symbol}_{d.strftime('%Y-%m-%d')}_RSI_{signal['action']}".lower()
+    key = f"{symbol}_{timeframe.label(d)}_RSI_{signal['action']}"
+    if timeframe.intraday:
+        key = f"{key}_{timeframe.name}"
+    return key.lower()
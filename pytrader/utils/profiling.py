@@ -0,0 +1,174 @@
+import cProfile
+import logging
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+# Stages are recorded on the profiler started by the cli, so library code can mark stages
+# without having it passed around. Without an active profiler stage() and count() do nothing.
+_active: "StageProfiler | None" = None
+
+
+@dataclass
+class StageStats:
+    name: str
+    runs: int = 0
+    wall: float = 0.0
+    cpu: float = 0.0
+    peak_bytes: int = 0
+
+
+class _Frame:
+    def __init__(self, name: str):
+        self.name = name
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        self.base_bytes = tracemalloc.get_traced_memory()[0]
+        self.peak_bytes = 0
+
+
+class StageProfiler:
+    """
+    Records wall time, CPU time and peak traced memory of named pipeline stages.
+    Nested stages are recorded under their parent, e.g. rsi/download.
+    metrics_path: str - Prometheus text file written whenever a top level stage finishes
+    dump_path: str - Optional cProfile stats file, readable by pstats, snakeviz or flameprof
+    """
+
+    def __init__(self, metrics_path: str = None, dump_path: str = None):
+        self.metrics_path = metrics_path
+        self.dump_path = dump_path
+        self.stages: dict[str, StageStats] = {}
+        self.counters: dict[str, float] = {}
+        self._stack: list[_Frame] = []
+        self._profile: cProfile.Profile | None = None
+        self.log = logging.getLogger("pytrader.profile")
+
+    def start(self):
+        global _active
+        tracemalloc.start()
+        if self.dump_path:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        _active = self
+
+    def stop(self):
+        global _active
+        _active = None
+        if self._profile is not None:
+            self._profile.disable()
+            os.makedirs(os.path.dirname(self.dump_path) or ".", exist_ok=True)
+            self._profile.dump_stats(self.dump_path)
+            self._profile = None
+        tracemalloc.stop()
+        self.write_metrics()
+        self._report()
+
+    @contextmanager
+    def stage(self, name: str):
+        current, peak = tracemalloc.get_traced_memory()
+        if self._stack:
+            # Resetting the peak below hides it from the parent, so fold it in first
+            parent = self._stack[-1]
+            parent.peak_bytes = max(parent.peak_bytes, peak - parent.base_bytes)
+        tracemalloc.reset_peak()
+
+        frame = _Frame("/".join([f.name for f in self._stack] + [name]))
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            peak = tracemalloc.get_traced_memory()[1]
+            frame.peak_bytes = max(frame.peak_bytes, peak - frame.base_bytes)
+            if self._stack:
+                parent = self._stack[-1]
+                parent.peak_bytes = max(parent.peak_bytes, peak - parent.base_bytes)
+
+            stats = self.stages.setdefault(frame.name, StageStats(frame.name))
+            stats.runs += 1
+            stats.wall += time.perf_counter() - frame.wall
+            stats.cpu += time.process_time() - frame.cpu
+            stats.peak_bytes = max(stats.peak_bytes, frame.peak_bytes)
+
+            if not self._stack:
+                self.write_metrics()
+
+    def count(self, name: str, value: float = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_prometheus(self) -> str:
+        """
+        Renders the recorded stages and counters in the Prometheus text exposition format.
+        """
+        lines = []
+
+        def _metric(name: str, help_text: str, samples: list[tuple[str, float]]):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.extend(f"{name}{labels} {value:g}" for labels, value in samples)
+
+        stages = sorted(self.stages.values(), key=lambda s: s.name)
+        _metric(
+            "pytrader_stage_wall_seconds",
+            "Wall time spent in a pipeline stage.",
+            [(f'{{stage="{s.name}"}}', s.wall) for s in stages],
+        )
+        _metric(
+            "pytrader_stage_cpu_seconds",
+            "Process CPU time spent in a pipeline stage.",
+            [(f'{{stage="{s.name}"}}', s.cpu) for s in stages],
+        )
+        _metric(
+            "pytrader_stage_peak_memory_bytes",
+            "Peak traced memory allocated during a pipeline stage.",
+            [(f'{{stage="{s.name}"}}', s.peak_bytes) for s in stages],
+        )
+        _metric(
+            "pytrader_stage_runs", "Times a pipeline stage ran.", [(f'{{stage="{s.name}"}}', s.runs) for s in stages]
+        )
+        for name, value in sorted(self.counters.items()):
+            _metric(f"pytrader_{name}", f"Pipeline counter {name}.", [("", value)])
+        _metric("pytrader_last_run_timestamp_seconds", "When these metrics were written.", [("", time.time())])
+        return "\n".join(lines) + "\n"
+
+    def write_metrics(self):
+        if not self.metrics_path:
+            return
+        os.makedirs(os.path.dirname(self.metrics_path) or ".", exist_ok=True)
+        # node_exporter may read the file at any time, so never expose a partial write
+        tmp_path = f"{self.metrics_path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, self.metrics_path)
+
+    def _report(self):
+        for s in sorted(self.stages.values(), key=lambda s: s.name):
+            self.log.info(
+                f"{s.name}: {s.wall:.2f}s wall, {s.cpu:.2f}s cpu, "
+                f"{s.peak_bytes / 2**20:.1f}MiB peak over {s.runs} runs."
+            )
+        for name, value in sorted(self.counters.items()):
+            self.log.info(f"{name}: {value:g}")
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Records the enclosed block as a stage of the active profiler. Also usable as a decorator.
+    """
+    if _active is None:
+        yield
+        return
+    with _active.stage(name):
+        yield
+
+
+def count(name: str, value: float = 1):
+    """
+    Adds to a counter of the active profiler, e.g. symbols scanned or signals emitted.
+    """
+    if _active is not None:
+        _active.count(name, value)
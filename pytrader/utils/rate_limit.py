@@ -0,0 +1,40 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread safe token bucket. Callers reserve tokens up front and sleep off any deficit,
+    so concurrent callers are served in arrival order without busy waiting.
+    rate: float - Tokens added per second
+    capacity: float - Most tokens that can accumulate, i.e. the largest allowed burst
+    """
+
+    def __init__(self, rate: float, capacity: float = None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, requests: int, burst: int = None):
+        return cls(requests / 60, burst or max(1, requests // 4))
+
+    def acquire(self, tokens: float = 1) -> float:
+        """
+        Takes tokens from the bucket, blocking until they are available.
+        Returns the number of seconds spent waiting.
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            wait = max(0.0, -self._tokens / self.rate)
+
+        if wait > 0:
+            self._sleep(wait)
+        return wait
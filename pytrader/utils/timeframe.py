@@ -0,0 +1,96 @@
+import datetime
+import math
+from dataclasses import dataclass
+
+from pytrader.utils import localtime
+
+
+@dataclass(frozen=True)
+class Timeframe:
+    """
+    Bar size the strategy is scanned on.
+    name: str - Identifier used in configuration, cache keys and trade keys
+    interval: str - Interval passed to the market data provider
+    bars_per_session: int - Regular session bars per trading day
+    max_history_days: int - How far back the provider serves bars of this size, None when unlimited
+    window_days: int - Longest date range fetched per download request
+    """
+
+    name: str
+    interval: str
+    bars_per_session: int
+    max_history_days: int | None
+    window_days: int
+
+    @property
+    def intraday(self) -> bool:
+        return self.bars_per_session > 1
+
+    def sessions(self, bars: int) -> int:
+        """
+        Returns the trading sessions needed to hold a number of bars.
+        """
+        return math.ceil(bars / self.bars_per_session)
+
+    def lookback_days(self, bars: int) -> int:
+        """
+        Returns the calendar days to download to end up with a number of bars.
+        """
+        # 252 sessions a year plus a margin for holidays
+        days = math.ceil(self.sessions(bars) * 365 / 252) + 10
+        return min(days, self.max_history_days) if self.max_history_days else days
+
+    def to_et(self, timestamp) -> datetime.datetime:
+        """
+        Returns a bar timestamp as an eastern time datetime. Daily bars are dated, intraday bars are instants.
+        """
+        if hasattr(timestamp, "to_pydatetime"):
+            timestamp = timestamp.to_pydatetime()
+        if timestamp.tzinfo is None:
+            return localtime.localize_to_et(timestamp)
+        return localtime.convert_to_est(timestamp)
+
+    @property
+    def bar_minutes(self) -> int:
+        """
+        Length of a regular session bar, the whole session for daily bars.
+        """
+        if not self.intraday:
+            return 390
+        count, unit = int(self.interval[:-1]), self.interval[-1]
+        return count * 60 if unit == "h" else count
+
+    def bar_start(self, timestamp) -> datetime.datetime | None:
+        """
+        Returns the start of the regular session bar an instant falls in, in eastern time, None outside the session.
+        Intraday bars are aligned to the 9:30 open like the provider's bars, daily bars start at midnight.
+        """
+        et = self.to_et(timestamp)
+        session_open = et.replace(hour=9, minute=30, second=0, microsecond=0)
+        if not session_open <= et < et.replace(hour=16, minute=0, second=0, microsecond=0):
+            return None
+        if not self.intraday:
+            return et.replace(hour=0, minute=0, second=0, microsecond=0)
+        minutes = int((et - session_open).total_seconds() // 60)
+        return session_open + datetime.timedelta(minutes=minutes - minutes % self.bar_minutes)
+
+    def label(self, timestamp) -> str:
+        """
+        Returns the bar's identity in trade keys, the date for daily bars and the bar's start otherwise.
+        """
+        if not self.intraday:
+            return timestamp.strftime("%Y-%m-%d")
+        return self.to_et(timestamp).strftime("%Y-%m-%dT%H%M")
+
+
+DAILY = Timeframe("1d", "1d", 1, None, 3650)
+HOURLY = Timeframe("1h", "1h", 7, 729, 180)
+FIFTEEN_MINUTES = Timeframe("15m", "15m", 26, 59, 30)
+
+_timeframes = {tf.name: tf for tf in (DAILY, HOURLY, FIFTEEN_MINUTES)}
+
+
+def get_timeframe(name: str) -> Timeframe:
+    if name not in _timeframes:
+        raise ValueError(f"Unsupported timeframe {name}, expected one of {', '.join(_timeframes)}")
+    return _timeframes[name]
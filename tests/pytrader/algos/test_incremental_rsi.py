@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import pytrader.algos.bullish_rsi_signal as rsi
+from pytrader.algos.incremental_rsi import RsiState
+
+
+def _closes(seed, periods=600):
+    # A choppy walk so the series goes through several buy phases
+    return 100 * np.cumprod(1 + np.random.default_rng(seed).normal(0.0005, 0.03, periods))
+
+
+def _batch_signals(closes):
+    index = pd.date_range("2022-01-03", periods=len(closes), freq="D")
+    df = pd.DataFrame({"open": closes, "high": closes, "low": closes, "close": closes, "volume": 1e6}, index=index)
+    df, _ = rsi._indicators(df)
+    keep = rsi._filter_signals(df["RSI_Buy"].to_numpy(), df["RSI_Sell"].to_numpy())
+    actions = np.where(df["RSI_Buy"].to_numpy(), "Buy", "Sell")
+    return [(199 + i, actions[i]) for i in np.flatnonzero(keep)], df["RSI"].iloc[-1]
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_incremental_signals_match_the_batch_scan(seed):
+    closes = _closes(seed)
+    state = RsiState()
+    incremental = [(i, a) for i, a in enumerate(state.update(c) for c in closes) if a is not None]
+
+    expected, last_rsi = _batch_signals(closes)
+    assert incremental == expected
+    assert state.rsi() == pytest.approx(last_rsi, rel=1e-9)
+
+
+def test_peek_leaves_the_state_unchanged():
+    closes = _closes(3)
+    state = RsiState.from_closes(closes[:-1])
+    fresh = RsiState.from_closes(closes[:-1])
+
+    for price in (closes[-1] * 0.5, closes[-1], closes[-1] * 2):
+        expected = RsiState.from_closes(closes[:-1]).update(price)
+        assert state.peek(price) == expected
+
+    assert state.update(closes[-1]) == fresh.update(closes[-1])
+    assert state.rsi() == fresh.rsi()
+
+
+def test_no_signal_before_the_sma_is_complete():
+    state = RsiState()
+    assert all(state.update(100 * 0.97**i) is None for i in range(199))
+    assert state.last_close == pytest.approx(100 * 0.97**198)
@@ -43,3 +43,85 @@ def test_calculate_signals(sample_data, all_tickers_df):
         mock_datetime.now.return_value = datetime(2023, 1, 10)
         result = calculate_signals(sample_data, all_tickers_df)
         assert result is not None
+
+
+def test_intraday_buys_are_reported_by_bar_age(trending_panel):
+    from pytrader.utils.timeframe import HOURLY
+
+    index = pd.date_range("2024-01-02 14:30", periods=400, freq="h", tz="UTC").tz_convert("America/New_York")
+    df = trending_panel(index)
+
+    result = calculate_signals(df, df, HOURLY)
+
+    events = result["AAPL"]
+    assert events["RSI_Buy"].iloc[0] and events["RSI_Sell"].iloc[-1]
+    assert events["bars_ago"].iloc[0] <= 10
+    assert str(events.index.tz) == "America/New_York"
+
+
+def test_parallel_signals_match_the_sequential_scan(trending_panel):
+    from pytrader.algos import calculate_symbol_signals
+    from pytrader.utils.timeframe import HOURLY
+
+    index = pd.date_range("2024-01-02 14:30", periods=400, freq="h", tz="UTC").tz_convert("America/New_York")
+    panel = pd.concat([trending_panel(index, t) for t in ("AAPL", "MSFT", "NVDA", "AMZN")]).sort_index()
+    symbols = ["NVDA", "MISSING", "AAPL", "AMZN", "MSFT"]
+
+    sequential = calculate_symbol_signals(symbols, panel, HOURLY)
+    parallel = calculate_symbol_signals(symbols, panel, HOURLY, workers=2)
+
+    assert list(parallel) == list(sequential) == ["NVDA", "AAPL", "AMZN", "MSFT"]
+    for symbol, events in sequential.items():
+        pd.testing.assert_frame_equal(parallel[symbol], events, check_freq=False)
+
+
+def test_buy_phase_does_not_carry_over_between_symbols(trending_panel):
+    from pytrader.algos import calculate_symbol_signals
+    from pytrader.utils.timeframe import HOURLY
+
+    index = pd.date_range("2024-01-02 14:30", periods=400, freq="h", tz="UTC").tz_convert("America/New_York")
+    open_phase = trending_panel(index, "AAPL").iloc[:-5]
+    panel = pd.concat([open_phase, trending_panel(index, "MSFT")]).sort_index()
+
+    result = calculate_symbol_signals(["AAPL", "MSFT"], panel, HOURLY)
+
+    assert result["MSFT"]["RSI_Buy"].iloc[0]
+
+
+def _random_walk(seed, periods=400):
+    import numpy as np
+
+    close = 100 * np.cumprod(1 + np.random.default_rng(seed).normal(0.0005, 0.02, periods))
+    index = pd.date_range("2024-01-02", periods=periods, freq="D", name="date")
+    df = pd.DataFrame({"open": close, "high": close, "low": close, "close": close, "volume": 1e6}, index=index)
+    df["ticker"] = "AAPL"
+    return df.set_index("ticker", append=True)
+
+
+def _next_bar_signals(panel, price):
+    import pytrader.algos.bullish_rsi_signal as rsi
+
+    bars = panel.xs("AAPL", level=1)
+    next_bar = pd.DataFrame({c: [price] for c in ("open", "high", "low", "close")} | {"volume": [1e6]})
+    next_bar.index = [bars.index[-1] + pd.Timedelta(days=1)]
+    df, _ = rsi._indicators(pd.concat([bars, next_bar]))
+    keep = rsi._filter_signals(df["RSI_Buy"].to_numpy(), df["RSI_Sell"].to_numpy())
+    return keep[-1] and df["RSI_Buy"].iloc[-1]
+
+
+def test_trigger_levels_match_a_recomputed_next_bar():
+    from pytrader.algos import scan_symbols
+
+    panel = _random_walk(19)
+    _, levels = scan_symbols(["AAPL"], panel)
+    level = levels.level("AAPL")
+
+    assert level["buy_floor"] < level["buy_below"]
+    for price, expected in [
+        (level["buy_below"] * (1 - 1e-6), True),
+        (level["buy_below"] * (1 + 1e-6), False),
+        (level["buy_floor"] * (1 + 1e-6), True),
+        (level["buy_floor"] * (1 - 1e-6), False),
+    ]:
+        assert _next_bar_signals(panel, price) == expected
+        assert (levels.signal("AAPL", price) == "Buy") == expected
@@ -0,0 +1,20 @@
+import numpy as np
+import pandas as pd
+
+from pytrader.algos.shared_panel import SharedPanel
+
+
+def test_symbol_frames_match_the_panel():
+    dates = pd.date_range("2024-01-02 09:30", periods=5, freq="h", tz="America/New_York")
+    index = pd.MultiIndex.from_product([dates, ["MSFT", "AAPL"]], names=["date", "ticker"])
+    df = pd.DataFrame({"close": np.arange(10.0), "volume": np.arange(10.0) * 100}, index=index, dtype="float32")
+
+    panel = SharedPanel.from_frame(df)
+    attached = SharedPanel.attach(panel.layout)
+    try:
+        assert attached.symbols() == ["MSFT", "AAPL"]
+        for symbol in ("MSFT", "AAPL"):
+            pd.testing.assert_frame_equal(attached.frame(symbol), df.xs(symbol, level=1), check_freq=False)
+    finally:
+        attached.close()
+        panel.close()
@@ -0,0 +1,45 @@
+import pickle
+
+import pandas as pd
+
+from pytrader.algos.signal_events import SignalEvents
+
+
+def _history(index, symbol_close):
+    return pd.DataFrame(
+        {
+            "open": symbol_close,
+            "close": symbol_close,
+            "RSI": [25.0, 45.0, 28.0],
+            "RSI_Buy": [True, False, True],
+            "RSI_Sell": [False, True, False],
+            "bars_ago": [40, 20, 3],
+        },
+        index=index,
+    )
+
+
+def test_latest_events_keep_the_bar_times(tmp_path):
+    index = pd.DatetimeIndex(["2024-03-08 15:30", "2024-03-11 10:30", "2024-03-12 11:30"], name="date")
+    index = index.tz_localize("America/New_York")
+    frames = {"MSFT": _history(index, [10.0, 11.0, 12.0]), "AAPL": _history(index, [20.0, 21.0, 22.0])}
+
+    events = SignalEvents.from_frames(frames, history_path=str(tmp_path / "history.pkl"))
+
+    assert list(events) == ["MSFT", "AAPL"] and len(events.records) == 4
+    latest, previous = events.latest("AAPL"), events.latest("AAPL", 1)
+    assert (latest.action, latest.close, latest.bars_ago) == ("Buy", 22.0, 3)
+    assert previous.action == "Sell" and previous.date == index[1].to_pydatetime()
+    assert latest.date.utcoffset() == index[2].utcoffset()
+
+    restored = pickle.loads(pickle.dumps(events))
+    assert restored.events("MSFT") == events.events("MSFT")
+    pd.testing.assert_frame_equal(restored.history("MSFT"), frames["MSFT"])
+
+
+def test_history_is_none_unless_kept():
+    index = pd.DatetimeIndex(["2024-03-08", "2024-03-11", "2024-03-12"], name="date")
+    events = SignalEvents.from_frames({"MSFT": _history(index, [10.0, 11.0, 12.0])})
+
+    assert events.latest("MSFT").date.tzinfo is None
+    assert events.history("MSFT") is None
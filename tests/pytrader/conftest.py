@@ -0,0 +1,23 @@
+import pandas as pd
+import pytest
+
+
+def _trending_panel(index, ticker: str = "AAPL", scale: float = 1.0) -> pd.DataFrame:
+    """
+    A steady climb, a six bar dip and a rally out of it, as a (date, ticker) panel.
+    index: DatetimeIndex - Bar times
+    ticker: str - Symbol of the bars
+    scale: float - Multiplies every price, so symbols sharing an index have different bars
+    """
+    n = len(index)
+    close = [scale * (100 + i * 0.5) for i in range(n - 11)]
+    close += [close[-1] * (0.99**i) for i in range(1, 7)]
+    close += [close[-1] * (1.02**i) for i in range(1, 6)]
+    df = pd.DataFrame({"open": close, "high": close, "low": close, "close": close, "volume": 1e6}, index=index)
+    df["ticker"] = ticker
+    return df.rename_axis("date").set_index("ticker", append=True)
+
+
+@pytest.fixture
+def trending_panel():
+    return _trending_panel
@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+
+from pytrader.filters import filter_by_dollar_vol, dollar_volume, top_dollar_volume_tickers
+
+
+def _panel(tickers, periods=60):
+    rng = np.random.default_rng(7)
+    index = pd.MultiIndex.from_product(
+        [pd.date_range("2024-01-02", periods=periods, freq="B"), tickers], names=["date", "ticker"]
+    )
+    close = rng.uniform(10, 200, len(index))
+    # Liquidity grows with the ticker's position so only the last few ever rank in the top
+    volume = rng.uniform(1e5, 1e7, len(index)) * (np.tile(np.arange(len(tickers)), periods) + 1) ** 2
+    return pd.DataFrame({"close": close, "volume": volume}, index=index)
+
+
+def test_top_tickers_match_the_panel_filter_when_ranked_across_chunks():
+    tickers = [f"T{i:02d}" for i in range(12)]
+    df = _panel(tickers)
+
+    expected = set(filter_by_dollar_vol(df.copy(), take_top=4, window=10, min_periods=4).index.unique(1))
+    chunks = [df[df.index.get_level_values(1).isin(tickers[i : i + 5])] for i in range(0, len(tickers), 5)]
+    volumes = pd.concat([dollar_volume(chunk) for chunk in chunks], axis=1)
+
+    assert top_dollar_volume_tickers(volumes, take_top=4, window=10, min_periods=4) == expected
+    assert 0 < len(expected) < len(tickers)
@@ -0,0 +1,152 @@
+import asyncio
+import datetime
+import json
+
+import pytest
+
+from pytrader.services.account_monitor import AccountStreams, MonitoredAccount
+from pytrader.services.alpaca import _ResyncingTradingStream
+from pytrader.services.stream_checkpoint import StreamCheckpoint
+
+
+class FakeOrder:
+    def __init__(self, order_id):
+        self.id = order_id
+
+
+class FakeBroker:
+    """
+    Streams the given orders, failing the first `failures` connections before sending anything.
+    """
+
+    def __init__(self, orders, failures=0):
+        self.orders = orders
+        self.failures = failures
+        self.connections = 0
+
+    async def stream_orders(self, handler, raw_orders=False, checkpoint=None):
+        self.connections += 1
+        if self.connections <= self.failures:
+            raise ConnectionError("websocket closed")
+        for order in self.orders:
+            await handler("fill", order)
+        await asyncio.Event().wait()
+
+
+def _run(streams: AccountStreams, until):
+    async def _main():
+        task = asyncio.create_task(streams.run())
+        while not until():
+            await asyncio.sleep(0.001)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(asyncio.wait_for(_main(), 5))
+
+
+def test_accounts_share_the_handler_and_restart_on_their_own():
+    paper = MonitoredAccount("paper", FakeBroker([FakeOrder("1"), FakeOrder("2")]))
+    other = MonitoredAccount("other", FakeBroker([FakeOrder("3")], failures=2), "alpaca_other")
+    received = []
+
+    async def _handler(account, event, order):
+        received.append(account.order_key(order.id))
+
+    streams = AccountStreams([paper, other], _handler, min_backoff=0.001, max_backoff=0.004)
+    _run(streams, lambda: len(received) == 3)
+
+    assert sorted(received) == ["alpaca_1", "alpaca_2", "alpaca_other_3"]
+    assert paper.broker.connections == 1
+    assert other.broker.connections == 3
+    assert streams.restarts == {"paper": 0, "other": 2}
+
+
+def test_flushed_orders_advance_their_own_account_checkpoint():
+    at = datetime.datetime(2024, 6, 3, 10, tzinfo=datetime.timezone.utc)
+    paper = MonitoredAccount("paper", FakeBroker([]), checkpoint=StreamCheckpoint())
+    other = MonitoredAccount("other", FakeBroker([]), "alpaca_other", StreamCheckpoint())
+    streams = AccountStreams([paper, other], None)
+
+    streams.on_flush(
+        {
+            "alpaca_1": {"id": "1", "status": "NEW", "updated_at": at, "submitted_at": at},
+            "alpaca_other_2": {"id": "2", "status": "FILLED", "updated_at": at + datetime.timedelta(minutes=5)},
+        }
+    )
+
+    assert paper.checkpoint.last_event_at == at
+    assert paper.checkpoint.open_orders == {"1": at}
+    assert other.checkpoint.last_event_at == at + datetime.timedelta(minutes=5)
+    assert other.checkpoint.open_orders == {}
+
+
+def test_accounts_need_distinct_key_prefixes():
+    with pytest.raises(ValueError):
+        AccountStreams([MonitoredAccount("a", FakeBroker([])), MonitoredAccount("b", FakeBroker([]))], None)
+
+
+class FakeSocket:
+    """
+    Websocket that authorizes, sends one trade update and then waits.
+    """
+
+    def __init__(self, order_id):
+        self.messages = [
+            {"stream": "authorization", "data": {"status": "authorized"}},
+            {"stream": "trade_updates", "data": {"event": "fill", "order": {"id": order_id}}},
+        ]
+        self.closed = False
+
+    async def send(self, data):
+        pass
+
+    async def recv(self):
+        if self.messages:
+            return json.dumps(self.messages.pop(0))
+        await asyncio.sleep(3600)
+
+    async def close(self):
+        self.closed = True
+
+
+class StreamingBroker:
+    """
+    Runs a real trade update stream over fake sockets, the way AlpacaClient.stream_orders does.
+    """
+
+    def __init__(self):
+        self.sockets = []
+
+    async def stream_orders(self, handler, raw_orders=False, checkpoint=None):
+        async def _connect():
+            self.sockets.append(FakeSocket(str(len(self.sockets) + 1)))
+            stream._ws = self.sockets[-1]
+
+        async def _on_update(msg):
+            order = FakeOrder(msg["data"]["order"]["id"])
+            await handler(msg["data"]["event"], order)
+
+        stream = _ResyncingTradingStream("key", "secret", raw_data=True)
+        stream._connect = _connect
+        stream.subscribe_trade_updates(_on_update)
+        try:
+            await stream._run_forever()
+        finally:
+            await stream.close()
+
+
+def test_a_failing_handler_restarts_the_real_stream():
+    account = MonitoredAccount("paper", StreamingBroker())
+    received = []
+
+    async def _handler(account, event, order):
+        if order.id == "1":
+            raise RuntimeError("write failed")
+        received.append(order.id)
+
+    streams = AccountStreams([account], _handler, min_backoff=0.001)
+    _run(streams, lambda: received)
+
+    assert received == ["2"]
+    assert streams.restarts == {"paper": 1}
+    assert account.broker.sockets[0].closed
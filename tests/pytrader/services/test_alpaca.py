@@ -0,0 +1,84 @@
+import asyncio
+import datetime
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from pytrader.services.alpaca import AlpacaClient, _ResyncingTradingStream
+
+_t0 = datetime.datetime(2024, 5, 1, 9, 30, tzinfo=datetime.timezone.utc)
+
+
+class FakeTradingClient:
+    def __init__(self, orders):
+        self.orders = orders
+        self.requests = []
+
+    def get_orders(self, request):
+        self.requests.append(request)
+        matching = [o for o in self.orders if o.submitted_at > request.after]
+        return matching[: request.limit]
+
+
+class FakeSocket:
+    """
+    Websocket that authorizes, then sends the given messages and waits.
+    """
+
+    def __init__(self, messages=()):
+        self.messages = [{"stream": "authorization", "data": {"status": "authorized"}}, *messages]
+        self.sent = []
+        self.closed = False
+
+    async def send(self, data):
+        self.sent.append(json.loads(data))
+
+    async def recv(self):
+        if self.messages:
+            return json.dumps(self.messages.pop(0))
+        await asyncio.sleep(3600)
+
+    async def close(self):
+        self.closed = True
+
+
+def _connect_to(sockets: list):
+    async def _connect(stream):
+        sockets.append(FakeSocket())
+        stream._ws = sockets[-1]
+
+    return _connect
+
+
+def _orders(count):
+    return [SimpleNamespace(id=str(i), submitted_at=_t0 + datetime.timedelta(seconds=i // 2)) for i in range(count)]
+
+
+def test_get_orders_since_pages_through_all_orders():
+    broker = AlpacaClient("key", "secret")
+    broker.client = FakeTradingClient(_orders(25))
+
+    orders = list(broker.get_orders_since(_t0 - datetime.timedelta(seconds=1), page_size=10))
+
+    assert [o.id for o in orders] == [str(i) for i in range(25)]
+    assert len(broker.client.requests) <= 4
+
+
+def test_a_failing_backfill_closes_the_connection(monkeypatch):
+    sockets = []
+    monkeypatch.setattr(_ResyncingTradingStream, "_connect", _connect_to(sockets))
+
+    async def _backfill():
+        raise ConnectionError("orders endpoint unavailable")
+
+    async def _handler(update):
+        pass
+
+    stream = _ResyncingTradingStream("key", "secret", on_connect=_backfill)
+    stream.subscribe_trade_updates(_handler)
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(stream._start_ws())
+    assert len(sockets) == 1 and sockets[0].closed
+    assert stream._ws is None
@@ -0,0 +1,151 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+import pytest
+
+from pytrader.algos import calculate_signals
+from pytrader.filters import filter_by_dollar_vol
+from pytrader.services.alpaca_data import AlpacaBars
+from pytrader.services.call_policy import CallPolicy
+from pytrader.utils.rate_limit import TokenBucket
+from pytrader.utils.timeframe import DAILY, HOURLY
+
+
+def _daily_bars(symbol: str, days: int = 300) -> list[dict]:
+    dates = pd.bdate_range("2023-01-02", periods=days)
+    scale = 1 + (ord(symbol[0]) - ord("A"))
+    return [
+        {
+            "t": d.tz_localize("America/New_York").tz_convert("UTC").strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "o": scale * (100 + i),
+            "h": scale * (101 + i),
+            "l": scale * (99 + i),
+            "c": scale * (100.5 + i),
+            "v": 1000 * scale,
+        }
+        for i, d in enumerate(dates)
+    ]
+
+
+def _half_hours(symbol: str) -> list[dict]:
+    # One session of half hours plus a pre-market bar that has to be dropped
+    times = pd.date_range("2024-03-04 09:00", "2024-03-04 15:30", freq="30min", tz="America/New_York")
+    return [
+        {"t": t.tz_convert("UTC").strftime("%Y-%m-%dT%H:%M:%SZ"), "o": i, "h": i + 2, "l": i - 1, "c": i + 1, "v": 10}
+        for i, t in enumerate(times)
+    ]
+
+
+class _Stub(BaseHTTPRequestHandler):
+    """
+    Serves /v2/stocks/bars the way Alpaca pages it: limit counts bars across every symbol, sorted by symbol then time.
+    """
+
+    bars: dict[str, list[dict]] = {}
+    requests: list[dict] = []
+    throttle = 0
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        type(self).requests.append(params | {"key": self.headers.get("APCA-API-KEY-ID")})
+        if type(self).throttle:
+            type(self).throttle -= 1
+            return self._send(429, {"code": 42910000, "message": "rate limit exceeded"})
+
+        start, end = pd.Timestamp(params["start"]), pd.Timestamp(params["end"])
+        rows = [
+            (symbol, bar)
+            for symbol in sorted(params["symbols"].split(","))
+            for bar in self.bars.get(symbol, [])
+            if start <= pd.Timestamp(bar["t"]) < end
+        ]
+        offset = int(params.get("page_token", 0))
+        page = rows[offset : offset + int(params["limit"])]
+        body = {"bars": {}, "next_page_token": str(offset + len(page)) if offset + len(page) < len(rows) else None}
+        for symbol, bar in page:
+            body["bars"].setdefault(symbol, []).append(bar)
+        self._send(200, body)
+
+    def _send(self, status: int, body: dict):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    _Stub.bars, _Stub.requests, _Stub.throttle = {}, [], 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Stub)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def _client(url: str, **kwargs) -> AlpacaBars:
+    policy = CallPolicy(TokenBucket(1000), base_delay=0, sleep=lambda s: None)
+    return AlpacaBars("key", "secret", policy=policy, base_url=url, **kwargs)
+
+
+def test_pages_and_batches_are_merged_into_the_scan_panel(stub):
+    symbols = ["AAA", "BBB", "CCC", "DDD", "EEE"]
+    _Stub.bars = {s: _daily_bars(s) for s in symbols}
+    client = _client(stub, symbols_per_request=2, page_size=250, workers=3)
+
+    df = client.download(symbols, DAILY, pd.Timestamp("2023-01-01"), pd.Timestamp("2024-06-01"))
+
+    assert df.index.names == ["date", "ticker"]
+    assert list(df.columns) == ["close", "high", "low", "open", "volume"]
+    assert df.index.get_level_values("date").tz is None
+    assert len(df) == 300 * 5 and not df.index.duplicated().any()
+    assert df.loc[(pd.Timestamp("2023-01-03"), "BBB"), "close"] == 2 * 101.5
+    # 3 symbol batches, and every batch needed more than one page
+    assert len({r["symbols"] for r in _Stub.requests}) == 3
+    assert len(_Stub.requests) > 3 and any("page_token" in r for r in _Stub.requests)
+    assert {r["adjustment"] for r in _Stub.requests} == {"all"} and {r["key"] for r in _Stub.requests} == {"key"}
+
+    filtered = filter_by_dollar_vol(df.copy(), take_top=3)
+    assert set(filtered.index.unique(1)) <= set(symbols)
+    calculate_signals(filtered, df)
+
+
+def test_hours_start_at_the_open(stub):
+    _Stub.bars = {"AAA": _half_hours("AAA")}
+
+    df = _client(stub).download(["AAA"], HOURLY, pd.Timestamp("2024-03-04"), pd.Timestamp("2024-03-05"))
+    bars = df.xs("AAA", level=1)
+
+    assert [t.strftime("%H:%M") for t in bars.index] == ["09:30", "10:30", "11:30", "12:30", "13:30", "14:30", "15:30"]
+    # The 9:30 hour is the 9:30 and 10:00 half hours, the 9:00 pre-market bar is left out
+    assert bars.iloc[0].to_dict() == {"close": 3.0, "high": 4.0, "low": 0.0, "open": 1.0, "volume": 20.0}
+    assert bars["close"].dtype == "float32"
+    assert _Stub.requests[0]["timeframe"] == "30Min"
+
+
+def test_rate_limited_pages_are_retried(stub):
+    _Stub.bars = {"AAA": _daily_bars("AAA", 20)}
+    _Stub.throttle = 2
+
+    df = _client(stub).download(["AAA"], DAILY, pd.Timestamp("2023-01-01"), pd.Timestamp("2023-03-01"))
+
+    assert len(df) == 20
+    assert len(_Stub.requests) == 3
+
+
+def test_no_bars_is_an_empty_panel(stub):
+    df = _client(stub).download(["AAA"], DAILY, pd.Timestamp("2023-01-01"), pd.Timestamp("2023-03-01"))
+
+    assert df.empty and df.index.names == ["date", "ticker"]
+    assert list(df.columns) == ["close", "high", "low", "open", "volume"]
+    assert filter_by_dollar_vol(df.copy()).index.unique(1).empty
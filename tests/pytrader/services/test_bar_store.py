@@ -0,0 +1,97 @@
+import pandas as pd
+
+from pytrader.services.bar_store import BarStore
+from pytrader.utils.timeframe import DAILY
+
+_dates = pd.bdate_range("2024-01-01", periods=60, name="date")
+
+
+class _Provider:
+    """
+    Serves adjusted daily bars of a 1% a day climb, adjusted for the splits that happened by the download day.
+    """
+
+    def __init__(self):
+        self.today = 40
+        self.splits: dict[str, int] = {}
+        self.requests = []
+
+    def bars(self, ticker, start, end, actions):
+        dates = _dates[: self.today]
+        closes = pd.Series([100 * 1.01**i for i in range(len(dates))], index=dates)
+        split_at = self.splits.get(ticker)
+        if split_at is not None and split_at < self.today:
+            closes[dates < _dates[split_at]] /= 2
+        frame = pd.DataFrame({"close": closes, "high": closes, "low": closes, "open": closes, "volume": 1e6})
+        if actions:
+            frame["dividends"] = 0.0
+            frame["stock splits"] = 0.0
+            if split_at is not None and split_at < self.today:
+                frame.loc[_dates[split_at], "stock splits"] = 2.0
+        return frame[(frame.index >= start) & (frame.index < end)]
+
+    def download(self, tickers, timeframe, start, end, actions=False):
+        self.requests.append((tuple(tickers), start, actions))
+        frames = {t: self.bars(t, start, end, actions) for t in tickers}
+        return pd.concat(frames, names=["ticker", "date"]).swaplevel().sort_index()
+
+
+def _refresh(store, provider, tickers=("AAPL", "MSFT")):
+    end = _dates[provider.today - 1] + pd.Timedelta(days=1)
+    return store.refresh(list(tickers), DAILY, _dates[0], end)
+
+
+def test_unchanged_symbols_only_download_new_bars(tmp_path):
+    provider = _Provider()
+    store = BarStore(str(tmp_path), provider.download)
+    _refresh(store, provider)
+
+    provider.today = 45
+    df = _refresh(store, provider)
+
+    assert provider.requests[-1][0] == ("AAPL", "MSFT")
+    assert provider.requests[-1][1] == _dates[35]
+    pd.testing.assert_frame_equal(df.xs("AAPL", level=1), provider.bars("AAPL", _dates[0], _dates[45], False))
+
+
+def test_a_split_rewrites_only_the_split_symbol(tmp_path):
+    provider = _Provider()
+    store = BarStore(str(tmp_path), provider.download)
+    _refresh(store, provider)
+
+    provider.splits["AAPL"] = 42
+    provider.today = 45
+    df = _refresh(store, provider)
+
+    assert provider.requests[-1][:3:2] == (("AAPL",), False)
+    assert provider.requests[-1][1] == _dates[0]
+    for ticker in ("AAPL", "MSFT"):
+        expected = provider.bars(ticker, _dates[0], _dates[45], False)
+        pd.testing.assert_frame_equal(df.xs(ticker, level=1), expected, check_freq=False)
+
+
+def test_a_changed_adjustment_on_the_overlap_rewrites_the_symbol(tmp_path):
+    provider = _Provider()
+    store = BarStore(str(tmp_path), provider.download)
+    _refresh(store, provider)
+
+    # The split lands on the last stored bar, so only the changed overlap closes give it away
+    provider.splits["MSFT"] = 39
+    provider.today = 45
+    df = _refresh(store, provider)
+
+    assert provider.requests[-1][0] == ("MSFT",)
+    pd.testing.assert_frame_equal(
+        df.xs("MSFT", level=1), provider.bars("MSFT", _dates[0], _dates[45], False), check_freq=False
+    )
+
+
+def test_new_symbols_and_longer_lookbacks_download_everything(tmp_path):
+    provider = _Provider()
+    store = BarStore(str(tmp_path), provider.download)
+    end = _dates[provider.today - 1] + pd.Timedelta(days=1)
+    store.refresh(["AAPL"], DAILY, _dates[10], end)
+
+    store.refresh(["AAPL", "MSFT"], DAILY, _dates[0], end)
+
+    assert provider.requests[-1] == (("AAPL", "MSFT"), _dates[0], False)
@@ -0,0 +1,91 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+import requests
+from alpaca.common.exceptions import APIError
+
+from pytrader.services.call_policy import (
+    CallPolicy,
+    NotFoundError,
+    RateLimitedError,
+    RejectedError,
+    TransientBrokerError,
+)
+from pytrader.utils.rate_limit import TokenBucket
+
+
+def _api_error(status_code, code=None, message="failed"):
+    http_error = SimpleNamespace(response=SimpleNamespace(status_code=status_code))
+    return APIError(json.dumps({"code": code, "message": message}), http_error)
+
+
+class Flaky:
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+@pytest.fixture
+def sleeps():
+    return []
+
+
+@pytest.fixture
+def policy(sleeps):
+    return CallPolicy(TokenBucket(1000, 1000), max_retries=2, sleep=sleeps.append)
+
+
+def test_idempotent_calls_retry_server_errors(policy, sleeps):
+    fn = Flaky(_api_error(503), requests.ConnectionError())
+
+    assert policy.call("get_orders", fn) == "ok"
+    assert fn.calls == 3
+    assert len(sleeps) == 2 and sleeps[1] <= policy.base_delay * 2
+
+
+def test_non_idempotent_calls_only_retry_rate_limits(policy):
+    assert policy.call("close_position", Flaky(_api_error(429)), idempotent=False) == "ok"
+
+    with pytest.raises(TransientBrokerError):
+        policy.call("close_position", Flaky(_api_error(500)), idempotent=False)
+
+
+def test_retries_are_bounded(policy):
+    fn = Flaky(*[_api_error(429)] * 5)
+
+    with pytest.raises(RateLimitedError):
+        policy.call("get_account", fn)
+    assert fn.calls == 3
+
+
+@pytest.mark.parametrize(
+    "error, expected",
+    [
+        (_api_error(404, 40410000), NotFoundError),
+        (_api_error(403, 40310000, "insufficient buying power"), RejectedError),
+        (requests.Timeout(), TransientBrokerError),
+    ],
+)
+def test_errors_are_classified(policy, error, expected):
+    with pytest.raises(expected):
+        policy.call("submit_order", Flaky(error), idempotent=False)
+
+
+def test_latency_is_recorded_per_endpoint(policy):
+    policy.call("get_account", Flaky())
+    policy.call("get_account", Flaky())
+    with pytest.raises(RejectedError):
+        policy.call("submit_order", Flaky(_api_error(422)), idempotent=False)
+
+    summary = policy.summary()
+    assert summary["get_account"]["calls"] == 2
+    assert summary["submit_order"]["calls"] == 1
+    assert summary["submit_order"]["errors"] == 1
+    assert summary["submit_order"]["p99"] == 0.025
@@ -0,0 +1,167 @@
+import datetime
+
+import pytest
+from google.cloud.firestore_v1.types import StructuredQuery
+
+from pytrader.services.database import TraderDatabase
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id, data, fields=None):
+        self.id = doc_id
+        self._data = data
+        self._fields = fields
+        self.exists = data is not None
+
+    def to_dict(self):
+        if self._fields is None:
+            return dict(self._data)
+        return {k: v for k, v in self._data.items() if k in self._fields}
+
+    def get(self):
+        return self
+
+
+class FakeQuery:
+    """
+    The parts of a Firestore query the database uses, recording every page it serves.
+    """
+
+    def __init__(self, client, docs, filters=(), orders=(), fields=None, limit=None, cursor=None):
+        self.client = client
+        self.docs = docs
+        self.filters = list(filters)
+        self.orders = list(orders)
+        self.fields = fields
+        self._limit = limit
+        self.cursor = cursor
+
+    def _copy(self, **changes):
+        state = dict(
+            filters=self.filters, orders=self.orders, fields=self.fields, limit=self._limit, cursor=self.cursor
+        )
+        return FakeQuery(self.client, self.docs, **(state | changes))
+
+    def where(self, filter):
+        return self._copy(filters=self.filters + [filter])
+
+    def order_by(self, field, direction="ASCENDING"):
+        return self._copy(orders=self.orders + [(field, direction)])
+
+    def select(self, fields):
+        return self._copy(fields=fields)
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def start_after(self, snapshot):
+        return self._copy(cursor=snapshot)
+
+    def document(self, doc_id):
+        return FakeSnapshot(doc_id, self.docs.get(doc_id))
+
+    def _matches(self, data):
+        for f in self.filters:
+            value = data.get(f.field_path)
+            # Equality with None is sent as a null check
+            if f.op_string in ("==", StructuredQuery.UnaryFilter.Operator.IS_NULL) and value != f.value:
+                return False
+            if f.op_string == ">=" and (value is None or value < f.value):
+                return False
+            if f.op_string == "not-in" and value in f.value:
+                return False
+        return True
+
+    def _key(self, doc_id):
+        return tuple(doc_id if field == "__name__" else self.docs[doc_id].get(field) for field, _ in self.orders)
+
+    def stream(self):
+        ids = sorted(
+            (i for i, data in self.docs.items() if self._matches(data)),
+            key=self._key,
+            reverse=bool(self.orders) and self.orders[0][1] == "DESCENDING",
+        )
+        if self.cursor is not None:
+            after = self._key(self.cursor.id)
+            descending = self.orders[0][1] == "DESCENDING"
+            ids = [i for i in ids if (self._key(i) < after if descending else self._key(i) > after)]
+        page = ids[: self._limit]
+        self.client.pages.append((self.fields, len(page)))
+        return iter(FakeSnapshot(i, self.docs[i], self.fields) for i in page)
+
+
+class FakeClient:
+    def __init__(self, collections):
+        self.collections = collections
+        self.pages = []
+
+    def collection(self, name):
+        return FakeQuery(self, self.collections.setdefault(name, {}))
+
+
+def _database(collections) -> TraderDatabase:
+    db = TraderDatabase.__new__(TraderDatabase)
+    db.db = FakeClient(collections)
+    return db
+
+
+def _trades(count):
+    statuses = ["created", "closed", "canceled", "open"]
+    return {
+        f"t{i:03d}": {"symbol": f"S{i % 7}", "status": statuses[i % 4], "strategy": "RSI", "signals": []}
+        for i in range(count)
+    }
+
+
+def test_trades_are_read_a_page_at_a_time_in_order():
+    db = _database({"trades": _trades(23)})
+
+    trades = db.query_trades(include_closed=True, page_size=5)
+    first = next(trades)
+    assert first["id"] == "t000"
+    assert len(db.db.pages) == 1
+
+    ids = [first["id"]] + [t["id"] for t in trades]
+    assert ids == [f"t{i:03d}" for i in range(23)]
+    assert [count for _, count in db.db.pages] == [5, 5, 5, 5, 3]
+
+
+def test_open_trade_ids_read_no_fields():
+    db = _database({"trades": _trades(10)})
+
+    ids = list(db.get_trade_ids())
+
+    assert sorted(ids) == ["t000", "t003", "t004", "t007", "t008"]
+    assert all(fields == ["__name__"] for fields, _ in db.db.pages)
+
+
+def test_projection_ordering_and_resuming():
+    db = _database({"trades": _trades(12)})
+
+    trades = list(db.query_trades(include_closed=True, select=["symbol"], order_by="symbol", descending=True))
+    assert all(set(t) == {"id", "symbol"} for t in trades)
+    keys = [(t["symbol"], t["id"]) for t in trades]
+    assert keys == sorted(keys, reverse=True)
+
+    resumed = list(db.query_trades(include_closed=True, order_by="symbol", descending=True, start_after=keys[4][1]))
+    assert [t["id"] for t in resumed] == [t["id"] for t in trades[5:]]
+
+    with pytest.raises(ValueError):
+        list(db.query_trades(start_after="missing"))
+
+
+def test_pending_signals_leave_out_resolved_orders():
+    today = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=1)
+    signal = {"symbol": "AAPL", "action": "Buy", "date": today, "strategy": "RSI", "metadata": {"close": 1.0}}
+    signals = {
+        "pending": signal | {"executeOn": today, "orderId": None, "resolvedOrder": {"legs": ["large"]}},
+        "ordered": signal | {"executeOn": today, "orderId": "1", "resolvedOrder": {}},
+        "past": signal | {"executeOn": today - datetime.timedelta(days=30), "orderId": None},
+    }
+    db = _database({"signals": signals})
+
+    pending = db.get_pending_signals()
+
+    assert [s.id for s in pending] == ["pending"]
+    assert pending[0].metadata == {"close": 1.0}
+    assert pending[0].resolvedOrder is None
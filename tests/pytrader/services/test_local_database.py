@@ -0,0 +1,62 @@
+import datetime
+
+import pytest
+
+from pytrader.model import SignalModel, TradeModel
+from pytrader.services.local_database import LocalDatabase
+from pytrader.utils import localtime
+
+
+@pytest.fixture
+def clock():
+    now = localtime.localize_to_et(datetime.datetime(2024, 6, 3, 16))
+    localtime.set_clock(lambda: now)
+    yield now
+    localtime.set_clock(None)
+
+
+def _trades(db: LocalDatabase, count: int):
+    statuses = ["created", "closed", "canceled", "open"]
+    for i in range(count):
+        trade = TradeModel(f"t{i:03d}", f"S{i % 7}", None, "RSI", statuses[i % 4])
+        db.add_trade(trade)
+
+
+def test_queries_sort_project_and_resume_like_firestore(tmp_path):
+    db = LocalDatabase(str(tmp_path / "database.pkl"))
+    _trades(db, 12)
+
+    assert sorted(db.get_trade_ids()) == ["t000", "t003", "t004", "t007", "t008", "t011"]
+    trades = list(db.query_trades(include_closed=True, select=["symbol"], order_by="symbol", descending=True))
+    assert all(set(t) == {"id", "symbol"} for t in trades)
+    keys = [(t["symbol"], t["id"]) for t in trades]
+    assert keys == sorted(keys, reverse=True)
+
+    resumed = list(db.query_trades(include_closed=True, order_by="symbol", descending=True, start_after=keys[4][1]))
+    assert [t["id"] for t in resumed] == [t["id"] for t in trades[5:]]
+    with pytest.raises(ValueError):
+        list(db.query_trades(start_after="missing"))
+
+
+def test_documents_survive_a_reopen(tmp_path, clock):
+    path = str(tmp_path / "database.pkl")
+    db = LocalDatabase(path)
+    signal = SignalModel.create_signal("AAPL", "buy", "Buy", "RSI", {"close": 1.0}, localtime.to_day(clock))
+    db.add_signal(signal)
+    db.add_trade(TradeModel.create_trade("AAPL", "trade", "RSI", []))
+    db.add_signal_ref_to_trade("trade", "buy")
+    db.close()
+
+    db = LocalDatabase(path)
+    assert [s.id for s in db.get_pending_signals()] == ["buy"]
+
+    db.update_signal_orders({"buy": "1"})
+    db.merge_orders({"alpaca_1": {"id": "1", "status": "filled", "legs": None}})
+    assert db.get_pending_signals() == []
+    assert db.get_signal_id_for_order("1") == "buy"
+    assert db.get_trade_id_for_signal("buy") == "trade"
+    assert db.get_trade("trade").resolved_signals[0].resolvedOrder == {"id": "1", "status": "filled"}
+
+    db.close_trade(db.get_trade("trade"))
+    (closed,) = db.get_closed_trades(settled_since=clock)
+    assert closed["id"] == "trade" and closed["settled_at"] == clock
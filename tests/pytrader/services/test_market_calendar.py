@@ -0,0 +1,73 @@
+import datetime
+
+import pytest
+
+from pytrader.services.market_calendar import MarketCalendar
+from pytrader.utils import localtime
+
+
+class FakeSessions:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, start, end):
+        self.calls += 1
+        days = [start + datetime.timedelta(days=i) for i in range((end - start).days + 1)]
+        return [day for day in days if day.weekday() < 5]
+
+
+@pytest.fixture
+def fetch():
+    return FakeSessions()
+
+
+def test_market_days_between_is_inclusive(fetch):
+    calendar = MarketCalendar(fetch)
+    friday = localtime.today().date() - datetime.timedelta(days=localtime.today().weekday() + 3)
+
+    days = calendar.market_days_between(friday, friday + datetime.timedelta(days=3))
+
+    assert days == [friday, friday + datetime.timedelta(days=3)]
+
+
+def test_queries_are_answered_from_one_fetch(fetch):
+    calendar = MarketCalendar(fetch)
+    today = localtime.today().date()
+
+    for i in range(20):
+        calendar.market_days_between(today - datetime.timedelta(days=i), today)
+        calendar.next_trade_day()
+
+    assert fetch.calls == 1
+
+
+def test_next_trade_day_skips_today_after_the_close(fetch):
+    calendar = MarketCalendar(fetch)
+    monday = localtime.today().date() - datetime.timedelta(days=localtime.today().weekday())
+
+    morning = localtime.localize_to_et(datetime.datetime(monday.year, monday.month, monday.day, 10))
+    evening = localtime.localize_to_et(datetime.datetime(monday.year, monday.month, monday.day, 17))
+
+    assert calendar.next_trade_day(morning).date() == monday
+    assert calendar.next_trade_day(evening).date() == monday + datetime.timedelta(days=1)
+
+
+def test_sessions_are_persisted(fetch, tmp_path):
+    path = str(tmp_path / "calendar.json")
+    today = localtime.today().date()
+    MarketCalendar(fetch, path).market_days_between(today, today)
+
+    reloaded = MarketCalendar(fetch, path)
+    reloaded.market_days_between(today - datetime.timedelta(days=30), today)
+
+    assert fetch.calls == 1
+
+
+def test_uncovered_range_triggers_refresh(fetch):
+    calendar = MarketCalendar(fetch)
+    today = localtime.today().date()
+    calendar.market_days_between(today, today)
+
+    calendar.market_days_between(today - datetime.timedelta(days=800), today)
+
+    assert fetch.calls == 2
@@ -0,0 +1,87 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from pytrader.services.google_chat_notifications import GoogleChatNotification
+from pytrader.services.notification_dispatcher import NotificationDispatcher
+
+
+class ChatStandIn(BaseHTTPRequestHandler):
+    messages: list[str] = []
+    failures: list[int] = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        status = self.failures.pop(0) if self.failures else 200
+        if status == 200:
+            self.messages.append(body["text"])
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def webhook():
+    ChatStandIn.messages, ChatStandIn.failures = [], []
+    server = HTTPServer(("127.0.0.1", 0), ChatStandIn)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/webhook"
+    server.shutdown()
+    server.server_close()
+
+
+def _dispatcher(webhook, **kwargs):
+    return NotificationDispatcher(GoogleChatNotification(webhook), sleep=lambda s: None, **kwargs).start()
+
+
+def test_lines_are_coalesced_into_digests(webhook):
+    dispatcher = _dispatcher(webhook, digest_size=3)
+
+    for i in range(4):
+        dispatcher.add(f"fill {i}")
+    dispatcher.flush()
+    dispatcher.add("fill 4")
+    dispatcher.close()
+
+    assert ChatStandIn.messages == ["fill 0\nfill 1\nfill 2", "fill 3", "fill 4"]
+    assert dispatcher.stats["messages"] == 3
+
+
+def test_window_sends_a_partial_digest(webhook):
+    dispatcher = _dispatcher(webhook, digest_size=100, digest_window=0.05)
+
+    dispatcher.add("Buy AAPL")
+    for _ in range(100):
+        if ChatStandIn.messages:
+            break
+        threading.Event().wait(0.01)
+    dispatcher.close()
+
+    assert ChatStandIn.messages == ["Buy AAPL"]
+
+
+def test_server_errors_are_retried_and_client_errors_dropped(webhook):
+    ChatStandIn.failures = [503, 429, 400]
+    dispatcher = _dispatcher(webhook, digest_size=1)
+
+    dispatcher.add("first")
+    dispatcher.add("second")
+    dispatcher.close()
+
+    assert ChatStandIn.messages == ["second"]
+    assert dispatcher.stats == {"lines": 2, "messages": 1, "failed": 1, "dropped": 0}
+
+
+def test_unreachable_webhook_never_raises():
+    dispatcher = _dispatcher("http://127.0.0.1:9/webhook", digest_size=1, max_retries=1)
+
+    dispatcher.add("lost")
+    dispatcher.close()
+
+    assert dispatcher.stats["failed"] == 1
@@ -0,0 +1,62 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from pytrader.services.order_executor import OrderExecutor, OrderIntent
+
+
+class LocalBroker:
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def _order(self, symbol):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+        if symbol == "FAIL":
+            raise RuntimeError("position does not exist")
+        return SimpleNamespace(id=f"order-{symbol}")
+
+    def buy_with_stop_loss(self, symbol, qty, limit_price, stop_price, client_order_id=None):
+        return self._order(symbol)
+
+    def close_position(self, symbol):
+        return self._order(symbol)
+
+
+def _intents(count):
+    return [OrderIntent(f"signal-{i}", f"SYM{i}", "Buy", 1, 10.0, 9.8) for i in range(count)]
+
+
+def test_orders_are_submitted_concurrently_within_the_limit():
+    broker = LocalBroker()
+
+    started = time.perf_counter()
+    results = OrderExecutor(broker, max_parallel=4).execute(_intents(12))
+    elapsed = time.perf_counter() - started
+
+    assert broker.max_in_flight == 4
+    assert elapsed < 12 * broker.delay / 2
+    assert [r.order_id for r in results] == [f"order-SYM{i}" for i in range(12)]
+
+
+def test_failures_are_reported_per_order():
+    intents = [OrderIntent("a", "AAPL", "Sell"), OrderIntent("b", "FAIL", "Sell")]
+
+    results = OrderExecutor(LocalBroker(delay=0)).execute(intents)
+
+    assert results[0].order_id == "order-AAPL" and results[0].error is None
+    assert results[1].order_id is None and "position does not exist" in results[1].error
+
+
+def test_latency_is_reported_per_order():
+    results = OrderExecutor(LocalBroker(), max_parallel=1).execute(_intents(3))
+
+    assert all(r.latency >= 0.05 for r in results)
+    assert results[0].submitted_after < results[1].submitted_after < results[2].submitted_after
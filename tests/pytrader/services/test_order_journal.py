@@ -0,0 +1,151 @@
+import datetime
+import os
+
+import pytest
+
+from pytrader.services.order_journal import OrderJournal
+from pytrader.utils import localtime
+
+_t0 = localtime.convert_to_est(datetime.datetime(2024, 5, 1, 13, 30, tzinfo=datetime.timezone.utc))
+
+
+def _order(order_id, status, minutes, **fields):
+    order = {
+        "id": order_id,
+        "symbol": "AAPL",
+        "status": status,
+        "qty": 10.0,
+        "submitted_at": _t0,
+        "updated_at": _t0 + datetime.timedelta(minutes=minutes),
+    }
+    return order | fields
+
+
+def _fill(journal, order_id, start):
+    journal.append(f"alpaca_{order_id}", "new", _order(order_id, "NEW", start))
+    journal.append(
+        f"alpaca_{order_id}",
+        "fill",
+        _order(
+            order_id, "FILLED", start + 1, filled_avg_price=101.5, filled_at=_t0 + datetime.timedelta(minutes=start + 1)
+        ),
+    )
+
+
+def test_replay_rebuilds_the_latest_order_states(tmp_path):
+    journal = OrderJournal(str(tmp_path))
+    _fill(journal, "a", 0)
+    journal.append("alpaca_b", "new", _order("b", "NEW", 5, limit_price=99.0))
+    journal.append("alpaca_b", "replaced", _order("b", "REPLACED", 6))
+    journal.close()
+
+    states = OrderJournal(str(tmp_path)).replay()
+
+    assert states["alpaca_a"] == _order(
+        "a", "FILLED", 1, filled_avg_price=101.5, filled_at=_t0 + datetime.timedelta(minutes=1)
+    )
+    # Fields the broker stopped reporting are dropped
+    assert "limit_price" not in states["alpaca_b"]
+    assert states["alpaca_b"]["updated_at"].tzinfo is not None
+
+
+def test_later_records_only_hold_changed_fields(tmp_path):
+    journal = OrderJournal(str(tmp_path))
+    _fill(journal, "a", 0)
+    journal.close()
+
+    with open(tmp_path / "00000001.log") as f:
+        first, second = f.readlines()
+    assert '"symbol"' in first and '"symbol"' not in second
+
+
+def test_segments_are_sealed_indexed_and_read_on_their_own(tmp_path):
+    journal = OrderJournal(str(tmp_path), segment_bytes=400)
+    for n in range(6):
+        _fill(journal, f"o{n}", n * 10)
+    journal.append("alpaca_o0", "canceled", _order("o0", "CANCELED", 100))
+
+    assert len([n for n in os.listdir(tmp_path) if n.endswith(".log")]) > 2
+    assert all(
+        os.path.exists(tmp_path / n.replace(".log", ".idx"))
+        for n in sorted(os.listdir(tmp_path))[:-2]
+        if n.endswith(".log")
+    )
+    assert journal.order("alpaca_o0")["status"] == "CANCELED"
+    assert journal.order("alpaca_o3")["filled_avg_price"] == 101.5
+    assert journal.order("alpaca_missing") is None
+
+    events = list(journal.events("alpaca_o0"))
+    assert [e.event for e in events] == ["new", "fill", "canceled"]
+    assert events[-1].order["symbol"] == "AAPL"
+
+    window = list(
+        journal.events(since=_t0 + datetime.timedelta(minutes=20), until=_t0 + datetime.timedelta(minutes=31))
+    )
+    assert [(e.key, e.event) for e in window] == [
+        ("alpaca_o2", "new"),
+        ("alpaca_o2", "fill"),
+        ("alpaca_o3", "new"),
+        ("alpaca_o3", "fill"),
+    ]
+    states = journal.replay()
+    assert len(states) == 6
+    assert states["alpaca_o0"]["status"] == "CANCELED"
+    assert states["alpaca_o5"] == journal.order("alpaca_o5")
+
+
+def test_a_partly_written_record_is_dropped_on_open(tmp_path):
+    journal = OrderJournal(str(tmp_path))
+    _fill(journal, "a", 0)
+    journal.close()
+    with open(tmp_path / "00000001.log", "a") as f:
+        f.write('{"k":"alpaca_b","e":"new"')
+
+    journal = OrderJournal(str(tmp_path))
+    journal.append("alpaca_b", "new", _order("b", "NEW", 5))
+
+    assert set(journal.replay()) == {"alpaca_a", "alpaca_b"}
+    assert journal.order("alpaca_a")["status"] == "FILLED"
+
+
+def test_sealed_segments_past_the_retention_are_deleted(tmp_path):
+    journal = OrderJournal(str(tmp_path), segment_bytes=400)
+    for n in range(4):
+        _fill(journal, f"o{n}", n * 10)
+    journal.close()
+    sealed = len([n for n in os.listdir(tmp_path) if n.endswith(".log")]) - 1
+    assert sealed > 0
+
+    journal = OrderJournal(str(tmp_path), segment_bytes=400, retention_days=30)
+    logs = sorted(n for n in os.listdir(tmp_path) if n.endswith(".log"))
+    assert logs == [f"{sealed + 1:08d}.log"]
+    assert {n for n in os.listdir(tmp_path) if n.endswith(".idx")} <= {f"{sealed + 1:08d}.idx"}
+
+    # New segments continue the numbering instead of reusing a deleted segment's name
+    recent = localtime.today()
+    for n in range(4):
+        journal.append(f"alpaca_n{n}", "new", _order(f"n{n}", "NEW", 0, updated_at=recent))
+    logs = sorted(n for n in os.listdir(tmp_path) if n.endswith(".log"))
+    assert logs and all(int(n[:-4]) > sealed + 1 for n in logs)
+    assert all(journal.order(f"alpaca_n{n}")["status"] == "NEW" for n in range(4))
+
+
+def test_a_read_only_journal_leaves_the_writers_files_alone(tmp_path):
+    writer = OrderJournal(str(tmp_path), segment_bytes=400)
+    for n in range(3):
+        _fill(writer, f"o{n}", n * 10)
+    # The monitor is part way through writing a record while the sweep opens the journal
+    writer._file.write('{"k":"alpaca_b","e":"new"')
+    writer._file.flush()
+    files = {n: os.path.getsize(tmp_path / n) for n in os.listdir(tmp_path)}
+
+    reader = OrderJournal(str(tmp_path), retention_days=30, read_only=True)
+    assert set(reader.replay()) == {"alpaca_o0", "alpaca_o1", "alpaca_o2"}
+    assert reader.order("alpaca_o2")["status"] == "FILLED"
+    with pytest.raises(ValueError):
+        reader.append("alpaca_c", "new", _order("c", "NEW", 0))
+    reader.close()
+
+    assert {n: os.path.getsize(tmp_path / n) for n in os.listdir(tmp_path)} == files
+    assert OrderJournal(str(tmp_path / "missing"), read_only=True).order("alpaca_o0") is None
+    assert not os.path.exists(tmp_path / "missing")
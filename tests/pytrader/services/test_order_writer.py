@@ -0,0 +1,66 @@
+import pytest
+
+from pytrader.services.order_writer import OrderEventWriter
+
+
+@pytest.fixture
+def writes():
+    return []
+
+
+@pytest.fixture
+def writer(writes):
+    return OrderEventWriter(writes.append, window=60)
+
+
+def test_updates_are_coalesced_per_order(writer, writes):
+    writer.submit("alpaca_1", {"id": "1", "status": "new"})
+    for filled in range(1, 10):
+        writer.submit("alpaca_1", {"id": "1", "status": "partially_filled", "filled_qty": filled})
+    writer.submit("alpaca_1", {"id": "1", "status": "filled", "filled_qty": 10})
+
+    writer.flush()
+
+    assert writes == [{"alpaca_1": {"id": "1", "status": "filled", "filled_qty": 10}}]
+
+
+def test_only_changed_fields_are_written(writer, writes):
+    writer.submit("alpaca_1", {"id": "1", "status": "new", "symbol": "AAPL", "limit_price": 10.0})
+    writer.flush()
+    writer.submit("alpaca_1", {"id": "1", "status": "filled", "symbol": "AAPL"})
+    writer.flush()
+
+    assert writes[1] == {"alpaca_1": {"status": "filled", "limit_price": None}}
+
+
+def test_unchanged_orders_are_not_written(writer, writes):
+    writer.submit("alpaca_1", {"id": "1", "status": "new"})
+    writer.flush()
+    writer.submit("alpaca_1", {"id": "1", "status": "new"})
+
+    assert writer.flush() == 0
+    assert len(writes) == 1
+
+
+def test_failed_writes_are_retried(writes):
+    def persist(changes):
+        if not writes:
+            writes.append(None)
+            raise RuntimeError("unavailable")
+        writes.append(changes)
+
+    writer = OrderEventWriter(persist, window=60)
+    writer.submit("alpaca_1", {"id": "1", "status": "new"})
+    writer.flush()
+    writer.flush()
+
+    assert writes[-1] == {"alpaca_1": {"id": "1", "status": "new"}}
+
+
+def test_close_flushes_pending_updates(writes):
+    writer = OrderEventWriter(writes.append, window=60)
+    writer.start()
+    writer.submit("alpaca_1", {"id": "1", "status": "filled"})
+    writer.close()
+
+    assert writes == [{"alpaca_1": {"id": "1", "status": "filled"}}]
@@ -0,0 +1,31 @@
+import pandas as pd
+
+from pytrader.services import rsi_signal_provider
+
+
+def test_chunked_scan_matches_the_single_panel_scan(monkeypatch, trending_panel):
+    index = pd.date_range("2024-01-02 14:30", periods=400, freq="h", tz="UTC").tz_convert("America/New_York")
+    tickers = ["EEE", "AAA", "DDD", "BBB", "CCC"]
+    panel = pd.concat([trending_panel(index, t, 1 + i) for i, t in enumerate(tickers)]).sort_index()
+    downloads = []
+
+    def _download(chunk, interval, lookback_bars, incremental=False):
+        downloads.append(list(chunk))
+        return panel[panel.index.get_level_values(1).isin(chunk)].copy()
+
+    def _tickers():
+        return tickers
+
+    _tickers.check_call_in_cache = lambda: False
+    monkeypatch.setattr(rsi_signal_provider, "get_tickers", _tickers)
+    monkeypatch.setattr(rsi_signal_provider, "get_adjusted_market_data", _download)
+
+    expected = rsi_signal_provider._cached_rsi_signals.func(timeframe_name="1h")
+    chunked = rsi_signal_provider._cached_rsi_signals.func(timeframe_name="1h", chunk_size=2)
+
+    assert downloads[1:] == [["AAA", "BBB"], ["CCC", "DDD"], ["EEE"]]
+    assert sorted(chunked) == sorted(expected) == sorted(tickers)
+    for symbol in expected:
+        assert chunked.events(symbol) == expected.events(symbol)
+    triggers = pd.DataFrame(chunked.triggers.records).set_index("symbol").sort_index()
+    pd.testing.assert_frame_equal(triggers, pd.DataFrame(expected.triggers.records).set_index("symbol").sort_index())
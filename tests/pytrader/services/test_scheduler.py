@@ -0,0 +1,79 @@
+import asyncio
+import datetime
+
+from pytrader.services.scheduler import ScheduledJob, SessionScheduler
+from pytrader.utils import localtime
+
+
+class WeekdayCalendar:
+    def is_trading_day(self, day):
+        return day.weekday() < 5
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def _et(*args):
+    return localtime.localize_to_et(datetime.datetime(*args))
+
+
+def _scheduler(clock, calls):
+    jobs = [
+        ScheduledJob("scan", datetime.time(16, 30), lambda: calls.append("scan")),
+        ScheduledJob("process", datetime.time(16, 45), lambda: calls.append("process")),
+    ]
+    return SessionScheduler(WeekdayCalendar(), jobs, clock)
+
+
+def test_jobs_run_once_per_session_in_order():
+    clock, calls = Clock(_et(2024, 6, 3, 9, 0)), []  # Monday
+    scheduler = _scheduler(clock, calls)
+
+    assert asyncio.run(scheduler.run_pending()) == 0
+    assert scheduler.next_run(clock.now) == _et(2024, 6, 3, 16, 30)
+
+    clock.now = _et(2024, 6, 3, 16, 50)
+    assert asyncio.run(scheduler.run_pending()) == 2
+    assert asyncio.run(scheduler.run_pending()) == 0
+    assert calls == ["scan", "process"]
+    assert scheduler.next_run(clock.now) == _et(2024, 6, 4, 16, 30)
+
+
+def test_non_trading_days_are_skipped():
+    clock, calls = Clock(_et(2024, 6, 7, 17, 0)), []  # Friday, after both jobs
+    scheduler = _scheduler(clock, calls)
+
+    clock.now = _et(2024, 6, 8, 17, 0)
+    assert asyncio.run(scheduler.run_pending()) == 0
+    assert calls == []
+    assert scheduler.next_run(clock.now) == _et(2024, 6, 10, 16, 30)
+
+
+def test_starting_late_does_not_replay_missed_jobs():
+    clock, calls = Clock(_et(2024, 6, 3, 16, 40)), []
+    scheduler = _scheduler(clock, calls)
+
+    assert asyncio.run(scheduler.run_pending()) == 0
+    assert scheduler.next_run(clock.now) == _et(2024, 6, 3, 16, 45)
+
+
+def test_failing_job_does_not_stop_the_schedule():
+    clock, calls = Clock(_et(2024, 6, 3, 9, 0)), []
+
+    def _fail():
+        raise RuntimeError("boom")
+
+    jobs = [
+        ScheduledJob("scan", datetime.time(16, 30), _fail),
+        ScheduledJob("process", datetime.time(16, 45), lambda: calls.append("process")),
+    ]
+    scheduler = SessionScheduler(WeekdayCalendar(), jobs, clock)
+
+    clock.now = _et(2024, 6, 3, 17, 0)
+    assert asyncio.run(scheduler.run_pending()) == 2
+    assert calls == ["process"]
@@ -0,0 +1,107 @@
+import asyncio
+import time
+
+import numpy as np
+import pandas as pd
+
+from pytrader.algos.incremental_rsi import RsiState
+from pytrader.services.signal_stream import ReplayPrices, StreamingRsiEvaluator
+from pytrader.utils.timeframe import HOURLY
+
+
+def _closes(seed, periods=400):
+    return 100 * np.cumprod(1 + np.random.default_rng(seed).normal(0.0005, 0.03, periods))
+
+
+def _buy_price(state: RsiState) -> float:
+    prices = state.last_close * np.linspace(0.5, 1.5, 2001)
+    return next(float(p) for p in prices if state.peek(p) == "Buy")
+
+
+def _minute_bars(prices: dict[str, list[float]], start="2024-03-04 14:30") -> pd.DataFrame:
+    index = pd.date_range(start, periods=len(next(iter(prices.values()))), freq="min", tz="UTC")
+    frames = [pd.DataFrame({"close": closes, "ticker": symbol}, index=index) for symbol, closes in prices.items()]
+    return pd.concat(frames).rename_axis("date").set_index("ticker", append=True).sort_index()
+
+
+def _seeded(seed: int) -> RsiState:
+    closes = _closes(seed)
+    state = RsiState.from_closes(closes)
+    # Walk forward until the next bar can open a buy phase
+    while not any(state.peek(p) == "Buy" for p in state.last_close * np.linspace(0.5, 1.5, 201)):
+        state.update(state.last_close * 1.01)
+    return state
+
+
+def test_replayed_prices_raise_one_provisional_signal_per_bar():
+    state = _seeded(0)
+    buy = _buy_price(state)
+    # Two hourly bars from 9:30, the first dips to a buy price twice, the second recovers
+    prices = [state.last_close] * 10 + [buy] * 2 + [state.last_close] * 48 + [state.last_close * 1.02] * 60
+    signals = []
+    evaluator = StreamingRsiEvaluator({"AAPL": state}, HOURLY, signals.append)
+
+    asyncio.run(ReplayPrices(_minute_bars({"AAPL": prices})).stream_prices(evaluator.on_price, ["AAPL"]))
+
+    assert [(s.symbol, s.action, s.price) for s in signals] == [("AAPL", "Buy", buy)]
+    assert signals[0].bar == HOURLY.bar_start(pd.Timestamp("2024-03-04 14:30", tz="UTC"))
+    assert signals[0].rsi < 30
+    assert evaluator.ticks == len(prices)
+    # Only the first bar was completed, at its last price
+    assert state.in_buy_phase is False
+
+
+def test_bars_complete_at_their_last_price():
+    closes = _closes(1)
+    state = RsiState.from_closes(closes)
+    expected = RsiState.from_closes(closes)
+    evaluator = StreamingRsiEvaluator({"AAPL": state}, HOURLY, lambda s: None)
+    minutes = [closes[-1] * (1 + 0.001 * np.sin(i)) for i in range(150)]
+
+    asyncio.run(ReplayPrices(_minute_bars({"AAPL": minutes})).stream_prices(evaluator.on_price, ["AAPL"]))
+    evaluator.flush()
+
+    # 9:30, 10:30 and 11:30 bars, the last one cut short by the replay
+    for last_minute in (59, 119, 149):
+        expected.update(minutes[last_minute])
+    assert state.rsi() == expected.rsi()
+    assert state.last_close == expected.last_close
+
+
+def test_prices_outside_the_session_and_unknown_symbols_are_ignored():
+    evaluator = StreamingRsiEvaluator({"AAPL": RsiState.from_closes(_closes(2))}, HOURLY, lambda s: None)
+
+    assert evaluator.on_price("AAPL", pd.Timestamp("2024-03-04 13:00", tz="UTC"), 100.0) is None
+    assert evaluator.on_price("MSFT", pd.Timestamp("2024-03-04 15:00", tz="UTC"), 100.0) is None
+    assert evaluator.ticks == 0
+
+
+def test_seeding_leaves_out_forming_bars():
+    closes = _closes(4, 300)
+    index = pd.date_range("2024-01-02 14:30", periods=len(closes), freq="h", tz="UTC", name="date")
+    panel = pd.DataFrame({"close": closes, "ticker": "AAPL"}, index=index).set_index("ticker", append=True)
+    before = HOURLY.to_et(index[-1])
+
+    evaluator = StreamingRsiEvaluator.from_panel(panel, ["AAPL", "MSFT"], HOURLY, lambda s: None, before)
+
+    assert list(evaluator.states) == ["AAPL"]
+    assert evaluator.states["AAPL"].last_close == closes[-2]
+
+
+def test_per_price_latency_across_hundreds_of_symbols():
+    states = {f"S{i:03}": RsiState.from_closes(_closes(i)) for i in range(300)}
+    evaluator = StreamingRsiEvaluator(states, HOURLY, lambda s: None)
+    start = pd.Timestamp("2024-03-04 14:30", tz="UTC").to_pydatetime()
+    ticks = [
+        (symbol, start + pd.Timedelta(minutes=m), states[symbol].last_close * (1 + 0.002 * np.sin(m)))
+        for m in range(0, 120, 6)
+        for symbol in states
+    ]
+
+    started = time.perf_counter()
+    for tick in ticks:
+        evaluator.on_price(*tick)
+    per_tick = (time.perf_counter() - started) / len(ticks)
+
+    assert evaluator.ticks == len(ticks)
+    assert per_tick < 0.001
@@ -0,0 +1,169 @@
+import asyncio
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pytrader.services.sim_broker import SimulatedBroker
+
+
+def _bars(rows: dict[str, list[tuple]]) -> pd.DataFrame:
+    dates = pd.bdate_range("2024-01-01", periods=len(next(iter(rows.values()))))
+    frames = []
+    for ticker, bars in rows.items():
+        frame = pd.DataFrame(bars, columns=["open", "high", "low", "close"], index=dates)
+        frame["ticker"] = ticker
+        frames.append(frame)
+    df = pd.concat(frames).rename_axis("date").set_index("ticker", append=True)
+    return df.sort_index()
+
+
+@pytest.fixture
+def broker():
+    bars = _bars(
+        {
+            "AAPL": [(100, 101, 99, 100), (99, 100, 97, 98), (98, 99, 90, 91), (92, 95, 91, 94)],
+            "MSFT": [(200, 201, 199, 200), (205, 210, 204, 208), (208, 209, 207, 208), (209, 210, 208, 209)],
+        }
+    )
+    return SimulatedBroker(bars, cash=10_000, slippage=0.001)
+
+
+def test_limit_buy_fills_at_open_on_the_next_session(broker):
+    order = broker.buy_with_stop_loss("AAPL", 10, 99.5, 92)
+    broker.advance()
+
+    filled = broker.get_order_by_id(order.id)
+    assert filled["status"] == "FILLED"
+    assert filled["filled_avg_price"] == pytest.approx(99.099)
+    assert broker.get_position_for("AAPL").qty == "10"
+
+
+def test_limit_buy_above_the_range_expires(broker):
+    order = broker.buy_with_stop_loss("MSFT", 1, 200, 190)
+    broker.advance()
+
+    assert broker.get_order_by_id(order.id)["status"] == "EXPIRED"
+    assert broker.get_position_for("MSFT") is None
+
+
+def test_stop_loss_leg_triggers_with_slippage(broker):
+    order = broker.buy_with_stop_loss("AAPL", 10, 99.5, 92)
+    broker.run_until(broker.sessions[-1])
+
+    stop_leg = broker.get_order_by_id(order.legs[0].id)
+    assert stop_leg["status"] == "FILLED"
+    assert stop_leg["filled_avg_price"] == pytest.approx(92 * 0.999)
+    assert broker.get_position_for("AAPL") is None
+
+
+def test_close_position_sells_at_next_open_and_cancels_the_stop(broker):
+    order = broker.buy_with_stop_loss("AAPL", 10, 99.5, 80)
+    broker.advance()
+    close = broker.close_position("AAPL")
+    broker.advance()
+
+    assert broker.get_order_by_id(close.id)["filled_avg_price"] == pytest.approx(98 * 0.999)
+    assert broker.get_order_by_id(order.legs[0].id)["status"] == "CANCELED"
+    enabled, account = broker.account()
+    assert enabled and float(account.cash) == pytest.approx(10_000 + 10 * (98 * 0.999 - 99.099))
+
+
+def test_a_saved_simulation_resumes_where_it_stopped(broker, tmp_path):
+    order = broker.buy_with_stop_loss("AAPL", 10, 99.5, 92)
+    broker.add_listener(lambda event, order: None)
+    broker.save(tmp_path / "broker.pkl")
+
+    resumed = SimulatedBroker.load(tmp_path / "broker.pkl")
+    assert resumed.today == broker.today
+    assert resumed.get_order_by_id(order.id)["status"] == "NEW"
+
+    resumed.advance()
+    assert resumed.get_order_by_id(order.id)["status"] == "FILLED"
+    assert resumed.get_next_trade_day().date() == resumed.sessions[2]
+    assert list(resumed.history().index.unique(0)) == list(broker.bars.index.unique(0)[:2])
+    assert len(resumed.history(1)) == 2
+
+
+def test_order_events_are_streamed(broker):
+    events = []
+
+    async def handler(event, order):
+        events.append((event, order["status"]))
+        if order["status"] == "FILLED":
+            broker.close_stream()
+
+    broker.buy_with_stop_loss("AAPL", 10, 99.5, 80)
+    threading.Timer(0.05, broker.advance).start()
+    broker.get_order_stream(handler)
+
+    assert ("fill", "FILLED") in events
+
+
+def test_order_stream_shares_the_event_loop(broker):
+    events = []
+
+    async def handler(event, order):
+        events.append(order["status"])
+
+    async def _run():
+        stream = asyncio.create_task(broker.stream_orders(handler))
+        await asyncio.sleep(0)
+        broker.buy_with_stop_loss("AAPL", 10, 99.5, 80)
+        await asyncio.to_thread(broker.advance)
+        while "FILLED" not in events:
+            await asyncio.sleep(0.01)
+        stream.cancel()
+        await asyncio.gather(stream, return_exceptions=True)
+        return stream.cancelled()
+
+    assert asyncio.run(asyncio.wait_for(_run(), 5))
+
+
+def test_a_restarted_stream_replaces_its_listener(broker):
+    events = []
+
+    async def handler(event, order):
+        events.append(order["status"])
+
+    async def _run():
+        for _ in range(3):
+            stream = asyncio.create_task(broker.stream_orders(handler))
+            await asyncio.sleep(0.01)
+            assert len(broker._listeners) == 1
+            stream.cancel()
+            await asyncio.gather(stream, return_exceptions=True)
+        assert broker._listeners == []
+
+        stream = asyncio.create_task(broker.stream_orders(handler))
+        await asyncio.sleep(0.01)
+        broker.buy_with_stop_loss("AAPL", 10, 99.5, 80)
+        await asyncio.to_thread(broker.advance)
+        while "FILLED" not in events:
+            await asyncio.sleep(0.01)
+        broker.close_stream()
+        await stream
+
+    asyncio.run(asyncio.wait_for(_run(), 5))
+    assert events.count("FILLED") == 1
+    assert broker._listeners == []
+
+
+def test_replays_years_of_sessions_quickly():
+    sessions = 252 * 5
+    closes = 100 + np.cumsum(np.random.default_rng(7).normal(0, 1, sessions))
+    rows = {f"S{i}": [(c, c + 1, c - 1, c) for c in closes] for i in range(50)}
+    broker = SimulatedBroker(_bars(rows), cash=1e9)
+
+    started = time.perf_counter()
+    while broker.advance():
+        if broker.today.day == 1:
+            for symbol in list(broker.positions):
+                broker.close_position(symbol)
+            for i in range(50):
+                broker.buy_with_stop_loss(f"S{i}", 1, broker._last_close[f"S{i}"] + 2, 1)
+
+    assert time.perf_counter() - started < 10
+    assert len(broker.orders) > 1000
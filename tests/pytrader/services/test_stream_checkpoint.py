@@ -0,0 +1,53 @@
+import datetime
+
+from pytrader.services.stream_checkpoint import StreamCheckpoint
+
+_t0 = datetime.datetime(2024, 5, 1, 9, 30, tzinfo=datetime.timezone.utc)
+
+
+def _order(order_id, status, submitted_minutes, updated_minutes):
+    return {
+        "id": order_id,
+        "status": status,
+        "submitted_at": _t0 + datetime.timedelta(minutes=submitted_minutes),
+        "updated_at": _t0 + datetime.timedelta(minutes=updated_minutes),
+    }
+
+
+def test_nothing_to_resume_without_events():
+    assert StreamCheckpoint().resume_from() is None
+
+
+def test_resume_covers_oldest_open_order():
+    checkpoint = StreamCheckpoint()
+    checkpoint.advance({"a": _order("a", "NEW", 0, 0), "b": _order("b", "FILLED", 5, 10)})
+
+    assert checkpoint.last_event_at == _t0 + datetime.timedelta(minutes=10)
+    assert checkpoint.resume_from() < _t0
+
+
+def test_terminal_orders_stop_holding_back_the_checkpoint():
+    checkpoint = StreamCheckpoint()
+    checkpoint.advance({"a": _order("a", "NEW", 0, 0)})
+    checkpoint.advance({"a": _order("a", "FILLED", 0, 20)})
+
+    assert checkpoint.open_orders == {}
+    assert checkpoint.resume_from() > _t0 + datetime.timedelta(minutes=19)
+
+
+def test_only_newer_updates_are_replayed():
+    checkpoint = StreamCheckpoint()
+    checkpoint.advance({"a": _order("a", "NEW", 0, 5)})
+
+    assert not checkpoint.is_newer(_t0 + datetime.timedelta(minutes=5))
+    assert checkpoint.is_newer(_t0 + datetime.timedelta(minutes=6))
+
+
+def test_checkpoint_is_persisted(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    StreamCheckpoint(path).advance({"a": _order("a", "NEW", 0, 5)})
+
+    reloaded = StreamCheckpoint(path)
+
+    assert reloaded.last_event_at == _t0 + datetime.timedelta(minutes=5)
+    assert reloaded.open_orders == {"a": _t0}
@@ -0,0 +1,84 @@
+import datetime
+
+import numpy as np
+import pytest
+
+from pytrader.services.trade_analytics import ClosedTrades, drawdown, per_symbol_stats, summarize_trades
+
+utc = datetime.timezone.utc
+
+
+def _trade(trade_id, symbol, revenue, result_pct, day, exposure=2, settled_day=None):
+    closed_on = datetime.datetime(2024, 6, day, 16, tzinfo=utc)
+    return {
+        "id": trade_id,
+        "symbol": symbol,
+        "revenue": revenue,
+        "result_pct": result_pct,
+        "cost_basis": 100.0,
+        "sale_price": 100.0 * (1 + result_pct),
+        "opened_on": closed_on - datetime.timedelta(days=exposure),
+        "closed_on": closed_on,
+        "settled_at": datetime.datetime(2024, 6, settled_day or day, 20, tzinfo=utc),
+        "market_exposure": exposure,
+    }
+
+
+class FakeDatabase:
+    def __init__(self, trades):
+        self.trades = trades
+        self.queries = []
+
+    def get_closed_trades(self, settled_since=None, page_size=500):
+        self.queries.append(settled_since)
+        return iter([t for t in self.trades if settled_since is None or t["settled_at"] >= settled_since])
+
+
+def test_drawdown_is_measured_from_the_running_peak():
+    assert drawdown(np.array([10.0, 5.0, 20.0, 12.0])).tolist() == [0.0, -5.0, 0.0, -8.0]
+    assert drawdown(np.array([-3.0, 1.0])).tolist() == [-3.0, 0.0]
+
+
+def test_summary_and_per_symbol_stats():
+    trades = ClosedTrades()
+    trades.merge(
+        [
+            _trade("a", "AAPL", 50.0, 0.05, 3),
+            _trade("b", "MSFT", -20.0, -0.02, 4, exposure=4),
+            _trade("c", "AAPL", 10.0, 0.01, 5),
+            {**_trade("d", "MSFT", 0, 0, 6), "closed_on": None, "canceled_reason": "Order expired on broker."},
+        ]
+    )
+
+    summary = summarize_trades(trades)
+    assert summary["trades"] == 3
+    assert summary["revenue"] == 40.0
+    assert summary["win_rate"] == pytest.approx(2 / 3)
+    assert summary["max_drawdown"] == -20.0
+    assert summary["profit_factor"] == 3.0
+    assert summary["exposure_adjusted_return"] == pytest.approx(0.04 / 8)
+
+    stats = per_symbol_stats(trades)
+    assert stats["symbol"].tolist() == ["AAPL", "MSFT"]
+    assert stats["trades"].tolist() == [2, 1]
+    assert stats["revenue"].tolist() == [60.0, -20.0]
+
+
+def test_refresh_only_reads_newly_settled_trades(tmp_path):
+    path = str(tmp_path / "trades.npz")
+    db = FakeDatabase([_trade("a", "AAPL", 50.0, 0.05, 3), _trade("b", "MSFT", -20.0, -0.02, 4)])
+
+    trades = ClosedTrades(path).load()
+    assert trades.refresh(db) == 2
+    trades.save()
+
+    db.trades.append(_trade("c", "AAPL", 10.0, 0.01, 2, settled_day=7))
+    reloaded = ClosedTrades(path).load()
+    # The boundary trade is read again since settlement times are compared inclusively
+    assert reloaded.refresh(db) == 2
+    assert db.queries == [None, datetime.datetime(2024, 6, 4, 20, tzinfo=utc)]
+    assert reloaded["id"].tolist() == ["c", "a", "b"]
+    assert reloaded.watermark == datetime.datetime(2024, 6, 7, 20, tzinfo=utc)
+
+    assert reloaded.refresh(db, full=True) == 3
+    assert len(reloaded) == 3
@@ -0,0 +1,125 @@
+import datetime
+
+import pytest
+
+from pytrader.model import SignalModel, TradeModel
+from pytrader.services.trade_settlement import TradeSettler, settle_trade
+
+
+def _order(status, qty=10, price=100.0, filled_at=None):
+    return {"status": status, "qty": qty, "filled_avg_price": price, "filled_at": filled_at}
+
+
+def _signal(signal_id, action, order_id, order):
+    return SignalModel(signal_id, "AAPL", action, None, "RSI", orderId=order_id, resolvedOrder=order)
+
+
+def _trade(*signals, status="created"):
+    return TradeModel(
+        "t1", "AAPL", None, "RSI", status, signals=[s.id for s in signals], resolved_signals=list(signals)
+    )
+
+
+def test_round_trip_is_settled():
+    opened = datetime.datetime(2024, 6, 3, 9, 30)
+    trade = _trade(
+        _signal("buy", "Buy", "o1", _order("FILLED", 10, 100.0, opened)),
+        _signal("sell", "Sell", "o2", _order("FILLED", 10, 110.0, opened + datetime.timedelta(days=4))),
+    )
+
+    assert settle_trade(trade)
+    assert trade.cost_basis == 100.0
+    assert trade.revenue == 100.0
+    assert trade.result_pct == pytest.approx(0.1)
+    assert trade.market_exposure == 4
+
+
+def test_open_and_unplaced_orders_leave_the_trade_open():
+    buy = _signal("buy", "Buy", "o1", _order("FILLED"))
+
+    assert not settle_trade(_trade(buy))
+    assert not settle_trade(_trade(buy, _signal("sell", "Sell", None, {})))
+    assert not settle_trade(_trade(buy, _signal("sell", "Sell", "o2", _order("NEW"))))
+
+
+def test_expired_order_cancels_the_trade():
+    trade = _trade(
+        _signal("buy", "Buy", "o1", _order("FILLED")),
+        _signal("sell", "Sell", "o2", _order("EXPIRED")),
+    )
+
+    assert settle_trade(trade)
+    assert trade.canceled_reason == "Order expired on broker."
+
+
+class FakeDatabase:
+    def __init__(self, trade):
+        self.trade = trade
+        self.closed = []
+        self.lookups = 0
+        self.orders = {}
+
+    def get_signal_id_for_order(self, order_id):
+        self.lookups += 1
+        return {"o1": "buy", "o2": "sell"}.get(order_id)
+
+    def get_trade_id_for_signal(self, signal_id):
+        return self.trade.id
+
+    def get_trade(self, trade_id):
+        return self.trade
+
+    def upsert_order(self, order_key, order):
+        self.orders[order_key] = order
+
+    def close_trade(self, trade):
+        self.closed.append(trade.id)
+        trade.status = "closed"
+
+
+def test_settler_closes_the_trade_of_a_finished_order():
+    opened = datetime.datetime(2024, 6, 3, 9, 30)
+    db = FakeDatabase(
+        _trade(
+            _signal("buy", "Buy", "o1", _order("FILLED", filled_at=opened)),
+            _signal("sell", "Sell", "o2", _order("FILLED", filled_at=opened)),
+        )
+    )
+    settler = TradeSettler(db)
+
+    settler.on_orders({"alpaca_o3": {"id": "o3", "status": "NEW"}, "alpaca_o2": {"id": "o2", "status": "FILLED"}})
+    settler.on_orders({"alpaca_o2": {"id": "o2", "status": "FILLED"}})
+
+    assert db.closed == ["t1"]
+    assert db.lookups == 1
+
+
+def test_settler_ignores_orders_without_a_signal():
+    db = FakeDatabase(_trade(_signal("buy", "Buy", "o1", _order("FILLED"))))
+
+    assert not TradeSettler(db).settle_order("stop-leg")
+    assert db.closed == []
+
+
+def test_a_buy_order_missing_from_the_database_is_looked_up_before_settling():
+    opened = datetime.datetime(2024, 6, 3, 9, 30)
+    bought = _order("FILLED", 10, 100.0, opened)
+
+    def _trade_missing_its_buy():
+        return _trade(
+            _signal("buy", "Buy", "o1", None),
+            _signal("sell", "Sell", "o2", _order("FILLED", 10, 110.0, opened + datetime.timedelta(days=2))),
+        )
+
+    # Nowhere to look the order up, the trade is left open for the sweep instead of being canceled
+    db = FakeDatabase(_trade_missing_its_buy())
+    TradeSettler(db).on_orders({"alpaca_o2": {"id": "o2", "status": "FILLED"}})
+    assert db.closed == []
+    assert db.trade.status == "created"
+
+    db = FakeDatabase(_trade_missing_its_buy())
+    settler = TradeSettler(db, find_order={"o1": bought}.get)
+    settler.on_orders({"alpaca_o2": {"id": "o2", "status": "FILLED"}})
+    assert db.closed == ["t1"]
+    assert db.trade.revenue == 100.0
+    assert db.orders == {"alpaca_o1": bought}
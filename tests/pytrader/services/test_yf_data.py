@@ -0,0 +1,23 @@
+import pandas as pd
+
+from pytrader.services import yf_data
+
+
+def test_intraday_ranges_are_downloaded_in_windows(monkeypatch):
+    windows = []
+
+    def _download(tickers, timeframe, start, end, actions=False):
+        windows.append((start, end))
+        index = pd.MultiIndex.from_tuples([(start, "AAPL"), (end, "AAPL")], names=["date", "ticker"])
+        return pd.DataFrame({"close": [1.0, 2.0]}, index=index, dtype="float32")
+
+    monkeypatch.setattr(yf_data, "_download", _download)
+    end = pd.Timestamp("2024-06-03 10:00", tz="America/New_York")
+
+    df = yf_data.get_adjusted_market_data(["AAPL"], "15m", end_date=end, lookback_bars=26 * 50)
+
+    assert len(windows) == 2
+    assert windows[0][0] == end - pd.Timedelta(days=59) and windows[-1][1] == end
+    assert all(b - a <= pd.Timedelta(days=30) for a, b in windows)
+    assert not df.index.duplicated().any()
+    assert df.index.is_monotonic_increasing
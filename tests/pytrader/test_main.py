@@ -0,0 +1,60 @@
+import datetime
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from pytrader.algos.signal_events import SignalEvents
+from pytrader.main import _store_rsi_signals
+from pytrader.model import SignalModel, TradeModel
+from pytrader.services.local_database import LocalDatabase
+from pytrader.services.market_calendar import MarketCalendar
+from pytrader.utils import localtime
+from pytrader.utils.lazy import LazyServices
+from pytrader.utils.timeframe import DAILY, HOURLY
+
+_now = localtime.localize_to_et(datetime.datetime(2024, 6, 14, 17))
+
+
+class FakeBroker:
+    """
+    Weekday sessions, every one of them open.
+    """
+
+    def __init__(self):
+        self.calendar = MarketCalendar(lambda start, end: pd.bdate_range(start, end).date)
+
+    def get_open_market_days_since(self, since, till=None):
+        return self.calendar.market_days_between(since, till or _now.date())
+
+    def get_next_trade_day(self):
+        return self.calendar.next_trade_day(_now)
+
+
+@pytest.fixture
+def services(tmp_path):
+    localtime.set_clock(lambda: _now)
+    cfg = SimpleNamespace(rsi_timeout_days=10, rsi_timeout_bars=20, rsi_send_gchat=False)
+    db = LocalDatabase(str(tmp_path / "database.pkl"))
+    yield LazyServices({"cfg": lambda obj: cfg, "db": lambda obj: db, "broker": lambda obj: FakeBroker()})
+    localtime.set_clock(None)
+
+
+def _open_trade(db: LocalDatabase, trade_id: str, execute_on: datetime.date, metadata: dict):
+    signal = SignalModel(trade_id, "AAPL", "Buy", execute_on, "RSI", metadata, localtime.to_day(execute_on), "1")
+    db.add_signal(signal)
+    db.add_trade(TradeModel(trade_id, "AAPL", None, "RSI", "open"))
+    db.add_signal_ref_to_trade(trade_id, trade_id)
+
+
+@pytest.mark.parametrize("scan", [DAILY, HOURLY])
+def test_trades_time_out_by_the_timeframe_that_opened_them(services, scan):
+    db: LocalDatabase = services["db"]
+    # 4 days held is within the daily 10 days but past 20 hourly bars, which take 3 sessions
+    _open_trade(db, "daily", datetime.date(2024, 6, 10), {"close": 1.0})
+    _open_trade(db, "hourly", datetime.date(2024, 6, 10), {"close": 1.0, "timeframe": "1h"})
+
+    _store_rsi_signals(services, SignalEvents.from_frames({}), scan)
+
+    assert len(db.get_trade("daily").signals) == 1
+    assert len(db.get_trade("hourly").signals) == 2
@@ -0,0 +1,92 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import pytrader
+from pytrader.services.local_database import LocalDatabase
+from pytrader.services.sim_broker import SimulatedBroker
+
+_production = ["firebase_admin", "google.cloud.firestore"]
+# The commands run in the simulation's directory, the package is found from here
+_env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(pytrader.__file__)))
+
+
+def _panel(n: int = 260) -> pd.DataFrame:
+    """
+    A steady climb, a six session dip the scan buys and a rally it sells into.
+    """
+    close = [100 + i * 0.5 for i in range(n - 20)]
+    close += [close[-1] * (0.99**i) for i in range(1, 7)]
+    close += [close[-1] * (1.02**i) for i in range(1, 15)]
+    close = np.array(close)
+    df = pd.DataFrame(
+        {"open": close, "high": close * 1.01, "low": close * 0.995, "close": close, "volume": 1e6},
+        index=pd.bdate_range("2023-01-02", periods=n),
+    )
+    df["ticker"] = "AAPL"
+    return df.rename_axis("date").set_index("ticker", append=True)
+
+
+@pytest.fixture
+def simulation(tmp_path):
+    bars = _panel()
+    bars.to_pickle(tmp_path / "bars.pkl")
+    # Credentials that do not exist, anything reaching for Firestore fails
+    (tmp_path / ".env").write_text("alpaca_api_key=key\nalpaca_secret_key=secret\nfirebase_creds=missing.json\n")
+    return tmp_path, bars.index.unique(0)
+
+
+def _simulate(cwd, *args) -> set[str]:
+    """
+    Runs a command against the simulation and returns the production clients it imported.
+    """
+    script = (
+        "import sys\n"
+        "from pytrader.main import cli\n"
+        f"cli({['-o', 'pytrader.log', '--simulate', 'bars.pkl', *args]!r}, standalone_mode=False)\n"
+        f"print(' '.join(m for m in {_production!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script], cwd=cwd, env=_env, capture_output=True, text=True, check=True
+    )
+    return set(result.stdout.split())
+
+
+def test_simulated_sessions_carry_over_between_commands(simulation):
+    cwd, dates = simulation
+    state = os.path.join(cwd, ".cache", "simulation", "bars")
+
+    # The dip's first buy is scanned and ordered after the close
+    assert _simulate(cwd, "backtest", "--until", f"{dates[-16]:%Y-%m-%d}") == set()
+    broker = SimulatedBroker.load(os.path.join(state, "broker.pkl"))
+    db = LocalDatabase(os.path.join(state, "database.pkl"))
+    assert broker.today == dates[-16].date()
+    (buy,) = broker.get_open_orders()
+    assert db.get_order(f"alpaca_{buy.id}")["status"].lower() == "new"
+
+    # A later command resumes the session and fills the order on the next one
+    assert _simulate(cwd, "backtest", "--sessions", "1") == set()
+    broker = SimulatedBroker.load(os.path.join(state, "broker.pkl"))
+    db = LocalDatabase(os.path.join(state, "database.pkl"))
+    assert broker.today == dates[-15].date()
+    assert db.get_order(f"alpaca_{buy.id}")["status"].lower() == "filled"
+    assert broker.get_position_for("AAPL") is not None
+
+    assert _simulate(cwd, "backtest") == set()
+    db = LocalDatabase(os.path.join(state, "database.pkl"))
+    (trade,) = db.get_closed_trades()
+    assert trade["id"] == f"aapl_{dates[-16]:%Y-%m-%d}_rsi_buy"
+    assert trade["revenue"] > 0
+    assert trade["settled_at"].date() < dates[-1].date()
+
+
+def test_backtest_needs_a_simulation(simulation):
+    cwd, _ = simulation
+    script = "from pytrader.main import cli\ncli(['-o', 'pytrader.log', 'backtest'])"
+    result = subprocess.run([sys.executable, "-c", script], cwd=cwd, env=_env, capture_output=True, text=True)
+    assert result.returncode == 2
+    assert "--simulate" in result.stderr
@@ -0,0 +1,45 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import pytrader
+
+_heavy = ["pandas", "yfinance", "firebase_admin", "alpaca", "joblib"]
+# The code may run in another directory, the package is found from here
+_env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(pytrader.__file__)))
+
+
+def _imported_after(code: str, cwd: str = None) -> set[str]:
+    script = f"import sys\n{code}\nprint(' '.join(m for m in {_heavy!r} if m in sys.modules))"
+    result = subprocess.run(
+        [sys.executable, "-c", script], cwd=cwd, env=_env, capture_output=True, text=True, check=True
+    )
+    return set(result.stdout.split())
+
+
+def test_cli_import_is_light():
+    assert _imported_after("import pytrader.main") == set()
+
+
+def test_help_constructs_nothing(tmp_path):
+    code = (
+        "from click.testing import CliRunner\n"
+        "from pytrader.main import cli\n"
+        "CliRunner().invoke(cli, ['rsi', '--help'])"
+    )
+    # The group callback still runs and opens its log file in the working directory
+    assert _imported_after(code, cwd=tmp_path) == set()
+
+
+@pytest.mark.parametrize(
+    "modules, forbidden",
+    [
+        (["alpaca", "account_monitor", "database", "order_writer", "stream_checkpoint"], {"yfinance", "joblib"}),
+        (["alpaca", "database", "order_executor"], {"yfinance"}),
+    ],
+)
+def test_command_dependencies(modules, forbidden):
+    code = "\n".join(f"import pytrader.services.{m}" for m in modules)
+    assert not _imported_after(code) & forbidden
@@ -0,0 +1,60 @@
+import datetime
+import os
+
+from requests_cache import CachedResponse, SQLiteCache
+
+from pytrader.utils.cache import CacheBudget, CacheManager
+
+_now = 1_700_000_000
+
+
+def _entry(root, name, size, days_ago):
+    path = os.path.join(root, "calls", name)
+    os.makedirs(path)
+    with open(os.path.join(path, "output.pkl"), "wb") as f:
+        f.write(b"x" * size)
+    used = _now - days_ago * 86400
+    os.utime(os.path.join(path, "output.pkl"), (used, used))
+
+
+def test_prune_evicts_expired_then_least_recently_used_entries(tmp_path):
+    budget = CacheBudget("rsi", "rsi", max_bytes=2500, max_age_days=7)
+    manager = CacheManager(str(tmp_path), [budget], clock=lambda: _now)
+    root = manager.path("rsi")
+    for name, days_ago in [("stale", 10), ("old", 3), ("recent", 2), ("fresh", 0)]:
+        _entry(root, name, 1000, days_ago)
+
+    assert manager.prune() == {"rsi": (2, 2000)}
+    assert sorted(os.listdir(os.path.join(root, "calls"))) == ["fresh", "recent"]
+    assert manager.prune() == {"rsi": (0, 0)}
+
+
+def test_hit_counters_accumulate_across_processes(tmp_path):
+    budget = CacheBudget("rsi", "rsi", None, None)
+    for hits in ([True, False], [True]):
+        manager = CacheManager(str(tmp_path), [budget])
+        for hit in hits:
+            manager.record("rsi", hit)
+        manager.save_counters()
+
+    (stats,) = CacheManager(str(tmp_path), [budget]).stats()
+    assert (stats["hits"], stats["misses"]) == (2, 1)
+    assert stats["hit_rate"] == 2 / 3
+
+
+def test_http_cache_keeps_the_newest_responses_within_budget(tmp_path):
+    budget = CacheBudget("http", "yfinance.sqlite", max_bytes=None, max_age_days=None)
+    manager = CacheManager(str(tmp_path), [budget])
+    backend = SQLiteCache(manager.path("http"))
+    for i in range(4):
+        created_at = datetime.datetime(2024, 1, 1 + i, tzinfo=datetime.timezone.utc)
+        response = CachedResponse(content=b"x" * 100_000, status_code=200, created_at=created_at)
+        backend.save_response(response, cache_key=str(i))
+    backend.close()
+
+    limited = CacheManager(str(tmp_path), [CacheBudget("http", "yfinance.sqlite", 250_000, None)])
+    removed, _ = limited.prune()["http"]
+
+    backend = SQLiteCache(manager.path("http"))
+    assert removed == 2 and sorted(backend.responses.keys()) == ["2", "3"]
+    backend.close()
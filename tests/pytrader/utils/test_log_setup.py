@@ -0,0 +1,65 @@
+import json
+import logging
+import logging.handlers
+
+import pytest
+
+from pytrader.utils.log_setup import configure_logging
+
+
+@pytest.fixture
+def root_logger():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    for handler in handlers:
+        root.removeHandler(handler)
+    yield root
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+def test_records_are_written_after_stop(root_logger, tmp_path):
+    path = tmp_path / "pytrader.log"
+    queued = configure_logging(logging.INFO, str(path))
+    args = ["AAPL"]
+
+    logging.getLogger("pytrader.test").info("Buying %s", args)
+    args.append("MSFT")
+    logging.getLogger("pytrader.test").debug("hidden")
+    queued.stop()
+    queued.stop()
+
+    lines = path.read_text().splitlines()
+    assert len(lines) == 1
+    assert lines[0].endswith("pytrader.test - INFO - Buying ['AAPL']")
+    assert not any(isinstance(h, logging.handlers.QueueHandler) for h in root_logger.handlers)
+
+
+def test_json_lines_keep_tracebacks(root_logger, tmp_path):
+    path = tmp_path / "pytrader.log"
+    queued = configure_logging(logging.INFO, str(path), json_format=True)
+
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logging.getLogger("pytrader.test").exception("Order failed")
+    queued.stop()
+
+    entry = json.loads(path.read_text())
+    assert entry["logger"] == "pytrader.test"
+    assert entry["message"] == "Order failed"
+    assert "ValueError: boom" in entry["exception"]
+
+
+def test_log_file_rotates(root_logger, tmp_path):
+    path = tmp_path / "pytrader.log"
+    queued = configure_logging(logging.INFO, str(path), max_bytes=1_000, backup_count=2)
+
+    for i in range(100):
+        logging.getLogger("pytrader.test").info(f"order update {i}")
+    queued.stop()
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["pytrader.log", "pytrader.log.1", "pytrader.log.2"]
@@ -0,0 +1,45 @@
+import pstats
+
+from pytrader.utils import profiling
+from pytrader.utils.profiling import StageProfiler
+
+
+@profiling.stage("scan")
+def _scan():
+    with profiling.stage("download"):
+        data = [bytearray(1 << 20) for _ in range(4)]
+        del data
+    with profiling.stage("store"):
+        profiling.count("signals_emitted", 3)
+
+
+def test_stages_are_recorded_only_while_profiling(tmp_path):
+    _scan()
+
+    profiler = StageProfiler(str(tmp_path / "metrics.prom"), str(tmp_path / "run.prof"))
+    profiler.start()
+    _scan()
+    profiler.stop()
+    _scan()
+
+    assert set(profiler.stages) == {"scan", "scan/download", "scan/store"}
+    assert profiler.stages["scan"].runs == 1
+    assert profiler.stages["scan/download"].peak_bytes >= 4 << 20
+    assert profiler.stages["scan"].peak_bytes >= profiler.stages["scan/download"].peak_bytes
+    assert profiler.counters == {"signals_emitted": 3}
+    assert pstats.Stats(str(tmp_path / "run.prof")).total_calls > 0
+
+
+def test_metrics_are_prometheus_text(tmp_path):
+    path = tmp_path / "metrics.prom"
+    profiler = StageProfiler(str(path))
+    profiler.start()
+    _scan()
+    text = path.read_text()
+    profiler.stop()
+
+    assert "# TYPE pytrader_stage_wall_seconds gauge" in text
+    assert 'pytrader_stage_wall_seconds{stage="scan/download"} ' in text
+    assert "pytrader_signals_emitted 3" in text
+    for line in text.splitlines():
+        assert line.startswith("#") or len(line.split(" ")) == 2
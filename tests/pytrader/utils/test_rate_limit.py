@@ -0,0 +1,43 @@
+from pytrader.utils.rate_limit import TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_burst_is_served_without_waiting():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1, capacity=5, clock=clock, sleep=clock.sleep)
+
+    waits = [bucket.acquire() for _ in range(5)]
+
+    assert waits == [0.0] * 5
+
+
+def test_requests_past_the_burst_are_paced_at_the_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=2, clock=clock, sleep=clock.sleep)
+
+    for _ in range(6):
+        bucket.acquire()
+
+    assert clock.now == 2.0
+
+
+def test_idle_time_refills_up_to_capacity():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1, capacity=3, clock=clock, sleep=clock.sleep)
+    for _ in range(3):
+        bucket.acquire()
+
+    clock.now += 100
+
+    assert [bucket.acquire() for _ in range(3)] == [0.0] * 3
+    assert bucket.acquire() == 1.0
@@ -0,0 +1,44 @@
+import datetime
+
+import pandas as pd
+import pytest
+
+from pytrader.utils.need_something_better import _get_trade_key
+from pytrader.utils.timeframe import DAILY, FIFTEEN_MINUTES, HOURLY, get_timeframe
+
+
+def test_lookback_is_measured_in_bars():
+    assert DAILY.lookback_days(1100) == 1604
+    assert HOURLY.lookback_days(1100) == 239
+    assert FIFTEEN_MINUTES.lookback_days(1100) == FIFTEEN_MINUTES.max_history_days
+
+
+def test_intraday_bars_are_labelled_in_eastern_time():
+    bar = pd.Timestamp("2024-01-05 15:30", tz="UTC")
+
+    assert HOURLY.to_et(bar).hour == 10
+    assert HOURLY.label(bar) == "2024-01-05T1030"
+    assert DAILY.label(pd.Timestamp("2024-01-05")) == "2024-01-05"
+
+
+def test_trade_keys_keep_daily_format():
+    day = {"action": "Buy", "date": datetime.datetime(2024, 1, 5)}
+    bar = {"action": "Buy", "date": HOURLY.to_et(pd.Timestamp("2024-01-05 15:30", tz="UTC"))}
+
+    assert _get_trade_key("AAPL", day) == "aapl_2024-01-05_rsi_buy"
+    assert _get_trade_key("AAPL", bar, HOURLY) == "aapl_2024-01-05t1030_rsi_buy_1h"
+
+
+def test_unknown_timeframe():
+    with pytest.raises(ValueError):
+        get_timeframe("4h")
+
+
+def test_bars_start_at_the_session_open():
+    assert HOURLY.bar_start(pd.Timestamp("2024-01-05 15:29", tz="UTC")).strftime("%H:%M") == "09:30"
+    assert HOURLY.bar_start(pd.Timestamp("2024-01-05 15:30", tz="UTC")).strftime("%H:%M") == "10:30"
+    assert HOURLY.bar_start(pd.Timestamp("2024-01-05 20:59", tz="UTC")).strftime("%H:%M") == "15:30"
+    assert FIFTEEN_MINUTES.bar_start(pd.Timestamp("2024-07-05 14:44", tz="UTC")).strftime("%H:%M") == "10:30"
+    assert DAILY.bar_start(pd.Timestamp("2024-01-05 15:30", tz="UTC")).strftime("%Y-%m-%d %H:%M") == "2024-01-05 00:00"
+    assert HOURLY.bar_start(pd.Timestamp("2024-01-05 14:29", tz="UTC")) is None
+    assert HOURLY.bar_start(pd.Timestamp("2024-01-05 21:00", tz="UTC")) is None